@@ -0,0 +1,103 @@
+# alerts.py
+import os
+import time
+import asyncio
+from typing import Dict, Tuple
+
+from db import supabase, execute
+from guardian_index import guardian_index
+from telemetry import get_logger
+
+log = get_logger("alerts")
+
+ALERT_SCORE_THRESHOLD = 75
+# A repeat alert at the same level is allowed only after this many seconds;
+# an escalation (high -> critical) always goes out immediately.
+ALERT_COOLDOWN_S = int(os.getenv("ALERT_COOLDOWN_S", "900"))
+
+LEVEL_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+
+class AlertDispatcher:
+    """
+    Fans risk alerts out to a ward's active guardians (from guardian_index).
+
+    One bulk notifications insert per alert event (all guardians + the ward),
+    sent off the assessment path. Per thread, an alert fires only when the
+    level rises above the last alerted level, or when the cooldown has
+    passed since the last alert.
+    """
+
+    def __init__(self, cooldown: float = ALERT_COOLDOWN_S):
+        self.cooldown = cooldown
+        self._last_alert: Dict[str, Tuple[int, float]] = {}   # thread_id -> (level rank, time)
+        self._tasks = set()
+
+    def should_alert(self, thread_id: str, level: str) -> bool:
+        rank = LEVEL_RANK.get(level, 0)
+        last = self._last_alert.get(thread_id)
+        if last is None:
+            return True
+        last_rank, last_at = last
+        return rank > last_rank or time.monotonic() - last_at >= self.cooldown
+
+    def dispatch(self, thread_id: str, ward_id: str, score: int, level: str, reason: str) -> bool:
+        """Queues an alert if it passes dedup. Returns True if one was queued."""
+        if not supabase or not ward_id or score < ALERT_SCORE_THRESHOLD:
+            return False
+        if not self.should_alert(thread_id, level):
+            return False
+
+        if len(self._last_alert) > 1000:
+            self._prune()
+        previous = self._last_alert.get(thread_id)
+        entry = (LEVEL_RANK.get(level, 0), time.monotonic())
+        self._last_alert[thread_id] = entry
+        task = asyncio.create_task(self._send(thread_id, ward_id, score, reason, entry, previous))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def _prune(self):
+        # Entries past the cooldown behave exactly like missing ones
+        now = time.monotonic()
+        for key, (_, at) in list(self._last_alert.items()):
+            if now - at >= self.cooldown:
+                del self._last_alert[key]
+
+    async def _send(self, thread_id: str, ward_id: str, score: int, reason: str, entry, previous):
+        try:
+            guardian_ids = await guardian_index.active_guardians(ward_id)
+            rows = [{
+                "user_id": g_id,
+                "type": "risk_alert",
+                "title": "CRITICAL RISK ALERT",
+                "message": f"Critical danger detected for your ward. Risk Score: {score}. Reason: {reason}",
+                "link": f"/live-status?threadId={thread_id}"
+            } for g_id in guardian_ids]
+            rows.append({
+                "user_id": ward_id,
+                "type": "risk_alert",
+                "title": "Safety Alert",
+                "message": "Shadow has detected potential danger. Please stay alert.",
+                "link": "/"
+            })
+            await execute(supabase.table("notifications").insert(rows))
+            log.info("Alert sent", extra={"thread_id": thread_id, "score": score, "guardians": len(guardian_ids)})
+        except Exception:
+            log.exception("Alert send error", extra={"thread_id": thread_id})
+            # Let the next assessment retry instead of treating this as sent,
+            # unless a newer alert for the thread has been queued since
+            if self._last_alert.get(thread_id) is not entry:
+                return
+            if previous is None:
+                self._last_alert.pop(thread_id, None)
+            else:
+                self._last_alert[thread_id] = previous
+
+    async def close(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+alert_dispatcher = AlertDispatcher()
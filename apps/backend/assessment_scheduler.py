@@ -0,0 +1,100 @@
+# assessment_scheduler.py
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from telemetry import get_logger
+
+log = get_logger("scheduler")
+
+
+class AssessmentScheduler:
+    """
+    Coalesces risk assessments for a single session.
+
+    At most one assessment runs at a time. Turns that arrive while a call is
+    in flight are folded into the next call, and results older than the last
+    published one are dropped.
+
+    debounce:    wait this long after the latest turn before assessing, so a
+                 burst of turns becomes one call.
+    max_latency: never hold a pending turn longer than this, even if turns
+                 keep arriving.
+    """
+
+    def __init__(
+        self,
+        assess: Callable[[], Awaitable[Optional[dict]]],
+        publish: Callable[[dict], Awaitable[None]],
+        debounce: float = 0.4,
+        max_latency: float = 2.0,
+    ):
+        self._assess = assess
+        self._publish = publish
+        self.debounce = debounce
+        self.max_latency = max(max_latency, debounce)
+
+        self._seq = 0                # bumped on every notify()
+        self._published_seq = 0      # seq of the last published result
+        self._first_pending_at = None
+        self._last_turn_at = None
+        self._pending = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def notify(self):
+        """Signal that new turns are available. Safe to call on every turn."""
+        if self._closed:
+            return
+        now = asyncio.get_running_loop().time()
+        self._seq += 1
+        self._last_turn_at = now
+        if self._first_pending_at is None:
+            self._first_pending_at = now
+        self._pending.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        self._closed = True
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _wait_window(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            deadline = min(self._last_turn_at + self.debounce, self._first_pending_at + self.max_latency)
+            delay = deadline - loop.time()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _run(self):
+        while not self._closed:
+            await self._pending.wait()
+            await self._wait_window()
+
+            # Everything that arrived up to now is covered by this call
+            self._pending.clear()
+            self._first_pending_at = None
+            seq = self._seq
+
+            try:
+                result = await self._assess()
+            except Exception:
+                log.exception("Scheduled assessment error")
+                continue
+
+            if result is None or self._closed:
+                continue
+            if seq <= self._published_seq:
+                # A newer result already went out
+                continue
+            self._published_seq = seq
+            try:
+                await self._publish(result)
+            except Exception:
+                log.exception("Assessment publish error")
@@ -0,0 +1,104 @@
+# audio_pipeline.py
+import asyncio
+from collections import deque
+from typing import Callable, Optional
+
+from telemetry import get_logger
+
+log = get_logger("audio")
+
+
+class AudioPipe:
+    """
+    Per-session audio path from the WebSocket to the STT client.
+
+    push() is non-blocking and stores chunks in a byte-bounded buffer. A
+    single writer task forwards them upstream in order. When the buffer is
+    full, the oldest audio is dropped: for live monitoring, fresh audio is
+    worth more than stale audio. If the upstream reports a backlog
+    (upstream_depth() > max_upstream_chunks), the writer pauses, so the
+    backlog builds here, where it is bounded, and not inside the STT client.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[bytes], None],
+        max_bytes: int = 64000,
+        upstream_depth: Optional[Callable[[], int]] = None,
+        max_upstream_chunks: int = 50,
+        stall_poll: float = 0.02,
+    ):
+        self._write = write
+        self.max_bytes = max_bytes
+        self._upstream_depth = upstream_depth
+        self.max_upstream_chunks = max_upstream_chunks
+        self.stall_poll = stall_poll
+
+        self._chunks = deque()
+        self._bytes = 0
+        self.dropped_bytes = 0
+        self.write_errors = 0
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def upstream_chunks(self) -> int:
+        """Chunks queued inside the STT client, if it reports them."""
+        if self._upstream_depth is None:
+            return 0
+        try:
+            return self._upstream_depth()
+        except Exception:
+            return 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def push(self, chunk: bytes):
+        if self._closed or not chunk:
+            return
+        self._chunks.append(chunk)
+        self._bytes += len(chunk)
+        while self._bytes > self.max_bytes and len(self._chunks) > 1:
+            old = self._chunks.popleft()
+            self._bytes -= len(old)
+            self.dropped_bytes += len(old)
+        self._ready.set()
+
+    def _stalled(self) -> bool:
+        return self.upstream_chunks > self.max_upstream_chunks
+
+    async def _run(self):
+        while not self._closed:
+            await self._ready.wait()
+            while self._chunks and not self._closed:
+                if self._stalled():
+                    await asyncio.sleep(self.stall_poll)
+                    continue
+                chunk = self._chunks.popleft()
+                self._bytes -= len(chunk)
+                try:
+                    self._write(chunk)
+                except Exception as e:
+                    # Per-chunk path: log the first error and every 100th after it
+                    self.write_errors += 1
+                    if self.write_errors % 100 == 1:
+                        log.warning("Audio upstream write error", extra={"errors": self.write_errors, "error": repr(e)})
+            self._ready.clear()
+
+    async def close(self):
+        self._closed = True
+        self._chunks.clear()
+        self._bytes = 0
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
@@ -0,0 +1,134 @@
+# audio_preprocess.py
+from collections import deque
+from typing import List
+
+import numpy as np
+
+TARGET_RATE = 16000  # what StreamingParameters(sample_rate=16000) expects
+# Client formats accepted by set_format
+MIN_RATE, MAX_RATE = 8000, 192000
+MAX_CHANNELS = 8
+
+
+class AudioPreprocessor:
+    """
+    Cleans up client audio before it goes to the STT upstream:
+
+    1. downmixes to mono and resamples to 16 kHz when the client says its
+       format differs (see set_format);
+    2. re-chunks into fixed frame_ms frames (50 ms suits AssemblyAI);
+    3. gates out silence with an energy VAD. Frames are scored in one
+       vectorized pass per chunk against an adaptive noise floor.
+
+    Around speech, preroll_ms before and hangover_ms after are kept, so word
+    onsets aren't clipped and the STT still hears the pause it uses to end a
+    turn. During long silences a single silent frame goes out every
+    keepalive_ms to keep the upstream session open.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        frame_ms: int = 50,
+        threshold_db: float = -45.0,
+        floor_margin_db: float = 10.0,
+        hangover_ms: int = 1300,
+        preroll_ms: int = 200,
+        keepalive_ms: int = 5000,
+    ):
+        self.enabled = enabled
+        self.frame_samples = TARGET_RATE * frame_ms // 1000
+        self.threshold_db = threshold_db
+        self.floor_margin_db = floor_margin_db
+        self.hangover_frames = max(hangover_ms // frame_ms, 0)
+        self.keepalive_frames = max(keepalive_ms // frame_ms, 1)
+
+        self.in_rate = TARGET_RATE
+        self.channels = 1
+        self._carry = b""                          # partial input sample frame
+        self._pending = np.zeros(0, dtype=np.int16)  # resampled, not yet framed
+        self._preroll = deque(maxlen=max(preroll_ms // frame_ms, 0))
+        self._hangover = 0
+        self._silent_run = 0
+        self._noise_floor_db = threshold_db - floor_margin_db
+
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def set_format(self, sample_rate: int, channels: int = 1):
+        """Raises ValueError (keeping the current format) on an unsupported one."""
+        if isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float)) \
+                or not MIN_RATE <= sample_rate <= MAX_RATE:
+            raise ValueError(f"sample_rate must be a number from {MIN_RATE} to {MAX_RATE}")
+        if isinstance(channels, bool) or not isinstance(channels, int) or not 1 <= channels <= MAX_CHANNELS:
+            raise ValueError(f"channels must be an integer from 1 to {MAX_CHANNELS}")
+        self.in_rate = int(sample_rate)
+        self.channels = channels
+
+    def _to_target(self, chunk: bytes) -> np.ndarray:
+        frame_bytes = 2 * self.channels
+        data = self._carry + chunk
+        usable = len(data) - len(data) % frame_bytes
+        self._carry = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<i2")
+
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        if self.in_rate != TARGET_RATE and len(samples):
+            n_out = int(round(len(samples) * TARGET_RATE / self.in_rate))
+            positions = np.linspace(0, len(samples) - 1, n_out)
+            samples = np.interp(positions, np.arange(len(samples)), samples)
+        return samples.astype(np.int16, copy=False)
+
+    def _energy_db(self, frames: np.ndarray) -> np.ndarray:
+        x = frames.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(x * x, axis=1) + 1e-12)
+        return 20.0 * np.log10(rms)
+
+    def process(self, chunk: bytes) -> List[bytes]:
+        """Feeds one client chunk; returns the frames to forward upstream."""
+        samples = self._to_target(chunk)
+        if not self.enabled and self.in_rate == TARGET_RATE and self.channels == 1 and not len(self._pending):
+            self.frames_in += 1
+            self.frames_out += 1
+            return [samples.tobytes()] if len(samples) else []
+
+        self._pending = np.concatenate((self._pending, samples)) if len(self._pending) else samples
+        n_frames = len(self._pending) // self.frame_samples
+        if n_frames == 0:
+            return []
+        frames = self._pending[: n_frames * self.frame_samples].reshape(n_frames, self.frame_samples)
+        self._pending = self._pending[n_frames * self.frame_samples:].copy()
+        self.frames_in += n_frames
+
+        if not self.enabled:
+            self.frames_out += n_frames
+            return [f.tobytes() for f in frames]
+
+        energy = self._energy_db(frames)
+        out = []
+        for frame, db in zip(frames, energy):
+            threshold = max(self.threshold_db, self._noise_floor_db + self.floor_margin_db)
+            if db > threshold:
+                out.extend(self._preroll)
+                self._preroll.clear()
+                out.append(frame.tobytes())
+                self._hangover = self.hangover_frames
+                self._silent_run = 0
+                continue
+
+            # Track the background level on non-speech frames only
+            self._noise_floor_db = 0.95 * self._noise_floor_db + 0.05 * float(db)
+            if self._hangover > 0:
+                self._hangover -= 1
+                out.append(frame.tobytes())
+                continue
+
+            self._silent_run += 1
+            if self._silent_run % self.keepalive_frames == 0:
+                out.append(bytes(self.frame_samples * 2))
+            elif self._preroll.maxlen:
+                self._preroll.append(frame.tobytes())
+
+        self.frames_out += len(out)
+        return out
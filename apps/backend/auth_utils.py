@@ -1,26 +1,124 @@
 from fastapi import Header, HTTPException, Depends
-from supabase import create_client, Client
+from db import supabase, run
 import os
-from dotenv import load_dotenv
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
 
-load_dotenv()
+import jwt
+
+from telemetry import get_logger
+
+log = get_logger("auth")
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+# HS256 projects sign with the JWT secret; asymmetric projects publish a JWKS.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+AUTH_CACHE_TTL_S = int(os.getenv("AUTH_CACHE_TTL_S", "300"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+_jwks_client = jwt.PyJWKClient(f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json") if SUPABASE_URL else None
+
+
+class AuthUser:
+    """The parts of a Supabase user the handlers rely on."""
+    __slots__ = ("id", "email")
+
+    def __init__(self, id: str, email: Optional[str]):
+        self.id = id
+        self.email = email
+
+
+# token sha256 -> (user, expires_at), least recently used first
+_cache: "OrderedDict[str, Tuple[AuthUser, float]]" = OrderedDict()
+
+
+def _cache_get(key: str) -> Optional[AuthUser]:
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    user, expires_at = entry
+    if time.time() >= expires_at:
+        del _cache[key]
+        return None
+    _cache.move_to_end(key)
+    return user
+
+
+def _cache_put(key: str, user: AuthUser, token_exp: Optional[float]):
+    expires_at = time.time() + AUTH_CACHE_TTL_S
+    if token_exp:
+        expires_at = min(expires_at, token_exp)
+    _cache[key] = (user, expires_at)
+    _cache.move_to_end(key)
+    while len(_cache) > AUTH_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _signing_key(token: str):
+    """Returns (key, alg) for local verification, or None if we can't verify locally."""
+    alg = jwt.get_unverified_header(token).get("alg")
+    if alg == "HS256":
+        return (SUPABASE_JWT_SECRET, alg) if SUPABASE_JWT_SECRET else None
+    if alg in ("RS256", "ES256") and _jwks_client:
+        # PyJWKClient caches the key set, so this only hits the network on rotation
+        return _jwks_client.get_signing_key_from_jwt(token).key, alg
+    return None
+
+
+def _verify_locally(token: str) -> Optional[Tuple[AuthUser, float]]:
+    """
+    Verifies signature, exp and audience. Raises jwt.InvalidTokenError for a
+    bad token; returns None when local verification isn't available.
+    """
+    try:
+        signing = _signing_key(token)
+    except jwt.PyJWKClientError as e:
+        log.warning("JWKS fetch error, falling back to remote auth", extra={"error": repr(e)})
+        return None
+    if signing is None:
+        return None
+    key, alg = signing
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[alg],
+        audience="authenticated",
+        options={"require": ["exp", "sub"]},
+    )
+    return AuthUser(claims["sub"], claims.get("email")), float(claims["exp"])
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 async def get_current_user(authorization: str = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization header")
-    
+
     try:
         # Expected format: Bearer <jwt>
         token = authorization.replace("Bearer ", "")
-        user = supabase.auth.get_user(token)
+        key = hashlib.sha256(token.encode()).hexdigest()
+        cached = _cache_get(key)
+        if cached:
+            return cached
+
+        # JWKS lookups may touch the network on first use, so keep them off the loop
+        verified = await run(_verify_locally, token)
+        if verified:
+            user, exp = verified
+            _cache_put(key, user, exp)
+            return user
+
+        # Fallback: ask the auth server
+        user = await run(supabase.auth.get_user, token)
         if not user or not user.user:
             raise HTTPException(status_code=401, detail="Invalid token")
-        return user.user
+        auth_user = AuthUser(user.user.id, user.user.email)
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        _cache_put(key, auth_user, exp)
+        return auth_user
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Auth error: {e}")
+        log.warning("Auth error", extra={"error": repr(e)})
         raise HTTPException(status_code=401, detail="Authentication failed")
@@ -0,0 +1,230 @@
+# bench/fakes.py
+#
+# Local stand-ins for the external services the session pipeline talks to,
+# used by the load-test harness. They mimic the parts of each client API
+# that the backend calls, including the threading model where it matters.
+import time
+import uuid
+import queue
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List
+
+# marker -> perf_counter() when the fake STT emitted that final turn
+EMITTED_TURNS: Dict[str, float] = {}
+
+
+# --- Supabase -----------------------------------------------------------------
+
+class _FakeNot:
+    """query.not_.<filter>(...): the negated filter."""
+
+    def __init__(self, query: "FakeQuery"):
+        self._query = query
+
+    def is_(self, column, value):
+        return self._query._where(lambda row: not _is(row.get(column), value))
+
+    def in_(self, column, values):
+        return self._query._where(lambda row: row.get(column) not in set(values))
+
+    def eq(self, column, value):
+        return self._query._where(lambda row: row.get(column) != value)
+
+
+def _is(actual, value) -> bool:
+    # PostgREST is.null / is.true / is.false
+    if value in (None, "null"):
+        return actual is None
+    return actual is {"true": True, "false": False}.get(str(value).lower(), value)
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._op = "select"
+        self._payload = None
+        self._filters = []
+        self._limit = None
+
+    def select(self, *columns, **kwargs):
+        self._op = "select"
+        return self
+
+    def insert(self, payload, **kwargs):
+        self._op, self._payload = "insert", payload
+        return self
+
+    def upsert(self, payload, **kwargs):
+        self._op, self._payload = "upsert", payload
+        return self
+
+    def update(self, payload, **kwargs):
+        self._op, self._payload = "update", payload
+        return self
+
+    def delete(self, **kwargs):
+        self._op = "delete"
+        return self
+
+    def _where(self, predicate):
+        self._filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        return self._where(lambda row: row.get(column) == value)
+
+    def in_(self, column, values):
+        return self._where(lambda row: row.get(column) in set(values))
+
+    def is_(self, column, value):
+        return self._where(lambda row: _is(row.get(column), value))
+
+    def gte(self, column, value):
+        return self._where(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    @property
+    def not_(self) -> _FakeNot:
+        return _FakeNot(self)
+
+    def limit(self, size, **kwargs):
+        if not kwargs.get("foreign_table"):
+            self._limit = size
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def or_(self, *args, **kwargs):
+        return self
+
+    def _match(self, row):
+        return all(predicate(row) for predicate in self._filters)
+
+    def execute(self):
+        # Called on the DB executor, like the real sync client
+        if self._db.latency:
+            time.sleep(self._db.latency)
+        self._db.calls[(self._table, self._op)] = self._db.calls.get((self._table, self._op), 0) + 1
+        with self._db.lock:
+            rows = self._db.tables.setdefault(self._table, [])
+            if self._op in ("insert", "upsert"):
+                new = self._payload if isinstance(self._payload, list) else [self._payload]
+                now = datetime.now(timezone.utc).isoformat()
+                new = [{"id": str(uuid.uuid4()), "created_at": now, **r} for r in new]
+                rows.extend(new)
+                return SimpleNamespace(data=new)
+            matched = [r for r in rows if self._match(r)]
+            if self._op == "update":
+                for r in matched:
+                    r.update(self._payload)
+            elif self._op == "delete":
+                self._db.tables[self._table] = [r for r in rows if not self._match(r)]
+            if self._limit is not None:
+                matched = matched[: self._limit]
+            return SimpleNamespace(data=[dict(r) for r in matched])
+
+
+class FakeSupabase:
+    """In-memory tables behind the supabase-py query builder interface."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, List[dict]] = {}
+        self.calls: Dict[tuple, int] = {}
+        self.lock = threading.Lock()
+        self.auth = SimpleNamespace(get_user=self._get_user)
+
+    def _get_user(self, token):
+        return SimpleNamespace(user=SimpleNamespace(id=token, email=f"{token}@bench.local"))
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+
+# --- AssemblyAI streaming -----------------------------------------------------
+
+BENIGN_LINES = [
+    "ok I'm heading to the bus stop now",
+    "can you grab milk on the way back",
+    "the meeting ran late so I'll be home around eight",
+    "yeah traffic is pretty bad on the highway",
+    "let's get dinner somewhere near the station",
+]
+RISKY_LINES = [
+    "give me your phone and don't call anyone",
+    "you're not leaving until I say so",
+]
+
+
+class FakeStreamingClient:
+    """
+    Stands in for assemblyai.streaming.v3.StreamingClient.
+
+    Audio written with stream() is consumed on a worker thread (like the
+    SDK's writer/reader threads). Every `partial_bytes` of audio emits a
+    partial turn and every `turn_bytes` a final turn. Final transcripts
+    carry a unique [marker] whose emit time is recorded in EMITTED_TURNS.
+    """
+
+    turn_bytes = 16000 * 2 * 3      # a final turn every 3 s of 16 kHz s16 audio
+    partial_bytes = 16000 * 2 * 1
+    risky_every = 0                 # every Nth final turn uses a risky line
+    _ids = 0
+    _ids_lock = threading.Lock()
+
+    def __init__(self, options=None):
+        with FakeStreamingClient._ids_lock:
+            FakeStreamingClient._ids += 1
+            self.client_id = FakeStreamingClient._ids
+        self._handlers = {}
+        self._write_queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._bytes = 0
+        self._turns = 0
+
+    def on(self, event, handler):
+        self._handlers.setdefault(event, []).append(handler)
+
+    def connect(self, params=None):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stream(self, data):
+        if isinstance(data, (bytes, bytearray)):
+            self._write_queue.put(bytes(data))
+            return
+        for chunk in data:
+            self._write_queue.put(chunk)
+
+    def disconnect(self, terminate: bool = False):
+        self._write_queue.put(None)
+
+    close = disconnect
+
+    def _emit(self, transcript: str, end_of_turn: bool):
+        from assemblyai.streaming.v3 import StreamingEvents
+        event = SimpleNamespace(transcript=transcript, end_of_turn=end_of_turn, words=[])
+        for handler in self._handlers.get(StreamingEvents.Turn, []):
+            handler(self, event)
+
+    def _run(self):
+        while True:
+            chunk = self._write_queue.get()
+            if chunk is None:
+                return
+            before = self._bytes
+            self._bytes += len(chunk)
+            if before // self.partial_bytes != self._bytes // self.partial_bytes:
+                self._emit("...", False)
+            if before // self.turn_bytes != self._bytes // self.turn_bytes:
+                self._turns += 1
+                if self.risky_every and self._turns % self.risky_every == 0:
+                    line = RISKY_LINES[self._turns % len(RISKY_LINES)]
+                else:
+                    line = BENIGN_LINES[self._turns % len(BENIGN_LINES)]
+                marker = f"c{self.client_id}-t{self._turns}"
+                EMITTED_TURNS[marker] = time.perf_counter()
+                self._emit(f"[{marker}] {line}", True)
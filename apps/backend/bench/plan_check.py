@@ -0,0 +1,288 @@
+# bench/plan_check.py
+"""
+EXPLAIN-based regression check for the backend's database query shapes.
+
+Creates a scratch database on a local Postgres (with pgvector), applies
+schema.sql and migrations/*.sql on top of minimal Supabase stand-ins (auth
+schema, roles), seeds it, and EXPLAINs each query the backend issues. A
+check fails if the plan sequentially scans a table it should reach through
+an index, or if the expected index is not used. It also verifies that the
+trigger-maintained thread_risk_summary matches the raw rows.
+
+    cd apps/backend
+    pip install -r bench/requirements.txt
+    python -m bench.plan_check --dsn postgresql://postgres@localhost/postgres
+    python -m bench.plan_check --dsn ... --users 5000 --keep   # keep the database
+
+Exits 1 if any check fails.
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+from typing import List, Optional
+
+import psycopg
+from psycopg import sql
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUPABASE_STANDINS = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN CREATE ROLE anon NOLOGIN; END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN CREATE ROLE authenticated NOLOGIN; END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN CREATE ROLE service_role NOLOGIN BYPASSRLS; END IF;
+END $$;
+CREATE EXTENSION IF NOT EXISTS vector;
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE TABLE IF NOT EXISTS auth.users (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    email TEXT,
+    raw_user_meta_data JSONB DEFAULT '{}'::jsonb
+);
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql STABLE AS $$ SELECT NULL::UUID $$;
+"""
+
+# Bulk inserts in one statement each, so the summary triggers see whole batches
+# the way log_sink and rescore.py write them.
+SEED = """
+INSERT INTO auth.users (email, raw_user_meta_data)
+SELECT 'user' || i || '@example.com', jsonb_build_object('full_name', 'User ' || i)
+FROM generate_series(1, %(users)s) i;
+
+INSERT INTO public.guardians (user_id, guardian_id, guardian_email, status)
+SELECT p.id, g.id, g.email, CASE WHEN k %% 3 = 0 THEN 'pending' ELSE 'active' END
+FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM public.profiles) p
+CROSS JOIN generate_series(1, 3) k
+JOIN (SELECT id, email, row_number() OVER (ORDER BY id) AS n FROM public.profiles) g
+  ON g.n = (p.n + k * 7) %% %(users)s + 1;
+
+INSERT INTO public.threads (user_id, initial_context, created_at)
+SELECT p.id, 'context ' || k, now() - (random() * interval '90 days')
+FROM public.profiles p CROSS JOIN generate_series(1, %(threads)s) k;
+
+INSERT INTO public.logs (thread_id, content, speaker_label, created_at)
+SELECT t.id, 'turn ' || k, 'user', t.created_at + k * interval '5 seconds'
+FROM public.threads t CROSS JOIN generate_series(1, %(logs)s) k;
+
+INSERT INTO public.risk_scores (thread_id, score, level, reason, created_at)
+SELECT id, score,
+       CASE WHEN score >= 85 THEN 'critical' WHEN score >= 70 THEN 'high'
+            WHEN score >= 40 THEN 'medium' ELSE 'low' END,
+       'seed', created_at
+FROM (
+    SELECT t.id, (random() * 100)::INT AS score, t.created_at + k * interval '10 seconds' AS created_at
+    FROM public.threads t CROSS JOIN generate_series(1, %(scores)s) k
+) s;
+
+INSERT INTO public.notifications (user_id, type, title, created_at)
+SELECT p.id, 'system', 'note ' || k, now() - k * interval '1 hour'
+FROM public.profiles p CROSS JOIN generate_series(1, %(notifications)s) k;
+"""
+
+# (name, query, tables that must not be seq-scanned, expected index)
+CHECKS = [
+    ("thread logs page", """
+        SELECT * FROM public.logs WHERE thread_id = %(thread_id)s
+        ORDER BY created_at, id LIMIT 501
+     """, ["logs"], "logs_thread_id_created_at_idx"),
+    ("thread logs after cursor", """
+        SELECT * FROM public.logs WHERE thread_id = %(thread_id)s
+          AND (created_at > %(log_at)s OR (created_at = %(log_at)s AND id > %(log_id)s))
+        ORDER BY created_at, id LIMIT 501
+     """, ["logs"], "logs_thread_id_created_at_idx"),
+    ("session resume (latest logs)", """
+        SELECT content, latitude, longitude FROM public.logs WHERE thread_id = %(thread_id)s
+        ORDER BY created_at DESC, id DESC LIMIT 50
+     """, ["logs"], "logs_thread_id_created_at_idx"),
+    ("thread risk scores page", """
+        SELECT * FROM public.risk_scores WHERE thread_id = %(thread_id)s
+        ORDER BY created_at, id LIMIT 501
+     """, ["risk_scores"], "risk_scores_thread_id_created_at_idx"),
+    ("history summary page", """
+        SELECT t.id, t.user_id, t.initial_context, t.created_at, s.*
+        FROM public.threads t
+        LEFT JOIN LATERAL (
+            SELECT turn_count, last_log_at, max_score, last_score, last_level, last_risk_at
+            FROM public.thread_risk_summary WHERE thread_id = t.id
+        ) s ON true
+        WHERE t.user_id = %(user_id)s
+        ORDER BY t.created_at DESC, t.id DESC LIMIT 51
+     """, ["threads", "thread_risk_summary"], "threads_user_id_created_at_idx"),
+    ("history summary row lookup", """
+        SELECT * FROM public.thread_risk_summary WHERE thread_id = %(thread_id)s
+     """, ["thread_risk_summary"], "thread_risk_summary_pkey"),
+    ("guardians of ward", """
+        SELECT guardian_id, status FROM public.guardians WHERE user_id = %(user_id)s
+     """, ["guardians"], "guardians_user_id_status_idx"),
+    ("active wards of guardian", """
+        SELECT user_id FROM public.guardians WHERE guardian_id = %(guardian_id)s AND status = 'active'
+     """, ["guardians"], "guardians_guardian_id_status_idx"),
+    ("guarding relationships", """
+        SELECT * FROM public.guardians WHERE guardian_id = %(guardian_id)s
+     """, ["guardians"], "guardians_guardian_id_status_idx"),
+    ("notifications", """
+        SELECT * FROM public.notifications WHERE user_id = %(user_id)s ORDER BY created_at DESC
+     """, ["notifications"], "notifications_user_id_created_at_idx"),
+    ("profile by email", """
+        SELECT id FROM public.profiles WHERE email = %(email)s
+     """, ["profiles"], "profiles_email_key"),
+]
+
+SUMMARY_DRIFT = """
+SELECT count(*) FROM public.threads t
+LEFT JOIN public.thread_risk_summary s ON s.thread_id = t.id
+LEFT JOIN LATERAL (
+    SELECT count(*)::INT AS turn_count, max(created_at) AS last_log_at FROM public.logs WHERE thread_id = t.id
+) l ON true
+LEFT JOIN LATERAL (
+    SELECT max(score) AS max_score FROM public.risk_scores WHERE thread_id = t.id
+) r ON true
+LEFT JOIN LATERAL (
+    SELECT score, created_at FROM public.risk_scores WHERE thread_id = t.id ORDER BY created_at DESC, id DESC LIMIT 1
+) last ON true
+WHERE COALESCE(s.turn_count, 0) IS DISTINCT FROM l.turn_count
+   OR s.last_log_at IS DISTINCT FROM l.last_log_at
+   OR s.max_score IS DISTINCT FROM r.max_score
+   OR s.last_score IS DISTINCT FROM last.score
+   OR s.last_risk_at IS DISTINCT FROM last.created_at
+"""
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(conn, query: str, params: dict):
+    row = conn.execute(f"EXPLAIN (FORMAT JSON) {query}", params).fetchone()
+    return row[0][0]["Plan"]
+
+
+def check_plan(plan: dict, tables: List[str], index: str):
+    """Returns (ok, indexes used, tables seq-scanned)."""
+    used, seq = set(), set()
+    for node in plan_nodes(plan):
+        if node.get("Index Name"):
+            used.add(node["Index Name"])
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in tables:
+            seq.add(node["Relation Name"])
+    return index in used and not seq, used, seq
+
+
+def setup(conn, args):
+    conn.execute(SUPABASE_STANDINS)
+    files = [os.path.join(BACKEND_DIR, "schema.sql")] + sorted(glob.glob(os.path.join(BACKEND_DIR, "migrations", "*.sql")))
+    for path in files:
+        with open(path) as f:
+            conn.execute(f.read())
+        print(f"plan_check: applied {os.path.relpath(path, BACKEND_DIR)}")
+
+    started = time.monotonic()
+    params = {
+        "users": args.users,
+        "threads": args.threads_per_user,
+        "logs": args.logs_per_thread,
+        "scores": args.scores_per_thread,
+        "notifications": args.notifications_per_user,
+    }
+    for statement in SEED.split(";\n"):
+        if statement.strip():
+            conn.execute(statement, params)
+
+    # Exercise the incremental paths the seed doesn't: an older rescore-style
+    # score, a single live insert and a delete.
+    thread_id = conn.execute("SELECT id FROM public.threads ORDER BY id LIMIT 1").fetchone()[0]
+    conn.execute(
+        "INSERT INTO public.risk_scores (thread_id, score, level, reason, created_at) "
+        "VALUES (%s, 100, 'critical', 'historical', now() - interval '1 year')", (thread_id,)
+    )
+    conn.execute("INSERT INTO public.logs (thread_id, content) VALUES (%s, 'live turn')", (thread_id,))
+    conn.execute(
+        "DELETE FROM public.logs WHERE id IN (SELECT id FROM public.logs WHERE thread_id = %s ORDER BY created_at LIMIT 3)",
+        (thread_id,),
+    )
+    conn.execute("DELETE FROM public.threads WHERE id = (SELECT id FROM public.threads ORDER BY id DESC LIMIT 1)")
+    conn.execute("ANALYZE")
+    print(f"plan_check: seeded in {time.monotonic() - started:.1f}s")
+
+
+def sample_params(conn) -> dict:
+    thread_id, user_id = conn.execute(
+        "SELECT id, user_id FROM public.threads ORDER BY id OFFSET (SELECT count(*) / 2 FROM public.threads) LIMIT 1"
+    ).fetchone()
+    log_id, log_at = conn.execute(
+        "SELECT id, created_at FROM public.logs WHERE thread_id = %s ORDER BY created_at, id LIMIT 1 OFFSET 2", (thread_id,)
+    ).fetchone()
+    guardian_id = conn.execute(
+        "SELECT guardian_id FROM public.guardians WHERE status = 'active' ORDER BY id LIMIT 1"
+    ).fetchone()[0]
+    email = conn.execute("SELECT email FROM public.profiles WHERE id = %s", (user_id,)).fetchone()[0]
+    return {
+        "thread_id": thread_id,
+        "user_id": user_id,
+        "log_id": log_id,
+        "log_at": log_at,
+        "guardian_id": guardian_id,
+        "email": email,
+    }
+
+
+def run_checks(conn, verbose: bool) -> int:
+    params = sample_params(conn)
+    failures = 0
+    for name, query, tables, index in CHECKS:
+        plan = explain(conn, query, params)
+        ok, used, seq = check_plan(plan, tables, index)
+        detail = f"indexes={sorted(used) or '-'}" + (f" seq_scan={sorted(seq)}" if seq else "")
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<30} {detail}")
+        if not ok:
+            failures += 1
+        if verbose or not ok:
+            for (line,) in conn.execute(f"EXPLAIN {query}", params):
+                print(f"      {line}")
+
+    drift = conn.execute(SUMMARY_DRIFT).fetchone()[0]
+    print(f"{'PASS' if not drift else 'FAIL'}  {'thread_risk_summary in sync':<30} {drift} thread(s) differ")
+    return failures + (1 if drift else 0)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN the backend's query shapes against a scratch database.")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"), help="local Postgres to create the scratch database on")
+    parser.add_argument("--database", default="aegis_plan_check", help="name of the scratch database (dropped first)")
+    parser.add_argument("--users", type=int, default=1000,
+                        help="much smaller datasets make seq scans the right plan for small tables")
+    parser.add_argument("--threads-per-user", type=int, default=10)
+    parser.add_argument("--logs-per-thread", type=int, default=20)
+    parser.add_argument("--scores-per-thread", type=int, default=10)
+    parser.add_argument("--notifications-per-user", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="leave the scratch database in place")
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not only failing ones")
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error("--dsn or DATABASE_URL is required")
+
+    database = sql.Identifier(args.database)
+    with psycopg.connect(args.dsn, autocommit=True) as admin:
+        admin.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(database))
+        admin.execute(sql.SQL("CREATE DATABASE {}").format(database))
+        dsn = psycopg.conninfo.make_conninfo(args.dsn, dbname=args.database)
+        try:
+            with psycopg.connect(dsn, autocommit=True) as conn:
+                setup(conn, args)
+                failures = run_checks(conn, args.verbose)
+        finally:
+            if not args.keep:
+                admin.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(database))
+
+    print(f"plan_check: {failures} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
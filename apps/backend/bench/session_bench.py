@@ -0,0 +1,321 @@
+# bench/session_bench.py
+"""
+End-to-end load test for /ws/{thread_id} sessions.
+
+Runs the FastAPI app in-process under uvicorn with Supabase, AssemblyAI and
+Gemini replaced by local stand-ins (bench/fakes.py and the stub RiskEngine),
+then drives N concurrent sessions that stream 16 kHz PCM plus chat/location
+messages in real time.
+
+    cd apps/backend
+    python -m bench.session_bench --sessions 200 --duration 60 --out report.json
+    python -m bench.session_bench --sessions 200 --compare baseline.json
+
+Reports (JSON): echo latency (STT final turn -> is_final send), chat echo
+latency, risk latency (turn -> risk message), server event-loop lag, thread
+count and RSS per session. --compare exits non-zero if any p99 regresses by
+more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import math
+import socket
+import asyncio
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+from bench import fakes
+
+
+def percentiles(values: List[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(math.ceil(p / 100 * len(ordered))) - 1)], 3)
+
+    return {
+        "count": len(ordered),
+        "p50": pct(50),
+        "p90": pct(90),
+        "p99": pct(99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def synthetic_pcm(seconds: float, sample_rate: int = 16000) -> bytes:
+    """Alternating 1.5 s of 220 Hz tone and 1.5 s of silence, s16le mono."""
+    import array
+    samples = array.array("h")
+    for i in range(int(seconds * sample_rate)):
+        t = i / sample_rate
+        voiced = int(t / 1.5) % 2 == 0
+        samples.append(int(8000 * math.sin(2 * math.pi * 220 * t)) if voiced else 0)
+    return samples.tobytes()
+
+
+BENCH_JWT_SECRET = "bench-jwt-secret-for-local-load-tests"
+
+
+def bench_token(user_id: str) -> str:
+    import jwt
+    claims = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 3600}
+    return jwt.encode(claims, BENCH_JWT_SECRET, algorithm="HS256")
+
+
+def install_fakes(args):
+    """Patch external clients before the app modules are imported."""
+    os.environ.setdefault("SUPABASE_URL", "http://supabase.bench.local")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+    os.environ["RISK_ENGINE"] = "stub"
+    os.environ["RISK_STUB_LATENCY"] = args.llm_latency
+    os.environ["RISK_STUB_SEED"] = "7"
+    # Sessions authenticate with locally signed tokens (see bench_token)
+    os.environ["SUPABASE_JWT_SECRET"] = BENCH_JWT_SECRET
+    # Server logs go to stderr so stdout carries only the report
+    os.environ.setdefault("LOG_STREAM", "stderr")
+
+    fake_db = fakes.FakeSupabase(latency=args.db_latency_ms / 1000)
+    import supabase as supabase_pkg
+    supabase_pkg.create_client = lambda *a, **k: fake_db
+
+    import assemblyai.streaming.v3 as aai_v3
+    aai_v3.StreamingClient = fakes.FakeStreamingClient
+    fakes.FakeStreamingClient.risky_every = args.risky_every
+    return fake_db
+
+
+class ServerThread(threading.Thread):
+    """uvicorn on its own thread and loop, with an event-loop lag probe."""
+
+    def __init__(self, app, port: int, probe_interval: float = 0.01):
+        super().__init__(daemon=True)
+        import uvicorn
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets"))
+        self.probe_interval = probe_interval
+        self.loop_lag_ms: List[float] = []
+        self.ready = threading.Event()
+
+    async def _probe(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.probe_interval)
+            self.loop_lag_ms.append((time.perf_counter() - start - self.probe_interval) * 1000)
+
+    async def _main(self):
+        probe = asyncio.create_task(self._probe())
+        serve = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        self.ready.set()
+        await serve
+        probe.cancel()
+
+    def run(self):
+        asyncio.run(self._main())
+
+    def stop(self):
+        self.server.should_exit = True
+
+
+class SessionStats:
+    def __init__(self):
+        self.echo_ms: List[float] = []
+        self.chat_echo_ms: List[float] = []
+        self.risk_ms: List[float] = []
+        self.errors = 0
+        self.risk_messages = 0
+
+
+async def run_session(index: int, url: str, pcm: bytes, args, stats: SessionStats):
+    import websockets
+
+    chunk_bytes = int(16000 * 2 * args.chunk_ms / 1000)
+    chunk_delay = args.chunk_ms / 1000 / args.speed
+    pending_turns: List[float] = []   # emit times of final turns not yet covered by a risk message
+    chat_sent: Dict[str, float] = {}
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            async def reader():
+                async for raw in ws:
+                    now = time.perf_counter()
+                    msg = json.loads(raw)
+                    if msg.get("is_final") and msg.get("transcript", "").startswith("["):
+                        marker = msg["transcript"][1:msg["transcript"].index("]")]
+                        if marker in chat_sent:
+                            stats.chat_echo_ms.append((now - chat_sent.pop(marker)) * 1000)
+                        elif marker in fakes.EMITTED_TURNS:
+                            emitted = fakes.EMITTED_TURNS.pop(marker)
+                            stats.echo_ms.append((now - emitted) * 1000)
+                            pending_turns.append(emitted)
+                    elif "risk" in msg and not msg.get("provisional"):
+                        stats.risk_messages += 1
+                        if pending_turns:
+                            stats.risk_ms.append((now - pending_turns[0]) * 1000)
+                            pending_turns.clear()
+
+            read_task = asyncio.create_task(reader())
+            deadline = time.perf_counter() + args.duration
+            offset, sent_chunks, chats = 0, 0, 0
+            while time.perf_counter() < deadline:
+                chunk = pcm[offset:offset + chunk_bytes]
+                offset = (offset + chunk_bytes) % max(len(pcm) - chunk_bytes, 1)
+                await ws.send(chunk)
+                sent_chunks += 1
+
+                elapsed_s = sent_chunks * args.chunk_ms / 1000
+                if args.chat_every and elapsed_s >= (chats + 1) * args.chat_every:
+                    chats += 1
+                    marker = f"chat-s{index}-{chats}"
+                    chat_sent[marker] = time.perf_counter()
+                    await ws.send(json.dumps({"type": "chat", "text": f"[{marker}] are you still there?"}))
+                if sent_chunks % max(int(5000 / args.chunk_ms), 1) == 0:
+                    await ws.send(json.dumps({"type": "location", "lat": 40.0 + index * 1e-4, "lon": -74.0}))
+                await asyncio.sleep(chunk_delay)
+
+            # Give the last assessments a moment to come back
+            await asyncio.sleep(args.drain)
+            read_task.cancel()
+    except Exception as e:
+        stats.errors += 1
+        print(f"Session {index} error: {e}", file=sys.stderr)
+
+
+async def drive(args, port: int, server: ServerThread, fake_db):
+    pcm = open(args.pcm, "rb").read() if args.pcm else synthetic_pcm(30)
+    stats = SessionStats()
+    baseline_threads = threading.active_count()
+    baseline_rss = rss_mb()
+    peak = {"threads": baseline_threads, "rss": baseline_rss}
+
+    async def sampler():
+        while True:
+            peak["threads"] = max(peak["threads"], threading.active_count())
+            peak["rss"] = max(peak["rss"], rss_mb())
+            await asyncio.sleep(0.5)
+
+    sample_task = asyncio.create_task(sampler())
+    sessions = []
+    for i in range(args.sessions):
+        thread_id = f"bench-thread-{i}"
+        user_id = f"bench-user-{i}"
+        fake_db.tables.setdefault("threads", []).append({"id": thread_id, "user_id": user_id, "initial_context": "walking home"})
+        url = f"ws://127.0.0.1:{port}/ws/{thread_id}?token={bench_token(user_id)}"
+        sessions.append(asyncio.create_task(run_session(i, url, pcm, args, stats)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.sessions)
+    await asyncio.gather(*sessions)
+    sample_task.cancel()
+
+    lag = server.loop_lag_ms
+    return {
+        "config": {
+            "sessions": args.sessions,
+            "duration_s": args.duration,
+            "speed": args.speed,
+            "chunk_ms": args.chunk_ms,
+            "llm_latency": args.llm_latency,
+            "db_latency_ms": args.db_latency_ms,
+        },
+        "echo_latency_ms": percentiles(stats.echo_ms),
+        "chat_echo_latency_ms": percentiles(stats.chat_echo_ms),
+        "risk_latency_ms": percentiles(stats.risk_ms),
+        "event_loop_lag_ms": percentiles(lag),
+        "risk_messages": stats.risk_messages,
+        "errors": stats.errors,
+        "threads": {
+            "baseline": baseline_threads,
+            "peak": peak["threads"],
+            "per_session": round((peak["threads"] - baseline_threads) / max(args.sessions, 1), 3),
+        },
+        "memory": {
+            "rss_baseline_mb": round(baseline_rss, 1),
+            "rss_peak_mb": round(peak["rss"], 1),
+            "per_session_kb": round((peak["rss"] - baseline_rss) * 1000 / max(args.sessions, 1), 1),
+        },
+        "db_calls": {f"{t}.{op}": n for (t, op), n in sorted(fake_db.calls.items())},
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for key in ("echo_latency_ms", "chat_echo_latency_ms", "risk_latency_ms", "event_loop_lag_ms"):
+        new, old = report.get(key, {}).get("p99"), baseline.get(key, {}).get("p99")
+        if new is not None and old and new > old * (1 + tolerance):
+            regressions.append(f"{key}.p99 {old} -> {new}")
+    new, old = report["threads"]["per_session"], baseline.get("threads", {}).get("per_session")
+    if old is not None and new > old * (1 + tolerance) + 0.01:
+        regressions.append(f"threads.per_session {old} -> {new}")
+    return regressions
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load-test /ws/{thread_id} sessions with local stand-ins.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of audio per session")
+    parser.add_argument("--speed", type=float, default=1.0, help="audio send rate multiplier (1 = real time)")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="audio frame size sent per WebSocket message")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which sessions connect")
+    parser.add_argument("--drain", type=float, default=3, help="seconds to wait for late messages")
+    parser.add_argument("--pcm", help="raw 16 kHz mono s16le file to stream (default: synthetic)")
+    parser.add_argument("--chat-every", type=float, default=10, help="send a chat message every N seconds (0 = off)")
+    parser.add_argument("--risky-every", type=int, default=7, help="every Nth STT turn is a risky line (0 = never)")
+    parser.add_argument("--llm-latency", default="lognormal:800,0.4", help="stub RiskEngine latency distribution")
+    parser.add_argument("--db-latency-ms", type=float, default=15)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="baseline report to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p99 regression ratio for --compare")
+    args = parser.parse_args(argv)
+
+    fake_db = install_fakes(args)
+    import main as app_module
+
+    port = free_port()
+    server = ServerThread(app_module.app, port)
+    server.start()
+    server.ready.wait(timeout=30)
+    try:
+        report = asyncio.run(drive(args, port, server, fake_db))
+    finally:
+        server.stop()
+        server.join(timeout=10)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("REGRESSIONS:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# db.py
+import os
+import asyncio
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Tuple
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
+
+from metrics import DB_SECONDS, DB_QUEUED, EXECUTOR_THREADS
+from telemetry import get_logger
+
+log = get_logger("db")
+
+# Setup Supabase
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+if not SUPABASE_URL or not SUPABASE_KEY:
+    log.warning("SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY not found in environment variables.")
+    supabase: Client = None
+else:
+    # Explicitly set the schema to 'public'. One client per process: its
+    # PostgREST session (and HTTP connection pool) is shared by every query.
+    supabase: Client = create_client(
+        SUPABASE_URL,
+        SUPABASE_KEY,
+        options=ClientOptions(schema="public")
+    )
+
+# supabase-py is synchronous, so queries run on a bounded pool instead of the
+# event loop. The pool size caps concurrent DB round-trips per worker.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "16"))
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="supabase")
+EXECUTOR_THREADS.labels(pool="db").set_function(lambda: len(_executor._threads))
+DB_QUEUED.set_function(lambda: _executor._work_queue.qsize())
+
+_METHOD_OPS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+def _describe(query) -> Tuple[str, str]:
+    """(table, op) labels for a PostgREST request builder."""
+    request = getattr(query, "request", None)
+    if request is None:
+        return "unknown", "execute"
+    parts = urlparse(str(request.path)).path.rstrip("/").split("/")
+    if len(parts) > 1 and parts[-2] == "rpc":
+        return parts[-1], "rpc"
+    op = _METHOD_OPS.get(str(request.http_method).upper(), "execute")
+    if op == "insert" and "resolution=" in (request.headers.get("prefer") or ""):
+        op = "upsert"
+    return parts[-1], op
+
+
+async def execute(query) -> Any:
+    """
+    Runs a prepared supabase query builder off the event loop.
+
+    Usage: res = await execute(supabase.table("logs").select("*").eq("thread_id", tid))
+    """
+    table, op = _describe(query)
+    loop = asyncio.get_running_loop()
+    with DB_SECONDS.labels(table=table, op=op).time():
+        return await loop.run_in_executor(_executor, query.execute)
+
+
+async def run(fn: Callable, *args) -> Any:
+    """Runs any other blocking supabase call (auth, storage) on the DB pool."""
+    loop = asyncio.get_running_loop()
+    with DB_SECONDS.labels(table="-", op=getattr(fn, "__name__", "call")).time():
+        return await loop.run_in_executor(_executor, fn, *args)
+
+
+def shutdown():
+    _executor.shutdown(wait=True, cancel_futures=False)
@@ -0,0 +1,100 @@
+# guardian_index.py
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from db import supabase, execute
+
+GUARDIAN_CACHE_TTL_S = int(os.getenv("GUARDIAN_CACHE_TTL_S", "60"))
+# Entries kept per direction; least recently used ones are evicted first
+GUARDIAN_CACHE_SIZE = int(os.getenv("GUARDIAN_CACHE_SIZE", "10000"))
+
+
+class GuardianIndex:
+    """
+    In-memory view of the guardians table in both directions:
+    ward -> {guardian_id: status} and guardian -> {active ward ids}.
+
+    Entries load lazily with one query per ward (or guardian), expire after
+    ttl seconds, and each direction keeps at most max_entries (LRU).
+    Endpoints that change a relationship broadcast it over the live bus
+    (main._guardians_changed), which calls invalidate() on every worker.
+    Without a bus (no SESSION_STORE_URL) only the worker that made the change
+    is invalidated; others see it within GUARDIAN_CACHE_TTL_S.
+    """
+
+    def __init__(self, ttl: float = GUARDIAN_CACHE_TTL_S, max_entries: int = GUARDIAN_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._by_ward: "OrderedDict[str, Tuple[Dict[str, str], float]]" = OrderedDict()
+        self._by_guardian: "OrderedDict[str, Tuple[Set[str], float]]" = OrderedDict()
+
+    def _fresh(self, entry) -> bool:
+        return entry is not None and time.monotonic() - entry[1] < self.ttl
+
+    def _get(self, cache: OrderedDict, key: str):
+        entry = cache.get(key)
+        if entry is not None:
+            cache.move_to_end(key)
+        return entry
+
+    def _put(self, cache: OrderedDict, key: str, value):
+        cache[key] = (value, time.monotonic())
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    async def _load_ward(self, ward_id: str) -> Dict[str, str]:
+        res = await execute(supabase.table("guardians").select("guardian_id, status").eq("user_id", ward_id))
+        # A guardian can have more than one row (e.g. a leftover invite);
+        # an active one wins over any other status
+        statuses: Dict[str, str] = {}
+        for g in res.data:
+            guardian_id = g.get("guardian_id")
+            if guardian_id and statuses.get(guardian_id) != "active":
+                statuses[guardian_id] = g.get("status")
+        self._put(self._by_ward, ward_id, statuses)
+        return statuses
+
+    async def _load_guardian(self, guardian_id: str) -> Set[str]:
+        res = await execute(supabase.table("guardians").select("user_id").eq("guardian_id", guardian_id).eq("status", "active"))
+        wards = {g["user_id"] for g in res.data if g.get("user_id")}
+        self._put(self._by_guardian, guardian_id, wards)
+        return wards
+
+    async def guardians_of(self, ward_id: str) -> Dict[str, str]:
+        entry = self._get(self._by_ward, ward_id)
+        if self._fresh(entry):
+            return entry[0]
+        return await self._load_ward(ward_id)
+
+    async def active_guardians(self, ward_id: str) -> List[str]:
+        statuses = await self.guardians_of(ward_id)
+        return [g_id for g_id, status in statuses.items() if status == "active"]
+
+    async def wards_of(self, guardian_id: str) -> Set[str]:
+        entry = self._get(self._by_guardian, guardian_id)
+        if self._fresh(entry):
+            return entry[0]
+        return await self._load_guardian(guardian_id)
+
+    async def is_guardian(self, guardian_id: str, ward_id: str) -> bool:
+        # Answer from whichever side is already cached before querying
+        ward_entry = self._get(self._by_ward, ward_id)
+        if self._fresh(ward_entry):
+            return ward_entry[0].get(guardian_id) == "active"
+        guardian_entry = self._get(self._by_guardian, guardian_id)
+        if self._fresh(guardian_entry):
+            return ward_id in guardian_entry[0]
+        statuses = await self._load_ward(ward_id)
+        return statuses.get(guardian_id) == "active"
+
+    def invalidate(self, ward_id: Optional[str] = None, guardian_id: Optional[str] = None):
+        if ward_id:
+            self._by_ward.pop(ward_id, None)
+        if guardian_id:
+            self._by_guardian.pop(guardian_id, None)
+
+
+guardian_index = GuardianIndex()
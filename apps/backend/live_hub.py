@@ -0,0 +1,163 @@
+# live_hub.py
+import json
+import uuid
+import asyncio
+from typing import Callable, Dict, List, Optional, Set
+
+from telemetry import get_logger
+
+log = get_logger("live_hub")
+
+# Identifies this process on the cross-worker bus so it can skip its own echoes
+WORKER_ID = uuid.uuid4().hex
+# Bus channel for broadcast() events, e.g. cache invalidations
+CONTROL_CHANNEL = "live-control"
+
+
+class LiveHub:
+    """
+    In-process pub/sub for live session events, keyed by thread_id.
+
+    monitor_audio publishes transcript/risk/location deltas; guardian
+    watchers subscribe and receive them without touching the database.
+    Each subscriber has a bounded queue; a slow watcher loses its oldest
+    events rather than slowing down the session.
+
+    With a bus attached (start_bus), events are also relayed to the other
+    workers, so a watcher on any worker sees a session running on another.
+    broadcast() runs the on_control handlers of every worker the same way.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._control_handlers: List[Callable[[dict], None]] = []
+        self._bus: Optional["RedisBus"] = None
+
+    def subscribe(self, thread_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(thread_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, thread_id: str, queue: asyncio.Queue):
+        subs = self._subscribers.get(thread_id)
+        if not subs:
+            return
+        subs.discard(queue)
+        if not subs:
+            del self._subscribers[thread_id]
+
+    def has_subscribers(self, thread_id: str) -> bool:
+        return bool(self._subscribers.get(thread_id))
+
+    def deliver(self, thread_id: str, event: dict):
+        """Fan an event out to this worker's subscribers only."""
+        for queue in self._subscribers.get(thread_id, ()):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    def publish(self, thread_id: str, event: dict):
+        self.deliver(thread_id, event)
+        if self._bus is not None:
+            self._bus.send(f"live:{thread_id}", event)
+
+    def on_control(self, handler: Callable[[dict], None]):
+        """Registers handler(event) for broadcast() events from any worker."""
+        self._control_handlers.append(handler)
+
+    def control(self, event: dict):
+        """Runs this worker's control handlers only."""
+        for handler in self._control_handlers:
+            try:
+                handler(event)
+            except Exception:
+                log.exception("Live control handler error", extra={"event": event.get("type")})
+
+    def broadcast(self, event: dict):
+        """Runs the control handlers here at once and on other workers via the bus."""
+        self.control(event)
+        if self._bus is not None:
+            self._bus.send(CONTROL_CHANNEL, event)
+
+    async def start_bus(self, url: str):
+        self._bus = RedisBus(url, self)
+        await self._bus.start()
+
+    async def close(self):
+        if self._bus is not None:
+            await self._bus.close()
+            self._bus = None
+
+
+class RedisBus:
+    """
+    Relays LiveHub events between workers over Redis pub/sub. Outgoing
+    events go through one sender task so they keep their publish order.
+    """
+
+    def __init__(self, url: str, hub: LiveHub, max_pending: int = 10000):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._hub = hub
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self._tasks = []
+
+    async def start(self):
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.psubscribe("live:*")
+        await self._pubsub.subscribe(CONTROL_CHANNEL)
+        self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._send_loop())]
+
+    def send(self, channel: str, event: dict):
+        try:
+            self._outbox.put_nowait((channel, event))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                log.warning("Live bus outbox full, dropping events", extra={"dropped": self.dropped})
+
+    async def _send_loop(self):
+        while True:
+            channel, event = await self._outbox.get()
+            try:
+                await self._redis.publish(channel, json.dumps({"origin": WORKER_ID, "event": event}))
+            except Exception as e:
+                log.warning("Live bus publish error", extra={"channel": channel, "error": repr(e)})
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") == "message" and message["channel"] == CONTROL_CHANNEL:
+                        data = json.loads(message["data"])
+                        if data.get("origin") != WORKER_ID:
+                            self._hub.control(data["event"])
+                        continue
+                    if message.get("type") != "pmessage":
+                        continue
+                    thread_id = message["channel"].split(":", 1)[1]
+                    if not self._hub.has_subscribers(thread_id):
+                        continue
+                    data = json.loads(message["data"])
+                    if data.get("origin") != WORKER_ID:
+                        self._hub.deliver(thread_id, data["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Live bus listen error")
+                await asyncio.sleep(1)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+
+live_hub = LiveHub()
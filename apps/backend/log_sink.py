@@ -0,0 +1,193 @@
+# log_sink.py
+import os
+import uuid
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from db import supabase, execute
+from telemetry import get_logger
+
+log = get_logger("log_sink")
+
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("LOG_FLUSH_INTERVAL_MS", "500"))
+LOG_MAX_BUFFERED = int(os.getenv("LOG_MAX_BUFFERED", "10000"))
+
+# SQLSTATE classes that retrying the same rows can't fix: data exceptions
+# (22, e.g. a malformed uuid), constraint violations (23, e.g. a missing
+# thread) and schema errors (42). Other failures count as transient.
+_PERMANENT_SQLSTATE_CLASSES = ("22", "23", "42")
+
+
+def _is_permanent(error: Exception) -> bool:
+    code = getattr(error, "code", None)
+    return isinstance(code, str) and code[:2] in _PERMANENT_SQLSTATE_CLASSES
+
+
+class LogSink:
+    """
+    Process-wide buffered writer for a table. Rows from every session are
+    batched and written with one bulk insert per flush, either when
+    batch_size rows are waiting or every flush_interval seconds.
+
+    Memory is bounded by max_buffered: put() waits up to put_timeout for
+    room (backpressure), after which the oldest buffered rows are dropped.
+    Batches that fail transiently are retried with exponential backoff and
+    then put back at the front of the buffer, subject to the same bound. A
+    batch the database rejects outright (see _is_permanent) is split in
+    halves until the offending rows are isolated; those are logged and
+    dropped, and the rest is written.
+
+    Rows are stamped with created_at when queued, strictly increasing within
+    the process. A batch is one INSERT, so the column default (now()) would
+    give every row in it the same time and lose turn order.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL_MS / 1000,
+        max_buffered: int = LOG_MAX_BUFFERED,
+        max_attempts: int = 4,
+        put_timeout: float = 1.0,
+    ):
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.max_attempts = max_attempts
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.rejected = 0
+        self._last_stamp = datetime.min.replace(tzinfo=timezone.utc)
+
+        self._buffer: List[dict] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._wake = self._wake or asyncio.Event()
+            self._space = self._space or asyncio.Condition()
+            self._lock = self._lock or asyncio.Lock()
+            self._worker = asyncio.create_task(self._run())
+
+    def _stamp(self) -> str:
+        now = datetime.now(timezone.utc)
+        if now <= self._last_stamp:
+            now = self._last_stamp + timedelta(microseconds=1)
+        self._last_stamp = now
+        return now.isoformat()
+
+    async def put(self, row: dict):
+        """
+        Queues row for insert. Sets row["id"] and row["created_at"] if they
+        aren't set, so live events carry the key the row is stored under.
+        """
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", self._stamp())
+        if not supabase or self._closed:
+            return
+        self._ensure_started()
+        if len(self._buffer) >= self.max_buffered:
+            async with self._space:
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: len(self._buffer) < self.max_buffered),
+                        self.put_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        self._buffer.append(row)
+        self._trim()
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self):
+        """Writes everything buffered so far. Used on disconnect and shutdown."""
+        if self._worker is None:
+            return
+        await self._drain()
+
+    async def close(self):
+        self._closed = True
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except (asyncio.CancelledError, Exception):
+            pass
+        await self._drain()
+
+    def _trim(self):
+        overflow = len(self._buffer) - self.max_buffered
+        if overflow > 0:
+            del self._buffer[:overflow]
+            before = self.dropped
+            self.dropped += overflow
+            if before // 100 != self.dropped // 100 or before == 0:
+                log.warning("Buffer full, dropping oldest rows", extra={"table": self.table, "dropped": self.dropped})
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._drain()
+
+    async def _drain(self):
+        async with self._lock:
+            while self._buffer:
+                batch = self._buffer[: self.batch_size]
+                del self._buffer[: self.batch_size]
+                async with self._space:
+                    self._space.notify_all()
+                unwritten = await self._write(batch)
+                if unwritten:
+                    # Keep the rows for the next flush, within the memory bound
+                    self._buffer[:0] = unwritten
+                    self._trim()
+                    return
+
+    async def _write(self, rows: List[dict]) -> List[dict]:
+        """Writes rows; returns the tail that failed transiently (empty when done)."""
+        delay = 0.2
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await execute(supabase.table(self.table).insert(rows))
+                return []
+            except Exception as e:
+                if _is_permanent(e):
+                    return await self._split(rows, e)
+                log.warning("Insert error", extra={
+                    "table": self.table, "attempt": attempt, "max_attempts": self.max_attempts, "rows": len(rows), "error": repr(e),
+                })
+                if attempt < self.max_attempts and not self._closed:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+        return rows
+
+    async def _split(self, rows: List[dict], error: Exception) -> List[dict]:
+        if len(rows) == 1:
+            self.rejected += 1
+            log.error("Row rejected, dropping it", extra={
+                "table": self.table, "row": rows[0], "rejected": self.rejected, "error": repr(error),
+            })
+            return []
+        middle = len(rows) // 2
+        left = await self._write(rows[:middle])
+        if left:
+            return left + rows[middle:]
+        return await self._write(rows[middle:])
+
+
+# Shared sink for transcript rows across all sessions
+log_sink = LogSink("logs")
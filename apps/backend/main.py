@@ -1,41 +1,68 @@
 import os
 import json
+import uuid
+import time
 import asyncio
-from typing import Optional
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, File, UploadFile, Body, Query, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, File, UploadFile, Body, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client, Client
-from supabase.lib.client_options import ClientOptions
 import assemblyai as aai
 from auth_utils import get_current_user
-from risk_analysis import assess_danger
+from db import supabase, execute, shutdown as shutdown_db
+from log_sink import log_sink
+from alerts import alert_dispatcher
+from live_hub import live_hub
+from session_store import session_store, SESSION_STORE_URL, SESSION_STORE_MAX_TURNS
+from guardian_index import guardian_index
+from audio_pipeline import AudioPipe
+from audio_preprocess import AudioPreprocessor
+from voice import AudioRing, VOICE_FINGERPRINT_VERSION, decode_wav, embed, turn_audio
+from speaker_id import speaker_directory, SPEAKER_ID_TIMEOUT_S
+from pagination import encode_cursor, decode_cursor, keyset, page, row_position
+from risk_analysis import assess_danger, prescreen
+from risk_cache import risk_cache
+from telemetry import TurnTrace, get_logger, sample_session, shutdown as shutdown_logging
+from metrics import (
+    ACTIVE_SESSIONS, ACTIVE_WATCHERS, TURN_ECHO_SECONDS, WS_SEND_SECONDS,
+    CONTENT_TYPE_LATEST, render as render_metrics, scrape_allowed, track_audio, untrack_audio,
+)
+from assessment_scheduler import AssessmentScheduler
+from transcript_context import TranscriptWindow, ASSESS_RECENT_TURNS, ASSESS_CONTEXT_TOKENS, format_turn
 from fastapi import Depends
 from pydantic import BaseModel
 
-# Setup Supabase
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("WARNING: SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY not found in environment variables.")
-    supabase: Client = None
-else:
-    # Explicitly set the schema to 'public'
-    supabase: Client = create_client(
-        SUPABASE_URL,
-        SUPABASE_KEY,
-        options=ClientOptions(schema="public")
-    )
-
 # Setup AssemblyAI
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
 aai.settings.api_key = ASSEMBLYAI_API_KEY
 
+# Risk assessment cadence: wait for a short pause in the conversation before
+# assessing, but never hold a turn longer than the max latency.
+ASSESS_DEBOUNCE_MS = int(os.getenv("ASSESS_DEBOUNCE_MS", "400"))
+ASSESS_MAX_LATENCY_MS = int(os.getenv("ASSESS_MAX_LATENCY_MS", "2000"))
+
+# Local pre-screen gating: while a session is low risk and new turns carry no
+# risk signals, skip this many LLM calls in a row before checking with Gemini.
+PRESCREEN_BENIGN_SKIPS = int(os.getenv("PRESCREEN_BENIGN_SKIPS", "4"))
+
+# Audio path: per-session buffer bound (oldest audio dropped beyond it) and
+# how many chunks the STT client may have queued before we hold back.
+AUDIO_BUFFER_MS = int(os.getenv("AUDIO_BUFFER_MS", "2000"))
+AUDIO_BUFFER_BYTES = 16000 * 2 * AUDIO_BUFFER_MS // 1000  # 16 kHz, 16-bit mono
+AUDIO_UPSTREAM_MAX_CHUNKS = int(os.getenv("AUDIO_UPSTREAM_MAX_CHUNKS", "50"))
+
+# Server-side silence gating (VAD) before audio goes to the STT upstream
+AUDIO_VAD = os.getenv("AUDIO_VAD", "1") == "1"
+AUDIO_VAD_THRESHOLD_DB = float(os.getenv("AUDIO_VAD_THRESHOLD_DB", "-45"))
+AUDIO_VAD_HANGOVER_MS = int(os.getenv("AUDIO_VAD_HANGOVER_MS", "1300"))
+
 app = FastAPI()
+log = get_logger("main")
 
 
 class ThreadCreate(BaseModel):
@@ -49,9 +76,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
+@app.on_event("startup")
+async def on_startup():
+    # Relay live events between workers when state is shared
+    if SESSION_STORE_URL:
+        await live_hub.start_bus(SESSION_STORE_URL)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await live_hub.close()
+    if hasattr(session_store, "close"):
+        await session_store.close()
+    await log_sink.close()
+    await alert_dispatcher.close()
+    risk_cache.close()
+    shutdown_db()
+    shutdown_logging()
+
+
 @app.get("/")
 async def read_root():
     return {"message": "Hello from FastAPI backend!"}
@@ -67,6 +114,15 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus scrape endpoint (this worker's metrics), for allowed scrapers only."""
+    client_host = request.client.host if request.client else None
+    if not scrape_allowed(client_host, request.headers.get("authorization")):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
 class TestRiskInput(BaseModel):
     transcript: str
     location: Optional[dict] = None
@@ -82,11 +138,90 @@ async def test_risk_assessment(data: TestRiskInput):
     return result
 
 
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+async def _send_json(websocket: WebSocket, payload: dict, socket: str = "session"):
+    with WS_SEND_SECONDS.labels(socket=socket).time():
+        await websocket.send_json(payload)
+
+
+async def _store(call, *args, **kwargs):
+    """Shared session state is best-effort; a store outage must not end the session."""
+    try:
+        return await call(*args, **kwargs)
+    except Exception as e:
+        log.warning("Session store error", extra={"error": repr(e)})
+        return None
+
+
+async def _load_session(thread_id: str) -> Optional[dict]:
+    """
+    State to resume a thread with: the session store if it still has it,
+    else the thread's latest logs, fetched in one bounded query.
+    """
+    state = await _store(session_store.load, thread_id)
+    if state is not None or not supabase:
+        return state
+
+    logs_res = await execute(
+        supabase.table("logs")
+        .select("content", "latitude", "longitude")
+        .eq("thread_id", thread_id)
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(SESSION_STORE_MAX_TURNS)
+    )
+    if not logs_res.data:
+        return None
+    rows = logs_res.data[::-1]
+    turns = [r["content"] for r in rows]
+    # Re-seed the store so the next reconnect doesn't hit the database again
+    await _store(session_store.append_turn, thread_id, *turns)
+    return {"turns": turns, "turn_count": len(turns), "lat": rows[-1].get("latitude"), "lon": rows[-1].get("longitude")}
+
+
+async def _authorize_thread_socket(thread_id: str, token: Optional[str],
+                                   columns: str = "user_id") -> Optional[Tuple[str, dict]]:
+    """
+    (user id, thread row with the selected columns) if the ?token= user is
+    the thread's owner or an active guardian of the owner, else None. The
+    row is {} when there is no database.
+    Browsers can't set headers on WebSockets, so the access token comes as ?token=.
+    """
+    try:
+        user = await get_current_user(f"Bearer {token}" if token else None)
+    except HTTPException:
+        return None
+    if not supabase:
+        return user.id, {}
+    thread_res = await execute(supabase.table("threads").select(columns).eq("id", thread_id))
+    if not thread_res.data:
+        return None
+    thread = thread_res.data[0]
+    if thread["user_id"] != user.id and not await check_is_guardian(user.id, thread["user_id"]):
+        return None
+    return user.id, thread
+
+
 @app.websocket("/ws/{thread_id}")
-async def monitor_audio(websocket: WebSocket, thread_id: str):
-    print(f"WS CONNECTION ATTEMPT: thread_id={thread_id}")
+async def monitor_audio(websocket: WebSocket, thread_id: str, last_seq: Optional[int] = Query(None),
+                        token: str = Query(None)):
+    """
+    Live monitoring session. Final transcripts and risk results carry a
+    per-thread "seq"; a client that reconnects with ?last_seq=N gets the
+    events after N replayed and the session resumes with its history.
+    Only the thread's owner or their active guardians may connect (?token=).
+    """
+    # Checked before anything is loaded or replayed
+    auth = await _authorize_thread_socket(thread_id, token, "user_id, initial_context")
+    if auth is None:
+        await websocket.close(code=1008)
+        return
+    _, thread = auth
     await websocket.accept()
-    print(f"WS ACCEPTED: {thread_id}")
+    log.info("Session connected", extra={"thread_id": thread_id, "last_seq": last_seq})
 
     from assemblyai.streaming.v3 import (
         StreamingClient,
@@ -98,232 +233,490 @@ async def monitor_audio(websocket: WebSocket, thread_id: str):
         StreamingError,
         TerminationEvent,
     )
-    import queue
-    import threading
 
-    audio_queue = queue.Queue()
     loop = asyncio.get_running_loop()
     session_location = {"lat": None, "lon": None}
 
-    # Get initial_context and user_id for alerting
-    user_id = None
-    initial_context = ""
-    if supabase:
-        thread_res = supabase.table("threads").select("user_id", "initial_context").eq("id", thread_id).execute()
-        if thread_res.data:
-            user_id = thread_res.data[0]["user_id"]
-            initial_context = thread_res.data[0].get("initial_context", "") or ""
+    # initial_context and user_id for alerting, and any state to resume
+    user_id = thread.get("user_id")
+    initial_context = thread.get("initial_context", "") or ""
+    state = await _load_session(thread_id)
 
-    session_history = []
+    session_history = TranscriptWindow(recent_turns=ASSESS_RECENT_TURNS, token_budget=ASSESS_CONTEXT_TOKENS)
     BATCH_SIZE = 2
     is_connected = True
+    assessed_turns = 0
+    benign_skips = 0
+    last_score = 0
+
+    # Per-turn traces: every turn of a sampled session, plus any slow turn
+    traced = sample_session()
+    last_turn_at = None  # when the latest turn reached us; assessments are timed from it
+    assessment_trace = None
+
+    # Resume if this thread was live before (reconnect, or a move to another worker)
+    if state:
+        session_history.restore(state.get("turns", []), state.get("turn_count", 0))
+        assessed_turns = len(session_history)
+        last_score = state.get("last_score", 0)
+        if state.get("lat") is not None:
+            session_location["lat"], session_location["lon"] = state.get("lat"), state.get("lon")
+
+    replay = []
+    if last_seq is not None:
+        replay = await _store(session_store.events_since, thread_id, last_seq) or []
+    await _send_json(websocket, {"session": {
+        "resumed": bool(state),
+        "seq": (state or {}).get("seq", 0),
+        "turn_count": len(session_history),
+        "replayed": len(replay),
+    }})
+    for event in replay:
+        await _send_json(websocket, event)
+
+    async def send_event(event: dict):
+        """Sends a final transcript or risk result, numbered for replay."""
+        seq = await _store(session_store.record_event, thread_id, event)
+        if seq is not None:
+            event = {**event, "seq": seq}
+        if is_connected:
+            await _send_json(websocket, event)
+
+    async def run_assessment():
+        nonlocal assessed_turns, benign_skips, assessment_trace
+        if not is_connected: return None
+        # Keyed by the latest turn it covers; "wait" is the debounce/coalescing delay
+        trace = TurnTrace(thread_id, len(session_history), kind="assessment", sampled=traced, start=last_turn_at)
+        trace.add("wait", trace.start, time.perf_counter())
+
+        # Fast path: local pre-screen of the turns since the last assessment
+        new_turns = session_history.tail(len(session_history) - assessed_turns)
+        assessed_turns = len(session_history)
+        with trace.span("prescreen"):
+            screen = prescreen("\n".join(new_turns))
+        if screen["level"] == "critical" and is_connected:
+            # Provisional score right away; Gemini confirms below
+            with trace.span("provisional"):
+                await _send_json(websocket, {
+                    "risk": int(screen["score"]),
+                    "action": screen["reason"],
+                    "provisional": True
+                })
+        elif screen["benign"] and last_score < 40 and benign_skips < PRESCREEN_BENIGN_SKIPS:
+            benign_skips += 1
+            trace.finish(skipped=True)
+            return None
+        benign_skips = 0
+
+        full_context = session_history.build(initial_context)
+        lat, lon = session_location["lat"], session_location["lon"]
+        loc = {"lat": lat, "lon": lon} if (lat is not None and lon is not None) else None
+        with trace.span("assess"):
+            result = await assess_danger(full_context, location=loc)
+        assessment_trace = trace
+        return result
+
+    async def publish_assessment(result: dict):
+        nonlocal last_score, assessment_trace
+        trace, assessment_trace = assessment_trace, None
+        trace = trace or TurnTrace(thread_id, len(session_history), kind="assessment", sampled=traced)
+        risk_score = int(result["score"])
+        last_score = risk_score
+        with trace.span("store"):
+            await _store(session_store.update, thread_id, last_score=risk_score)
+        risk_level = result["level"]
+        action_text = result["reason"] or "Analyzing..."
+
+        # Persist risk score; watchers dedupe live and fetched scores by id
+        risk_id = str(uuid.uuid4())
+        if supabase:
+            with trace.span("risk_insert"):
+                await execute(supabase.table("risk_scores").insert({
+                    "id": risk_id,
+                    "thread_id": thread_id,
+                    "score": risk_score,
+                    "level": risk_level,
+                    "reason": action_text
+                }))
+
+        # Trigger Alerts (deduplicated, sent in the background)
+        with trace.span("alert"):
+            alert_dispatcher.dispatch(thread_id, user_id, risk_score, risk_level, action_text)
+
+        # Push to live guardian watchers
+        live_hub.publish(thread_id, {"type": "risk", "risk_score": {
+            "id": risk_id,
+            "score": risk_score,
+            "level": risk_level,
+            "reason": action_text,
+            "created_at": _now_iso()
+        }})
+
+        # Send follow-up with risk results
+        with trace.span("send"):
+            await send_event({
+                "risk": risk_score,
+                "action": action_text
+            })
+        trace.finish(score=risk_score, level=risk_level, degraded=bool(result.get("degraded")))
+
+    scheduler = AssessmentScheduler(
+        run_assessment,
+        publish_assessment,
+        debounce=ASSESS_DEBOUNCE_MS / 1000,
+        max_latency=ASSESS_MAX_LATENCY_MS / 1000,
+    )
 
-    async def trigger_alerts(score: int, reason: str):
-        if not supabase or not user_id: return
-        try:
-            # Fetch active guardians
-            guardians_res = supabase.table("guardians").select("guardian_id").eq("user_id", user_id).eq("status", "active").execute()
-            guardian_ids = [g["guardian_id"] for g in guardians_res.data if g.get("guardian_id")]
-            
-            # Create notifications for guardians
-            for g_id in guardian_ids:
-                supabase.table("notifications").insert({
-                    "user_id": g_id,
-                    "type": "risk_alert",
-                    "title": "CRITICAL RISK ALERT",
-                    "message": f"Critical danger detected for your ward. Risk Score: {score}. Reason: {reason}",
-                    "link": f"/live-status?threadId={thread_id}"
-                }).execute()
-                
-            # Create notification for user
-            supabase.table("notifications").insert({
-                "user_id": user_id,
-                "type": "risk_alert",
-                "title": "Safety Alert",
-                "message": "Shadow has detected potential danger. Please stay alert.",
-                "link": "/"
-            }).execute()
-        except Exception as alert_err:
-            print(f"ALERT SEND ERROR: {alert_err}")
+    # Turn events arrive on the STT client's reader thread. Hand them to a
+    # single consumer task so echoes stay in order. Final turns then go to a
+    # second, also in-order, consumer that waits for the speaker label before
+    # logging, so speaker identification never holds up the next echo.
+    turn_events: asyncio.Queue = asyncio.Queue()
+    final_turns: asyncio.Queue = asyncio.Queue()
+
+    # Speaker identification among the ward's circle, if anyone in it is enrolled
+    voice_ring = None
+    try:
+        if await speaker_directory.has_voices(user_id):
+            voice_ring = AudioRing()
+    except Exception as e:
+        log.warning("Speaker directory error", extra={"thread_id": thread_id, "error": repr(e)})
 
     def on_turn(client, event: TurnEvent):
         if not is_connected: return
         if not event.transcript: return
-        sentence = event.transcript
-        is_final = event.end_of_turn
-        lat, lon = session_location["lat"], session_location["lon"]
+        words = event.words if event.end_of_turn else None
+        loop.call_soon_threadsafe(turn_events.put_nowait, (event.transcript, event.end_of_turn, words, time.perf_counter()))
 
-        async def process():
-            nonlocal session_history
-            if not is_connected: return
+    async def process_turns():
+        while is_connected:
+            sentence, is_final, words, received = await turn_events.get()
+            if is_final is False and not turn_events.empty():
+                # A newer update is already queued; skip the stale partial
+                continue
+            lat, lon = session_location["lat"], session_location["lon"]
             try:
                 if is_final:
+                    # Timeline from the moment the turn's last word went upstream
+                    sent = audio_sent_at(words)
+                    trace = TurnTrace(thread_id, len(session_history) + 1, sampled=traced,
+                                      start=sent if sent is not None else received)
+                    if sent is not None:
+                        trace.add("stt", sent, received)
+                    trace.add("dispatch", received, time.perf_counter())
+
                     # 1. IMMEDIATE ECHO (Zero Lag)
-                    await websocket.send_json({"transcript": sentence, "is_final": True})
-                    
-                    # 2. Database Logging (Background)
-                    if supabase:
-                        def log_to_db():
-                            supabase.table("logs").insert({"thread_id": thread_id, "content": sentence, "latitude": lat, "longitude": lon}).execute()
-                        threading.Thread(target=log_to_db, daemon=True).start()
-                    
-                    session_history.append(sentence)
-                    
-                    # 3. BACKGROUND ASSESSMENT
-                    if len(session_history) >= BATCH_SIZE:
-                        async def run_assessment(history_snapshot, current_sentence):
-                            if not is_connected: return
-                            try:
-                                full_context = f"Initial Context: {initial_context}\n\nTranscript:\n" + "\n".join(history_snapshot)
-                                loc = {"lat": lat, "lon": lon} if (lat is not None and lon is not None) else None
-                                
-                                result = await assess_danger(full_context, location=loc)
-                                risk_score = int(result["score"])
-                                risk_level = result["level"]
-                                action_text = result["reason"] or "Analyzing..."
-
-                                # Persist risk score
-                                if supabase:
-                                    supabase.table("risk_scores").insert({
-                                        "thread_id": thread_id,
-                                        "score": risk_score,
-                                        "level": risk_level,
-                                        "reason": action_text
-                                    }).execute()
-
-                                # Trigger Alerts
-                                if risk_score >= 75:
-                                    await trigger_alerts(risk_score, action_text)
-                                
-                                # Send follow-up with risk results
-                                if is_connected:
-                                    await websocket.send_json({
-                                        "risk": risk_score, 
-                                        "action": action_text
-                                    })
-                            except Exception as bg_err:
-                                print(f"Background assessment error: {bg_err}")
-
-                        # Take a snapshot of history for this assessment
-                        asyncio.create_task(run_assessment(list(session_history), sentence))
+                    with trace.span("echo"):
+                        await send_event({"transcript": sentence, "is_final": True})
+                    TURN_ECHO_SECONDS.observe(time.perf_counter() - received)
+
+                    # 2. Speaker identification starts now (the ring only holds
+                    # recent audio), logging waits for it in finish_turns
+                    speaker_task = None
+                    if voice_ring is not None and words:
+                        speaker_task = asyncio.create_task(
+                            speaker_directory.identify_audio(user_id, turn_audio(voice_ring, words))
+                        )
+                    final_turns.put_nowait((sentence, lat, lon, received, speaker_task, trace))
                 else:
                     # Intermediate transcripts
-                    await websocket.send_json({"transcript": sentence, "is_final": False})
+                    await _send_json(websocket, {"transcript": sentence, "is_final": False})
 
             except Exception as e:
                 if is_connected:
-                    print(f"WS SEND ERROR: {e}")
+                    log.warning("Turn processing error", extra={"thread_id": thread_id, "error": repr(e)})
 
-        asyncio.run_coroutine_threadsafe(process(), loop)
+    async def finish_turns():
+        nonlocal last_turn_at
+        while True:
+            item = await final_turns.get()
+            if item is None:
+                return
+            sentence, lat, lon, received, speaker_task, trace = item
+            try:
+                # 3. Database Logging (batched) + live watchers, tagged with the speaker
+                row = {"thread_id": thread_id, "content": sentence, "latitude": lat, "longitude": lon}
+                context_line = sentence
+                if speaker_task is not None:
+                    waited = time.perf_counter()
+                    speaker = None
+                    try:
+                        speaker = await speaker_task
+                    except Exception as e:
+                        log.warning("Speaker identification error", extra={"thread_id": thread_id, "error": repr(e)})
+                    trace.add("speaker", waited, time.perf_counter())
+                    if speaker:
+                        row["speaker_label"] = speaker["speaker_label"]
+                        row["is_primary_user"] = speaker["is_primary_user"]
+                        context_line = format_turn(sentence, speaker["speaker_label"])
+                with trace.span("log"):
+                    await log_sink.put(row)
+                live_hub.publish(thread_id, {"type": "log", "log": row})
+
+                session_history.append(context_line)
+                last_turn_at = received
+
+                # 4. BACKGROUND ASSESSMENT (coalesced per session)
+                if len(session_history) >= BATCH_SIZE:
+                    scheduler.notify()
+
+                with trace.span("store"):
+                    await _store(session_store.append_turn, thread_id, context_line)
+                trace.finish(chars=len(sentence), speaker=row.get("speaker_label"))
+            except Exception as e:
+                log.warning("Turn logging error", extra={"thread_id": thread_id, "error": repr(e)})
 
     client = StreamingClient(
         options=StreamingClientOptions(api_key=aai.settings.api_key)
     )
     client.on(StreamingEvents.Turn, on_turn)
-    client.on(StreamingEvents.Error, lambda c, e: print(f"AAI Error: {e}") if is_connected else None)
-
-    client.connect(StreamingParameters(sample_rate=16000))
-
-    def audio_generator():
-        while is_connected:
-            try:
-                chunk = audio_queue.get(timeout=0.1)
-                if chunk is None: break
-                yield chunk
-            except queue.Empty:
-                continue
-
-    threading.Thread(target=lambda: client.stream(audio_generator()), daemon=True).start()
+    client.on(StreamingEvents.Error, lambda c, e: log.warning("STT error", extra={"thread_id": thread_id, "error": str(e)}) if is_connected else None)
+
+    await asyncio.to_thread(client.connect, StreamingParameters(sample_rate=16000))
+
+    # stream(bytes) only enqueues on the SDK's writer thread; its queue depth
+    # tells us when the upstream connection is falling behind.
+    sdk_queue = getattr(client, "_write_queue", None)
+
+    # (stream position in ms, send time) per upstream write, so a turn's word
+    # timestamps tell when its audio went to the STT
+    upstream_marks = deque(maxlen=4096)
+    upstream_ms = 0.0
+
+    def upstream_write(chunk: bytes):
+        nonlocal upstream_ms
+        # Keep what the STT actually hears, so its word timestamps index the ring
+        if voice_ring is not None:
+            voice_ring.write(chunk)
+        client.stream(chunk)
+        upstream_ms += len(chunk) / 32  # 16 kHz, 16-bit mono
+        upstream_marks.append((upstream_ms, time.perf_counter()))
+
+    def audio_sent_at(words) -> Optional[float]:
+        end_ms = getattr(words[-1], "end", None) if words else None
+        if end_ms is None:
+            return None
+        sent = None
+        for position, at in reversed(upstream_marks):
+            if position < end_ms:
+                break
+            sent = at
+        return sent
+
+    audio_pipe = AudioPipe(
+        upstream_write,
+        max_bytes=AUDIO_BUFFER_BYTES,
+        upstream_depth=sdk_queue.qsize if sdk_queue is not None else None,
+        max_upstream_chunks=AUDIO_UPSTREAM_MAX_CHUNKS,
+    )
+    audio_pipe.start()
+    preprocessor = AudioPreprocessor(
+        enabled=AUDIO_VAD,
+        threshold_db=AUDIO_VAD_THRESHOLD_DB,
+        hangover_ms=AUDIO_VAD_HANGOVER_MS,
+    )
+    turn_task = asyncio.create_task(process_turns())
+    finish_task = asyncio.create_task(finish_turns())
+    ACTIVE_SESSIONS.inc()
+    track_audio(audio_pipe)
 
     try:
         while True:
             data = await websocket.receive()
             if data.get("type") == "websocket.disconnect":
-                print(f"WS DISCONNECT MESSAGE RECEIVED: {thread_id}")
                 break
             
             if "bytes" in data:
-                audio_queue.put(data["bytes"])
+                for frame in preprocessor.process(data["bytes"]):
+                    audio_pipe.push(frame)
             elif "text" in data:
-                msg = json.loads(data["text"])
-                if msg.get("type") == "location":
+                try:
+                    msg = json.loads(data["text"])
+                except ValueError:
+                    msg = None
+                if not isinstance(msg, dict):
+                    # Bad messages are rejected; the session carries on
+                    await _send_json(websocket, {"error": "Invalid message"})
+                    continue
+                if msg.get("type") == "audio_format":
+                    # Clients that can't capture 16 kHz mono say what they send
+                    try:
+                        preprocessor.set_format(msg.get("sample_rate", 16000), msg.get("channels", 1))
+                    except ValueError as e:
+                        await _send_json(websocket, {"type": "audio_format", "error": str(e)})
+                elif msg.get("type") == "location":
                     session_location["lat"], session_location["lon"] = msg.get("lat"), msg.get("lon")
+                    live_hub.publish(thread_id, {"type": "location", "lat": msg.get("lat"), "lon": msg.get("lon")})
+                    await _store(session_store.update, thread_id, lat=msg.get("lat"), lon=msg.get("lon"))
                 elif msg.get("type") == "chat":
-                    text = msg.get("text", "").strip()
+                    text = msg.get("text")
+                    text = text.strip() if isinstance(text, str) else ""
                     if text:
+                        trace = TurnTrace(thread_id, len(session_history) + 1, kind="chat", sampled=traced)
                         try:
                             # 1. IMMEDIATE ECHO
-                            await websocket.send_json({"transcript": text, "is_final": True})
+                            with trace.span("echo"):
+                                await send_event({"transcript": text, "is_final": True})
                             
-                            # 2. Database Logging (Background)
-                            if supabase:
-                                def log_chat():
-                                    supabase.table("logs").insert({"thread_id": thread_id, "content": text, "latitude": session_location["lat"], "longitude": session_location["lon"]}).execute()
-                                threading.Thread(target=log_chat, daemon=True).start()
+                            # 2. Database Logging (batched) + live watchers
+                            # Typed on the ward's own device
+                            row = {"thread_id": thread_id, "content": text, "latitude": session_location["lat"], "longitude": session_location["lon"],
+                                   "speaker_label": "user", "is_primary_user": True}
+                            with trace.span("log"):
+                                await log_sink.put(row)
+                            live_hub.publish(thread_id, {"type": "log", "log": row})
                             
-                            session_history.append(text)
+                            context_line = format_turn(text, row["speaker_label"])
+                            session_history.append(context_line)
+                            last_turn_at = trace.start
                             
-                            # 3. BACKGROUND ASSESSMENT
+                            # 3. BACKGROUND ASSESSMENT (coalesced per session)
                             if len(session_history) >= BATCH_SIZE:
-                                async def run_chat_assessment(history_snapshot):
-                                    if not is_connected: return
-                                    try:
-                                        full_context = f"Initial Context: {initial_context}\n\nTranscript:\n" + "\n".join(history_snapshot)
-                                        loc = {"lat": session_location["lat"], "lon": session_location["lon"]} if (session_location["lat"] is not None and session_location["lon"] is not None) else None
-                                        
-                                        result = await assess_danger(full_context, location=loc)
-                                        risk_score = int(result["score"])
-                                        risk_level = result["level"]
-                                        action_text = result["reason"] or "Analyzed."
-
-                                        # Persist risk score
-                                        if supabase:
-                                            supabase.table("risk_scores").insert({
-                                                "thread_id": thread_id,
-                                                "score": risk_score,
-                                                "level": risk_level,
-                                                "reason": action_text
-                                            }).execute()
-
-                                        # Trigger Alerts
-                                        if risk_score >= 75:
-                                            await trigger_alerts(risk_score, action_text)
-
-                                        if is_connected:
-                                            await websocket.send_json({
-                                                "risk": risk_score, 
-                                                "action": action_text
-                                            })
-                                    except Exception as chat_bg_err:
-                                        print(f"Chat background assessment error: {chat_bg_err}")
-
-                                asyncio.create_task(run_chat_assessment(list(session_history)))
+                                scheduler.notify()
+
+                            with trace.span("store"):
+                                await _store(session_store.append_turn, thread_id, context_line)
+                            trace.finish(chars=len(text))
                         except Exception as e:
                             if is_connected:
-                                print(f"Chat processing error: {e}")
+                                log.warning("Chat processing error", extra={"thread_id": thread_id, "error": repr(e)})
     except WebSocketDisconnect:
-        print(f"Disconnected: {thread_id}")
+        pass
     finally:
         is_connected = False
-        audio_queue.put(None)
+        log.info("Session closed", extra={
+            "thread_id": thread_id,
+            "turns": len(session_history),
+            "audio_dropped_bytes": audio_pipe.dropped_bytes,
+            "traced": traced,
+        })
+        ACTIVE_SESSIONS.dec()
+        untrack_audio(audio_pipe)
+        live_hub.publish(thread_id, {"type": "status", "live": False})
+        await scheduler.close()
+        turn_task.cancel()
+        # Log the turns already echoed; speaker labels are time-boxed
+        final_turns.put_nowait(None)
+        try:
+            await asyncio.wait_for(finish_task, SPEAKER_ID_TIMEOUT_S + 5)
+        except (asyncio.TimeoutError, Exception):
+            pass
+        await log_sink.flush()
+        await audio_pipe.close()
+        try:
+            await asyncio.to_thread(client.disconnect, True)
+        except Exception:
+            pass
+
+
+@app.websocket("/ws/watch/{thread_id}")
+async def watch_thread(websocket: WebSocket, thread_id: str, token: str = Query(None)):
+    """
+    Guardian-facing live stream for a thread. Pushes transcript, risk and
+    location deltas as monitor_audio produces them; clients load the initial
+    state via GET /api/threads/{thread_id} after the socket opens, and drop
+    events whose log or risk score id they already fetched.
+    Same access rule as monitor_audio (see _authorize_thread_socket); a
+    guardian's socket is closed with 1008 once they lose access to the ward.
+    """
+    auth = await _authorize_thread_socket(thread_id, token)
+    if auth is None:
+        await websocket.close(code=1008)
+        return
+    viewer_id, thread = auth
+    ward_id = thread.get("user_id")
+    # Guardians' sockets are tracked so they can be closed on revocation,
+    # from here on so a change made while the socket opens isn't missed
+    watcher_key = (ward_id, viewer_id) if ward_id and ward_id != viewer_id else None
+    if watcher_key:
+        _guardian_watchers.setdefault(watcher_key, set()).add(websocket)
+    # Subscribed before the client sees the socket open, so nothing published
+    # after that point is missed
+    queue = live_hub.subscribe(thread_id)
+
+    async def pump():
+        while True:
+            event = await queue.get()
+            await _send_json(websocket, event, socket="watch")
+
+    pump_task = None
+    try:
+        await websocket.accept()
+        pump_task = asyncio.create_task(pump())
+        ACTIVE_WATCHERS.inc()
+        try:
+            while True:
+                data = await websocket.receive()
+                if data.get("type") == "websocket.disconnect":
+                    break
+        except WebSocketDisconnect:
+            pass
+        finally:
+            ACTIVE_WATCHERS.dec()
+    finally:
+        live_hub.unsubscribe(thread_id, queue)
+        if pump_task:
+            pump_task.cancel()
+        if watcher_key:
+            sockets = _guardian_watchers.get(watcher_key)
+            if sockets is not None:
+                sockets.discard(websocket)
+                if not sockets:
+                    del _guardian_watchers[watcher_key]
+
+
+# (ward_id, guardian_id) -> that guardian's open watch sockets on this worker
+_guardian_watchers: Dict[Tuple[str, str], Set[WebSocket]] = {}
+_revocation_tasks: Set[asyncio.Task] = set()
+
+
+def _guardians_changed(ward_id: Optional[str], guardian_id: Optional[str]):
+    """
+    Call after a guardian relationship changes. Every worker drops its cached
+    view of the pair (see _on_live_control), so access checks and speaker
+    circles reflect the change at once instead of after GUARDIAN_CACHE_TTL_S.
+    """
+    live_hub.broadcast({"type": "guardians_changed", "ward_id": ward_id, "guardian_id": guardian_id})
+
+
+def _on_live_control(event: dict):
+    if event.get("type") != "guardians_changed":
+        return
+    ward_id, guardian_id = event.get("ward_id"), event.get("guardian_id")
+    guardian_index.invalidate(ward_id=ward_id, guardian_id=guardian_id)
+    speaker_directory.invalidate(ward_id)
+    if (ward_id, guardian_id) in _guardian_watchers:
+        task = asyncio.get_running_loop().create_task(_close_revoked_watchers(ward_id, guardian_id))
+        _revocation_tasks.add(task)
+        task.add_done_callback(_revocation_tasks.discard)
+
+
+async def _close_revoked_watchers(ward_id: str, guardian_id: str):
+    if await check_is_guardian(guardian_id, ward_id):
+        return
+    for websocket in list(_guardian_watchers.get((ward_id, guardian_id), ())):
+        log.info("Closing watch socket of a revoked guardian", extra={"ward_id": ward_id, "guardian_id": guardian_id})
         try:
-            client.close()
-        except:
+            await websocket.close(code=1008)
+        except Exception:
             pass
 
 
+live_hub.on_control(_on_live_control)
+
+
 @app.get("/api/profile")
 async def get_profile(user=Depends(get_current_user)):
     if not supabase:
         return {"id": user.id, "email": user.email, "is_enrolled": False}
 
     try:
-        res = supabase.table("profiles").select("*").eq("id", user.id).execute()
+        res = await execute(supabase.table("profiles").select("*").eq("id", user.id))
         if res.data:
             return res.data[0]
         return {"id": user.id, "email": user.email, "is_enrolled": False}
     except Exception as e:
-        print(f"Profile error: {e}")
+        log.exception("Profile error")
         return {"id": user.id, "email": user.email, "is_enrolled": False}
 
 
@@ -332,13 +725,13 @@ async def get_profile_role(user=Depends(get_current_user)):
     if not supabase:
         return {"account_role": "both"}
     try:
-        res = supabase.table("profiles").select("account_role").eq("id", user.id).execute()
+        res = await execute(supabase.table("profiles").select("account_role").eq("id", user.id))
         if res.data:
             role = res.data[0].get("account_role", "both")
             return {"account_role": role}
         return {"account_role": "both"}
     except Exception as e:
-        print(f"Role fetch error: {e}")
+        log.exception("Role fetch error")
         return {"account_role": "both"}
 
 
@@ -362,10 +755,10 @@ async def update_profile_role(data: RoleUpdate, user=Depends(get_current_user)):
         if data.is_enrolled is not None:
             update_data["is_enrolled"] = data.is_enrolled
             
-        supabase.table("profiles").update(update_data).eq("id", user.id).execute()
+        await execute(supabase.table("profiles").update(update_data).eq("id", user.id))
         return {"message": f"Account role updated to {role}"}
     except Exception as e:
-        print(f"Role update error: {e}")
+        log.exception("Role update error")
         return {"error": str(e)}, 400
 
 
@@ -373,16 +766,41 @@ async def check_is_guardian(guardian_id: str, ward_id: str) -> bool:
     """Helper to check if a user is an active guardian for another user."""
     if not supabase: return False
     try:
-        res = supabase.table("guardians").select("status").eq("guardian_id", guardian_id).eq("user_id", ward_id).eq("status", "active").execute()
-        return len(res.data) > 0
+        return await guardian_index.is_guardian(guardian_id, ward_id)
     except Exception as e:
-        print(f"Guardian check error: {e}")
+        log.exception("Guardian check error")
         return False
 
 
+# thread_risk_summary is kept current by triggers (migrations/002), so list
+# views read one row per thread instead of aggregating logs and risk_scores.
+THREAD_SUMMARY_SELECT = "thread_risk_summary(turn_count, last_log_at, max_score, last_score, last_level, last_risk_at)"
+
+
+def _with_summary(thread: dict) -> dict:
+    """Replaces the embedded summary row with log_count, last_risk, max_score and last_activity."""
+    summary = thread.pop("thread_risk_summary", None)
+    if isinstance(summary, list):
+        summary = summary[0] if summary else None
+    summary = summary or {}
+    last_risk = None
+    if summary.get("last_risk_at"):
+        last_risk = {"score": summary["last_score"], "level": summary["last_level"], "created_at": summary["last_risk_at"]}
+    return {
+        **thread,
+        "log_count": summary.get("turn_count") or 0,
+        "last_risk": last_risk,
+        "max_score": summary.get("max_score"),
+        "last_activity": summary.get("last_log_at") or thread["created_at"],
+    }
+
+
 @app.get("/api/guarding/threads/{user_id}")
 async def get_ward_threads(user_id: str, user=Depends(get_current_user)):
-    """Fetch threads for a ward, only if the current user is their active guardian."""
+    """
+    Fetch threads for a ward, only if the current user is their active guardian.
+    Each thread carries its log_count, last_risk, max_score and last_activity.
+    """
     if not supabase: return []
     
     is_guardian = await check_is_guardian(user.id, user_id)
@@ -390,21 +808,39 @@ async def get_ward_threads(user_id: str, user=Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Not authorized to view this user's threads")
     
     try:
-        res = supabase.table("threads").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-        return res.data
+        res = await execute(
+            supabase.table("threads")
+            .select(f"*, {THREAD_SUMMARY_SELECT}")
+            .eq("user_id", user_id)
+            .order("created_at", desc=True)
+        )
+        return [_with_summary(t) for t in res.data]
     except Exception as e:
-        print(f"Ward threads error: {e}")
+        log.exception("Ward threads error")
         return []
 
 
 @app.get("/api/threads/{thread_id}")
-async def get_thread_details(thread_id: str, user=Depends(get_current_user)):
-    """Fetch a single thread with its logs. User must be owner or an active guardian."""
+async def get_thread_details(
+        thread_id: str,
+        cursor: Optional[str] = None,
+        limit: int = Query(500, ge=1, le=2000),
+        user=Depends(get_current_user)
+):
+    """
+    Fetch a single thread with its logs. User must be owner or an active guardian.
+    Pass the returned next_cursor back as ?cursor= to get only rows added since.
+    """
     if not supabase: return None
     
+    try:
+        positions = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         # Get thread to check ownership
-        thread_res = supabase.table("threads").select("*").eq("id", thread_id).execute()
+        thread_res = await execute(supabase.table("threads").select("*").eq("id", thread_id))
         if not thread_res.data:
             raise HTTPException(status_code=404, detail="Thread not found")
         
@@ -416,33 +852,76 @@ async def get_thread_details(thread_id: str, user=Depends(get_current_user)):
             if not is_guardian:
                 raise HTTPException(status_code=403, detail="Not authorized to view this thread")
         
-        # Fetch logs
-        logs_res = supabase.table("logs").select("*").eq("thread_id", thread_id).order("created_at", desc=False).execute()
-        # Fetch risk scores
-        risk_res = supabase.table("risk_scores").select("*").eq("thread_id", thread_id).order("created_at", desc=False).execute()
-        
-        thread["logs"] = logs_res.data
-        thread["risk_scores"] = risk_res.data
+        # Fetch logs and risk scores after the cursor (limit + 1 to detect more)
+        logs_res, risk_res = await asyncio.gather(
+            execute(keyset(supabase.table("logs").select("*").eq("thread_id", thread_id), positions.get("logs")).limit(limit + 1)),
+            execute(keyset(supabase.table("risk_scores").select("*").eq("thread_id", thread_id), positions.get("risk_scores")).limit(limit + 1)),
+        )
+        logs, more_logs = page(logs_res.data, limit)
+        risk_scores, more_risk = page(risk_res.data, limit)
+
+        thread["logs"] = logs
+        thread["risk_scores"] = risk_scores
+        thread["has_more"] = more_logs or more_risk
+        thread["next_cursor"] = encode_cursor({
+            "logs": row_position(logs[-1]) if logs else positions.get("logs"),
+            "risk_scores": row_position(risk_scores[-1]) if risk_scores else positions.get("risk_scores"),
+        })
         return thread
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Thread details error: {e}")
+        log.exception("Thread details error")
         return None
 
 
 @app.get("/api/history")
-async def get_history(user=Depends(get_current_user)):
+async def get_history(
+        response: Response,
+        summary: bool = False,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1, le=200),
+        user=Depends(get_current_user)
+):
+    """
+    Threads for the current user, newest first. With neither cursor nor
+    limit, all of them (the original unpaged response); otherwise `limit`
+    per page (default 50), with the cursor for the next page returned in
+    the X-Next-Cursor header.
+    summary=true returns counts, last and max risk and timestamps (from
+    thread_risk_summary) instead of every log.
+    """
     if not supabase:
         return []
 
     try:
-        # Fetch threads with their logs
-        threads_res = supabase.table("threads").select("*, logs(*)").eq("user_id", user.id).order("created_at",
-                                                                                                  desc=True).execute()
-        return threads_res.data
+        positions = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if summary:
+            query = supabase.table("threads").select(f"id, user_id, initial_context, created_at, {THREAD_SUMMARY_SELECT}")
+        else:
+            # Fetch threads with their logs
+            query = supabase.table("threads").select("*, logs(*)")
+
+        query = keyset(query.eq("user_id", user.id), positions.get("threads"), desc=True)
+        if cursor is None and limit is None:
+            threads, has_more = (await execute(query)).data, False
+        else:
+            limit = limit or 50
+            threads_res = await execute(query.limit(limit + 1))
+            threads, has_more = page(threads_res.data, limit)
+
+        if has_more:
+            response.headers["X-Next-Cursor"] = encode_cursor({"threads": row_position(threads[-1])})
+
+        if summary:
+            threads = [_with_summary(t) for t in threads]
+        return threads
     except Exception as e:
-        print(f"History error: {e}")
+        log.exception("History error")
         return []
 
 
@@ -457,10 +936,10 @@ async def get_guarding(user=Depends(get_current_user)):
 
     try:
         # Fetch relationships where this user is the guardian
-        res = supabase.table("guardians").select("*, profiles:user_id(*)").eq("guardian_id", user.id).execute()
+        res = await execute(supabase.table("guardians").select("*, profiles:user_id(*)").eq("guardian_id", user.id))
         return res.data
     except Exception as e:
-        print(f"Guarding error: {e}")
+        log.exception("Guarding error")
         return []
 
 
@@ -470,11 +949,12 @@ async def accept_guardian(relationship_id: str, user=Depends(get_current_user)):
         return {"message": "Supabase not configured"}
     try:
         # Update status to active only if this user is the guardian for this relationship
-        supabase.table("guardians").update({"status": "active"}).eq("id", relationship_id).eq("guardian_id",
-                                                                                              user.id).execute()
+        res = await execute(supabase.table("guardians").update({"status": "active"}).eq("id", relationship_id).eq("guardian_id", user.id))
+        for row in res.data or []:
+            _guardians_changed(row.get("user_id"), user.id)
         return {"message": "Guardian request accepted"}
     except Exception as e:
-        print(f"Accept error: {e}")
+        log.exception("Accept error")
         return {"error": str(e)}, 400
 
 
@@ -484,10 +964,10 @@ async def get_my_guardians(user=Depends(get_current_user)):
         return []
     try:
         # Fetch guardians added by the current user
-        res = supabase.table("guardians").select("*").eq("user_id", user.id).execute()
+        res = await execute(supabase.table("guardians").select("*").eq("user_id", user.id))
         return res.data
     except Exception as e:
-        print(f"My Guardians error: {e}")
+        log.exception("My Guardians error")
         return []
 
 
@@ -496,11 +976,10 @@ async def get_notifications(user=Depends(get_current_user)):
     if not supabase:
         return []
     try:
-        res = supabase.table("notifications").select("*").eq("user_id", user.id).order("created_at",
-                                                                                       desc=True).execute()
+        res = await execute(supabase.table("notifications").select("*").eq("user_id", user.id).order("created_at", desc=True))
         return res.data
     except Exception as e:
-        print(f"Notifications error: {e}")
+        log.exception("Notifications error")
         return []
 
 
@@ -509,49 +988,45 @@ async def mark_notification_read(notification_id: str, user=Depends(get_current_
     if not supabase:
         return {"message": "Supabase not configured"}
     try:
-        supabase.table("notifications").update({"is_read": True}).eq("id", notification_id).eq("user_id",
-                                                                                               user.id).execute()
+        await execute(supabase.table("notifications").update({"is_read": True}).eq("id", notification_id).eq("user_id", user.id))
         return {"message": "Notification marked as read"}
     except Exception as e:
-        print(f"Mark read error: {e}")
+        log.exception("Mark read error")
         return {"error": str(e)}, 400
 
 
 @app.post("/api/enroll-voice")
 async def enroll_voice(file: UploadFile = File(...), user=Depends(get_current_user)):
     """
-    Accepts a .wav file, generates a voice fingerprint embedding,
-    and updates the user's profile.
+    Accepts a PCM .wav recording, computes the voice fingerprint embedding
+    in memory, and updates the user's profile.
     """
     if not supabase:
         return {"message": "Supabase not configured"}
 
+    data = await file.read()
     try:
-        # Save uploaded file temporarily for processing
-        temp_path = f"temp_{user.id}.wav"
-        with open(temp_path, "wb") as f:
-            f.write(await file.read())
-
-        # For now, we simulate the embedding generation (384-dimensional vector)
-        import numpy as np
-        embedding = np.random.uniform(-1, 1, 384).tolist()
+        embedding = await asyncio.to_thread(lambda: embed(decode_wav(data)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    try:
         # Update user profile in Supabase
         # First ensure the profile exists
-        supabase.table("profiles").upsert({
+        await execute(supabase.table("profiles").upsert({
             "id": user.id,
             "email": user.email,
-            "voice_fingerprint": embedding,
+            "voice_fingerprint": embedding.tolist(),
+            "voice_fingerprint_version": VOICE_FINGERPRINT_VERSION,
             "is_enrolled": True
-        }).execute()
+        }))
+        # The new voice can belong to several circles (own and as a guardian)
+        speaker_directory.invalidate()
 
         return {"message": "Voice enrolled successfully"}
     except Exception as e:
-        print(f"Enrollment error: {e}")
+        log.exception("Enrollment error")
         return {"error": str(e)}, 400
-    finally:
-        if os.path.exists("temp_enrollment.wav"):
-            os.remove("temp_enrollment.wav")
 
 
 @app.post("/api/guardians/add")
@@ -570,36 +1045,37 @@ async def add_guardian(
 
     try:
         # Check if guardian exists as a user
-        res = supabase.table("profiles").select("id").eq("email", guardian_email).execute()
+        res = await execute(supabase.table("profiles").select("id").eq("email", guardian_email))
         guardian_id = res.data[0]["id"] if res.data else None
 
         # Insert into guardians table
-        supabase.table("guardians").insert({
+        await execute(supabase.table("guardians").insert({
             "user_id": user.id,
             "guardian_id": guardian_id,
             "guardian_email": guardian_email,
             "guardian_phone": guardian_phone,
             "status": "pending"
-        }).execute()
+        }))
+        _guardians_changed(user.id, guardian_id)
 
         # If guardian is a registered user, send them a notification
         if guardian_id:
             try:
                 # Fetch adder's name or email for the notification message
-                res_adder = supabase.table("profiles").select("full_name, email").eq("id", user.id).execute()
+                res_adder = await execute(supabase.table("profiles").select("full_name, email").eq("id", user.id))
                 adder_name = res_adder.data[0].get("full_name") or res_adder.data[0].get(
                     "email") if res_adder.data else user.email
 
-                supabase.table("notifications").insert({
+                await execute(supabase.table("notifications").insert({
                     "user_id": guardian_id,
                     "type": "guardian_added",
                     "title": "New Guarding Request",
                     "message": f"{adder_name} has added you as their guardian. You can now monitor their safety sessions.",
                     "link": "/guardians",
                     "is_read": False
-                }).execute()
+                }))
             except Exception as notif_err:
-                print(f"Failed to send guardian notification: {notif_err}")
+                log.exception("Failed to send guardian notification")
 
         return {
             "message": "Guardian added",
@@ -607,7 +1083,7 @@ async def add_guardian(
             "status": "pending"
         }
     except Exception as e:
-        print(f"Add guardian error: {e}")
+        log.exception("Add guardian error")
         return {"error": str(e)}, 400
 
 
@@ -617,51 +1093,48 @@ async def delete_guardian(relationship_id: str, user=Depends(get_current_user)):
         return {"message": "Supabase not configured"}
     try:
         # Allow deletion if user is either the one who added (user_id) or the guardian (guardian_id)
-        res = supabase.table("guardians").delete().eq("id", relationship_id).or_(f"user_id.eq.{user.id},guardian_id.eq.{user.id}").execute()
+        res = await execute(supabase.table("guardians").delete().eq("id", relationship_id).or_(f"user_id.eq.{user.id},guardian_id.eq.{user.id}"))
+        for row in res.data or []:
+            _guardians_changed(row.get("user_id"), row.get("guardian_id"))
         return {"message": "Guardian relationship removed"}
     except Exception as e:
-        print(f"Delete guardian error: {e}")
+        log.exception("Delete guardian error")
         return {"error": str(e)}, 400
 
 
 @app.post("/api/threads")
 async def create_thread(data: ThreadCreate, user=Depends(get_current_user)):
-    print(f"CREATE_THREAD: Received data={data} for user={user.id}")
+    log.debug("Creating thread", extra={"user_id": user.id})
     if not supabase:
-        print("CREATE_THREAD: Supabase not configured, using fallback")
-        import uuid
         return {"id": str(uuid.uuid4()), "message": "Development mode (no Supabase)"}
 
     try:
         initial_context = data.initial_context
-        print(f"CREATE_THREAD: Attempting insert into threads table (context: {initial_context})")
-        response = supabase.table("threads").insert({
+        response = await execute(supabase.table("threads").insert({
             "user_id": user.id,
             "initial_context": initial_context
-        }).execute()
+        }))
 
         if response.data:
-            print(f"CREATE_THREAD: Success! Thread ID: {response.data[0].get('id')}")
+            log.info("Thread created", extra={"thread_id": response.data[0].get("id"), "user_id": user.id})
             return response.data[0]
 
-        print("CREATE_THREAD: Insert returned no data, using fallback mock ID")
+        log.warning("Thread insert returned no data, using a mock id", extra={"user_id": user.id})
         return {"id": "mock-thread-id"}
     except Exception as e:
-        print(f"CREATE_THREAD ERROR: {e}")
+        log.exception("Thread insert failed", extra={"user_id": user.id})
         # Try fallback without context
         try:
-            print("CREATE_THREAD: Attempting fallback insert without initial_context")
-            response = supabase.table("threads").insert({
+            response = await execute(supabase.table("threads").insert({
                 "user_id": user.id
-            }).execute()
+            }))
             if response.data:
-                print(f"CREATE_THREAD: Fallback success! Thread ID: {response.data[0].get('id')}")
+                log.info("Thread created without initial_context", extra={"thread_id": response.data[0].get("id"), "user_id": user.id})
                 return response.data[0]
         except Exception as e2:
-            print(f"CREATE_THREAD FALLBACK ERROR: {e2}")
+            log.exception("Thread fallback insert failed", extra={"user_id": user.id})
 
-        import uuid
         mock_id = str(uuid.uuid4())
-        print(f"CREATE_THREAD: Returning mock UUID: {mock_id}")
+        log.warning("Returning a mock thread id", extra={"thread_id": mock_id, "user_id": user.id})
         return {"id": mock_id, "error": str(e)}
 
@@ -0,0 +1,109 @@
+# metrics.py
+import os
+import hmac
+import threading
+import ipaddress
+from typing import Optional, Set
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+import telemetry
+
+# Prometheus metrics for the hot paths, served by GET /metrics. Values are
+# per worker process; scrape every worker when running uvicorn --workers N.
+
+# Who may scrape: clients in METRICS_ALLOW_IPS (loopback by default), or any
+# client sending "Authorization: Bearer $METRICS_TOKEN" when that is set
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_ALLOW_IPS = [
+    ipaddress.ip_network(net.strip(), strict=False)
+    for net in os.getenv("METRICS_ALLOW_IPS", "127.0.0.1/32,::1/128").split(",")
+    if net.strip()
+]
+
+# Sub-millisecond to a few seconds: echoes, sends, DB round-trips
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Model calls: up to the 30 s timeout in risk_analysis.assess_danger
+ASSESS_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0)
+
+ASSESS_SECONDS = Histogram(
+    "aegis_assess_seconds",
+    "assess_danger latency. outcome: ok, cached, degraded (fallback score), timeout, error, cancelled",
+    ["outcome"],
+    buckets=ASSESS_BUCKETS,
+)
+ASSESS_IN_FLIGHT = Gauge("aegis_assess_in_flight", "Assessments waiting on the risk engine (cache misses)")
+RISK_CACHE_LOOKUPS = Counter(
+    "aegis_risk_cache_lookups_total",
+    "RiskCache lookups. result: hit (memory), disk_hit, miss",
+    ["result"],
+)
+RISK_CACHE_ENTRIES = Gauge("aegis_risk_cache_entries", "Results held in the RiskCache memory tier")
+LLM_IN_FLIGHT = Gauge("aegis_llm_in_flight", "Model calls on the wire, hedges included (ResilientEngine)")
+RISK_FALLBACKS = Counter(
+    "aegis_risk_fallbacks_total",
+    "Scores that did not come from the configured engine. reason: circuit_open, saturated, deadline, timeout, error",
+    ["engine", "reason"],
+)
+
+TURN_ECHO_SECONDS = Histogram(
+    "aegis_turn_echo_seconds",
+    "Final STT turn received -> transcript echo sent to the client",
+    buckets=FAST_BUCKETS,
+)
+WS_SEND_SECONDS = Histogram("aegis_ws_send_seconds", "WebSocket send_json latency", ["socket"], buckets=FAST_BUCKETS)
+
+DB_SECONDS = Histogram(
+    "aegis_db_seconds",
+    "Supabase call latency including the wait for a DB pool thread",
+    ["table", "op"],
+    buckets=FAST_BUCKETS,
+)
+DB_QUEUED = Gauge("aegis_db_queued", "Supabase calls waiting for a DB pool thread")
+
+ACTIVE_SESSIONS = Gauge("aegis_active_sessions", "Open /ws/{thread_id} monitoring sessions")
+ACTIVE_WATCHERS = Gauge("aegis_active_watchers", "Open /ws/watch/{thread_id} guardian streams")
+EXECUTOR_THREADS = Gauge("aegis_executor_threads", "Threads by pool (db: Supabase pool, speaker: voice embeddings, process: all threads)", ["pool"])
+EXECUTOR_THREADS.labels(pool="process").set_function(threading.active_count)
+
+# Audio buffered per session (AudioPipe) and chunks queued in the STT
+# client, summed over open sessions
+_audio_pipes: Set = set()
+AUDIO_BUFFERED_BYTES = Gauge("aegis_audio_buffered_bytes", "Audio held in session buffers before the STT upstream")
+AUDIO_BUFFERED_BYTES.set_function(lambda: sum(p.buffered_bytes for p in list(_audio_pipes)))
+AUDIO_UPSTREAM_CHUNKS = Gauge("aegis_audio_upstream_chunks", "Audio chunks queued inside the STT clients")
+AUDIO_UPSTREAM_CHUNKS.set_function(lambda: sum(p.upstream_chunks for p in list(_audio_pipes)))
+
+LOG_RECORDS_DROPPED = Gauge("aegis_log_records_dropped", "Log records dropped because the log queue was full")
+LOG_RECORDS_DROPPED.set_function(telemetry.dropped_records)
+
+
+def track_audio(pipe):
+    _audio_pipes.add(pipe)
+
+
+def untrack_audio(pipe):
+    _audio_pipes.discard(pipe)
+
+
+def scrape_allowed(client_host: Optional[str], authorization: Optional[str]) -> bool:
+    if METRICS_TOKEN and authorization:
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(client_host or "")
+    except ValueError:
+        return False
+    return any(address in net for net in METRICS_ALLOW_IPS)
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
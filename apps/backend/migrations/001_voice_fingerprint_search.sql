@@ -0,0 +1,56 @@
+-- 001: Nearest-neighbour search over enrolled voice fingerprints
+-- Requires pgvector >= 0.5 (HNSW). Run after schema.sql.
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- Cosine HNSW index over enrolled profiles only
+CREATE INDEX IF NOT EXISTS profiles_voice_fingerprint_hnsw
+    ON public.profiles USING hnsw (voice_fingerprint vector_cosine_ops)
+    WHERE voice_fingerprint IS NOT NULL;
+
+-- Circle lookups filter guardians by ward
+CREATE INDEX IF NOT EXISTS guardians_user_id_status_idx
+    ON public.guardians (user_id, status);
+
+-- For each segment embedding in one batch, the closest enrolled voice in the
+-- ward's circle (the ward plus their active guardians), if it clears the
+-- threshold. segment is the 0-based position in query_embeddings.
+-- On pgvector >= 0.8, `SET hnsw.iterative_scan = relaxed_order` keeps
+-- filtered index scans exact for very large circles.
+CREATE OR REPLACE FUNCTION public.match_circle_voices(
+    ward_id UUID,
+    query_embeddings JSONB,            -- [[384 floats], ...]
+    match_threshold FLOAT DEFAULT 0.6
+)
+RETURNS TABLE (segment INT, profile_id UUID, similarity FLOAT)
+LANGUAGE sql STABLE
+AS $$
+    WITH circle AS (
+        SELECT match_circle_voices.ward_id AS id
+        UNION
+        SELECT g.guardian_id
+        FROM public.guardians g
+        WHERE g.user_id = match_circle_voices.ward_id
+          AND g.status = 'active'
+          AND g.guardian_id IS NOT NULL
+    ),
+    queries AS (
+        SELECT (q.ordinality - 1)::INT AS segment, (q.value::TEXT)::vector(384) AS embedding
+        FROM jsonb_array_elements(query_embeddings) WITH ORDINALITY AS q(value, ordinality)
+    )
+    SELECT queries.segment, best.id, best.similarity
+    FROM queries
+    CROSS JOIN LATERAL (
+        SELECT p.id, 1 - (p.voice_fingerprint <=> queries.embedding) AS similarity
+        FROM public.profiles p
+        JOIN circle ON circle.id = p.id
+        WHERE p.voice_fingerprint IS NOT NULL
+        ORDER BY p.voice_fingerprint <=> queries.embedding
+        LIMIT 1
+    ) best
+    WHERE best.similarity >= match_threshold;
+$$;
+
+-- Voice matches reveal who is speaking; only the backend may call this
+REVOKE ALL ON FUNCTION public.match_circle_voices(UUID, JSONB, FLOAT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.match_circle_voices(UUID, JSONB, FLOAT) TO service_role;
@@ -0,0 +1,198 @@
+-- 002: Indexes for the backend's query shapes, the risk_scores table and a
+-- trigger-maintained per-thread summary. Run after 001.
+-- Check the resulting plans with `python -m bench.plan_check` (see README).
+
+-- 1. Risk scores written by live sessions and rescore.py
+CREATE TABLE IF NOT EXISTS public.risk_scores (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    thread_id UUID REFERENCES public.threads(id) ON DELETE CASCADE,
+    score INT NOT NULL CHECK (score BETWEEN 0 AND 100),
+    level TEXT NOT NULL, -- 'low', 'medium', 'high', 'critical' (checked since 005)
+    reason TEXT,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
+ALTER TABLE public.risk_scores ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view risk scores for their own threads" ON public.risk_scores;
+CREATE POLICY "Users can view risk scores for their own threads" ON public.risk_scores FOR SELECT USING (
+  EXISTS (
+    SELECT 1 FROM public.threads
+    WHERE public.threads.id = public.risk_scores.thread_id
+    AND public.threads.user_id = auth.uid()
+  )
+);
+
+-- 2. Composite indexes. Per-thread reads page by (created_at, id) in both
+-- directions (pagination.keyset, main._load_session), so both columns are
+-- keyed after the filter column.
+CREATE INDEX IF NOT EXISTS logs_thread_id_created_at_idx
+    ON public.logs (thread_id, created_at, id);
+
+CREATE INDEX IF NOT EXISTS risk_scores_thread_id_created_at_idx
+    ON public.risk_scores (thread_id, created_at, id);
+
+-- /api/history and /api/guarding/threads: a user's threads, newest first
+CREATE INDEX IF NOT EXISTS threads_user_id_created_at_idx
+    ON public.threads (user_id, created_at, id);
+
+-- guardians (user_id, status) is created by 001. Guardian-side lookups
+-- filter on guardian_id alone or with status.
+CREATE INDEX IF NOT EXISTS guardians_guardian_id_status_idx
+    ON public.guardians (guardian_id, status);
+
+CREATE INDEX IF NOT EXISTS notifications_user_id_created_at_idx
+    ON public.notifications (user_id, created_at);
+
+-- profiles.email is already covered by the index behind its UNIQUE constraint.
+
+-- 3. Per-thread summary, kept current by statement-level triggers so a bulk
+-- insert (log_sink batches, rescore.py) costs one upsert per thread touched.
+CREATE TABLE IF NOT EXISTS public.thread_risk_summary (
+    thread_id UUID PRIMARY KEY REFERENCES public.threads(id) ON DELETE CASCADE,
+    turn_count INT NOT NULL DEFAULT 0,
+    last_log_at TIMESTAMPTZ,
+    max_score INT,
+    last_score INT,
+    last_level TEXT,
+    last_risk_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+ALTER TABLE public.thread_risk_summary ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view summaries of their own threads" ON public.thread_risk_summary;
+CREATE POLICY "Users can view summaries of their own threads" ON public.thread_risk_summary FOR SELECT USING (
+  EXISTS (
+    SELECT 1 FROM public.threads
+    WHERE public.threads.id = public.thread_risk_summary.thread_id
+    AND public.threads.user_id = auth.uid()
+  )
+);
+
+-- Recomputes the summary of the given threads from the raw rows. Used after
+-- deletes and for the backfill below; threads that no longer exist are skipped.
+CREATE OR REPLACE FUNCTION public.refresh_thread_risk_summary(thread_ids UUID[])
+RETURNS VOID
+LANGUAGE sql SECURITY DEFINER SET search_path = public
+AS $$
+    INSERT INTO public.thread_risk_summary AS s
+        (thread_id, turn_count, last_log_at, max_score, last_score, last_level, last_risk_at, updated_at)
+    SELECT t.id, l.turn_count, l.last_log_at, r.max_score, last.score, last.level, last.created_at, now()
+    FROM public.threads t
+    CROSS JOIN LATERAL (
+        SELECT count(*)::INT AS turn_count, max(created_at) AS last_log_at
+        FROM public.logs WHERE thread_id = t.id
+    ) l
+    CROSS JOIN LATERAL (
+        SELECT max(score) AS max_score FROM public.risk_scores WHERE thread_id = t.id
+    ) r
+    LEFT JOIN LATERAL (
+        SELECT score, level, created_at FROM public.risk_scores
+        WHERE thread_id = t.id
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    ) last ON true
+    WHERE t.id = ANY(thread_ids)
+    ORDER BY t.id
+    ON CONFLICT (thread_id) DO UPDATE SET
+        turn_count = EXCLUDED.turn_count,
+        last_log_at = EXCLUDED.last_log_at,
+        max_score = EXCLUDED.max_score,
+        last_score = EXCLUDED.last_score,
+        last_level = EXCLUDED.last_level,
+        last_risk_at = EXCLUDED.last_risk_at,
+        updated_at = now();
+$$;
+
+-- Rows are upserted in thread_id order so concurrent batches covering the
+-- same threads lock them in the same order.
+CREATE OR REPLACE FUNCTION public.thread_risk_summary_logs_inserted()
+RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO public.thread_risk_summary AS s (thread_id, turn_count, last_log_at)
+    SELECT thread_id, count(*), max(created_at)
+    FROM new_logs
+    WHERE thread_id IS NOT NULL
+    GROUP BY thread_id
+    ORDER BY thread_id
+    ON CONFLICT (thread_id) DO UPDATE SET
+        turn_count = s.turn_count + EXCLUDED.turn_count,
+        last_log_at = GREATEST(s.last_log_at, EXCLUDED.last_log_at),
+        updated_at = now();
+    RETURN NULL;
+END;
+$$;
+
+-- Historical rows (rescore.py stamps scores with their window's time) only
+-- move last_* forward when they are newer than what is recorded.
+CREATE OR REPLACE FUNCTION public.thread_risk_summary_scores_inserted()
+RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO public.thread_risk_summary AS s (thread_id, max_score, last_score, last_level, last_risk_at)
+    SELECT DISTINCT ON (thread_id)
+        thread_id, max(score) OVER (PARTITION BY thread_id), score, level, created_at
+    FROM new_scores
+    WHERE thread_id IS NOT NULL
+    ORDER BY thread_id, created_at DESC, id DESC
+    ON CONFLICT (thread_id) DO UPDATE SET
+        max_score = GREATEST(s.max_score, EXCLUDED.max_score),
+        last_score = CASE WHEN s.last_risk_at IS NULL OR EXCLUDED.last_risk_at >= s.last_risk_at
+                          THEN EXCLUDED.last_score ELSE s.last_score END,
+        last_level = CASE WHEN s.last_risk_at IS NULL OR EXCLUDED.last_risk_at >= s.last_risk_at
+                          THEN EXCLUDED.last_level ELSE s.last_level END,
+        last_risk_at = GREATEST(s.last_risk_at, EXCLUDED.last_risk_at),
+        updated_at = now();
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.thread_risk_summary_rows_deleted()
+RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public
+AS $$
+BEGIN
+    PERFORM public.refresh_thread_risk_summary(
+        ARRAY(SELECT DISTINCT thread_id FROM old_rows WHERE thread_id IS NOT NULL)
+    );
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS logs_summary_insert ON public.logs;
+CREATE TRIGGER logs_summary_insert
+    AFTER INSERT ON public.logs
+    REFERENCING NEW TABLE AS new_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION public.thread_risk_summary_logs_inserted();
+
+DROP TRIGGER IF EXISTS logs_summary_delete ON public.logs;
+CREATE TRIGGER logs_summary_delete
+    AFTER DELETE ON public.logs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.thread_risk_summary_rows_deleted();
+
+DROP TRIGGER IF EXISTS risk_scores_summary_insert ON public.risk_scores;
+CREATE TRIGGER risk_scores_summary_insert
+    AFTER INSERT ON public.risk_scores
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT EXECUTE FUNCTION public.thread_risk_summary_scores_inserted();
+
+DROP TRIGGER IF EXISTS risk_scores_summary_delete ON public.risk_scores;
+CREATE TRIGGER risk_scores_summary_delete
+    AFTER DELETE ON public.risk_scores
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.thread_risk_summary_rows_deleted();
+
+REVOKE ALL ON FUNCTION public.refresh_thread_risk_summary(UUID[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.refresh_thread_risk_summary(UUID[]) TO service_role;
+
+-- Backfill threads that already have rows
+SELECT public.refresh_thread_risk_summary(ARRAY(
+    SELECT id FROM public.threads t
+    WHERE EXISTS (SELECT 1 FROM public.logs WHERE thread_id = t.id)
+       OR EXISTS (SELECT 1 FROM public.risk_scores WHERE thread_id = t.id)
+));
@@ -0,0 +1,28 @@
+-- 003: Separate table for back-test scores written by rescore.py. Run after 002.
+-- Kept apart from risk_scores so back-tests never reach the live history,
+-- guardian views or thread_risk_summary. Rows carry what scored them.
+
+CREATE TABLE IF NOT EXISTS public.risk_scores_backtest (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    run_id TEXT NOT NULL,
+    thread_id UUID REFERENCES public.threads(id) ON DELETE CASCADE,
+    log_id UUID NOT NULL, -- last log of the scored window
+    score INT NOT NULL CHECK (score BETWEEN 0 AND 100),
+    level TEXT NOT NULL,
+    reason TEXT,
+    engine TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL, -- the window's historical position
+    scored_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- One score per window per run, so a resumed or repeated run doesn't duplicate rows
+CREATE UNIQUE INDEX IF NOT EXISTS risk_scores_backtest_run_id_log_id_idx
+    ON public.risk_scores_backtest (run_id, log_id);
+
+CREATE INDEX IF NOT EXISTS risk_scores_backtest_thread_id_created_at_idx
+    ON public.risk_scores_backtest (thread_id, created_at, id);
+
+-- Service role only: no policies for anon or authenticated
+ALTER TABLE public.risk_scores_backtest ENABLE ROW LEVEL SECURITY;
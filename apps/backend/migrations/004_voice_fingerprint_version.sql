@@ -0,0 +1,53 @@
+-- 004: Version voice fingerprints. Run after 003.
+-- Fingerprints from before the MFCC embedding (version 2) were random vectors
+-- that can't match anyone; drop them and ask those users to enroll again.
+-- Only fingerprints of the version the backend computes are matched.
+
+ALTER TABLE public.profiles ADD COLUMN IF NOT EXISTS voice_fingerprint_version INT;
+
+UPDATE public.profiles
+SET voice_fingerprint = NULL, is_enrolled = false
+WHERE voice_fingerprint_version IS NULL
+  AND (voice_fingerprint IS NOT NULL OR is_enrolled);
+
+-- Same as 001, restricted to fingerprints of fingerprint_version
+DROP FUNCTION IF EXISTS public.match_circle_voices(UUID, JSONB, FLOAT);
+
+CREATE OR REPLACE FUNCTION public.match_circle_voices(
+    ward_id UUID,
+    query_embeddings JSONB,            -- [[384 floats], ...]
+    fingerprint_version INT,
+    match_threshold FLOAT DEFAULT 0.6
+)
+RETURNS TABLE (segment INT, profile_id UUID, similarity FLOAT)
+LANGUAGE sql STABLE
+AS $$
+    WITH circle AS (
+        SELECT match_circle_voices.ward_id AS id
+        UNION
+        SELECT g.guardian_id
+        FROM public.guardians g
+        WHERE g.user_id = match_circle_voices.ward_id
+          AND g.status = 'active'
+          AND g.guardian_id IS NOT NULL
+    ),
+    queries AS (
+        SELECT (q.ordinality - 1)::INT AS segment, (q.value::TEXT)::vector(384) AS embedding
+        FROM jsonb_array_elements(query_embeddings) WITH ORDINALITY AS q(value, ordinality)
+    )
+    SELECT queries.segment, best.id, best.similarity
+    FROM queries
+    CROSS JOIN LATERAL (
+        SELECT p.id, 1 - (p.voice_fingerprint <=> queries.embedding) AS similarity
+        FROM public.profiles p
+        JOIN circle ON circle.id = p.id
+        WHERE p.voice_fingerprint IS NOT NULL
+          AND p.voice_fingerprint_version = match_circle_voices.fingerprint_version
+        ORDER BY p.voice_fingerprint <=> queries.embedding
+        LIMIT 1
+    ) best
+    WHERE best.similarity >= match_threshold;
+$$;
+
+REVOKE ALL ON FUNCTION public.match_circle_voices(UUID, JSONB, INT, FLOAT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.match_circle_voices(UUID, JSONB, INT, FLOAT) TO service_role;
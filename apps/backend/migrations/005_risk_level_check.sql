@@ -0,0 +1,19 @@
+-- 005: Restrict risk levels to the values the risk engines return. Run after 004.
+-- Added NOT VALID first so existing rows are checked by VALIDATE, which
+-- doesn't block writes; if it fails, older rows hold other values and have
+-- to be mapped to one of these before re-running.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'risk_scores_level_check') THEN
+        ALTER TABLE public.risk_scores ADD CONSTRAINT risk_scores_level_check
+            CHECK (level IN ('low', 'medium', 'high', 'critical')) NOT VALID;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'risk_scores_backtest_level_check') THEN
+        ALTER TABLE public.risk_scores_backtest ADD CONSTRAINT risk_scores_backtest_level_check
+            CHECK (level IN ('low', 'medium', 'high', 'critical')) NOT VALID;
+    END IF;
+END $$;
+
+ALTER TABLE public.risk_scores VALIDATE CONSTRAINT risk_scores_level_check;
+ALTER TABLE public.risk_scores_backtest VALIDATE CONSTRAINT risk_scores_backtest_level_check;
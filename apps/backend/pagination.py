@@ -0,0 +1,78 @@
+# pagination.py
+import re
+import json
+import uuid
+import base64
+from typing import Optional
+
+# Keyset pagination over (created_at, id). Cursors are opaque to clients:
+# url-safe base64 of a small JSON object holding the last (created_at, id)
+# seen per table.
+
+# Positions end up inside a PostgREST filter string (see keyset), so only
+# plain timestamps and UUIDs are accepted from clients
+_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d{1,6})?(Z|[+-]\d{2}(:?\d{2})?)?")
+
+
+def encode_cursor(positions: dict) -> str:
+    raw = json.dumps(positions, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _check_position(position) -> Optional[list]:
+    if position is None:
+        return None
+    if not isinstance(position, list) or len(position) != 2:
+        raise ValueError("Invalid cursor position")
+    created_at, row_id = position
+    if not isinstance(created_at, str) or not _TIMESTAMP_RE.fullmatch(created_at):
+        raise ValueError("Invalid cursor timestamp")
+    if not isinstance(row_id, str):
+        raise ValueError("Invalid cursor id")
+    try:
+        row_id = str(uuid.UUID(row_id))
+    except ValueError:
+        raise ValueError("Invalid cursor id")
+    return [created_at, row_id]
+
+
+def decode_cursor(cursor: Optional[str]) -> dict:
+    """
+    Raises ValueError on a malformed cursor, including any position that
+    isn't a [timestamp, uuid] pair.
+    """
+    if not cursor:
+        return {}
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        positions = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(positions, dict):
+        raise ValueError("Invalid cursor")
+    return {table: _check_position(position) for table, position in positions.items()}
+
+
+def row_position(row: dict) -> list:
+    return [row["created_at"], row["id"]]
+
+
+def keyset(query, position: Optional[list], desc: bool = False):
+    """
+    Applies ORDER BY created_at, id and a strict "after position" filter.
+    With desc=True the order is reversed and the filter becomes "before".
+    """
+    if position:
+        created_at, row_id = position
+        op = "lt" if desc else "gt"
+        query = query.or_(
+            f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{row_id})'
+        )
+    return query.order("created_at", desc=desc).order("id", desc=desc)
+
+
+def page(rows: list, limit: int):
+    """Splits a limit+1 fetch into (rows, has_more)."""
+    if len(rows) > limit:
+        return rows[:limit], True
+    return rows, False
@@ -0,0 +1,285 @@
+# rescore.py
+"""
+Re-scores historical threads from the logs table with the current risk
+engine, e.g. to back-test a SYSTEM_PROMPT or MODEL_ID change.
+
+    cd apps/backend
+    python rescore.py --concurrency 16 --checkpoint rescore.ckpt.json
+    python rescore.py --thread <uuid> --dry-run --out scores.jsonl
+
+Threads and their logs are read lazily in keyset pages. Each thread is
+replayed through a TranscriptWindow, and every --stride turns a window is
+scored, the same way a live session does it. At most --concurrency
+assessments are in flight. Scores are written in bulk to
+risk_scores_backtest (migrations/003), never to the live risk_scores. Each
+row is stamped with the created_at of the window's last log, so it sits at
+its historical position. It is also tagged with the engine, model,
+PROMPT_VERSION and a run id.
+
+A thread's rows are written together once all its windows are scored. The
+checkpoint then records the thread as done, and also keeps the run id.
+Rows are upserted on (run_id, log_id), so an interrupted run resumes
+without duplicating rows.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from collections import Counter
+from typing import AsyncIterator, Optional
+
+from db import supabase, execute, shutdown as shutdown_db
+from pagination import keyset, row_position
+from risk_analysis import assess_danger, get_engine, PROMPT_VERSION, MODEL_ID
+from risk_cache import risk_cache
+from transcript_context import TranscriptWindow, ASSESS_RECENT_TURNS, ASSESS_CONTEXT_TOKENS, format_turn
+
+THREAD_PAGE = 200
+LOG_PAGE = 1000
+
+
+async def iter_threads(thread_ids: Optional[list], since: Optional[str]) -> AsyncIterator[dict]:
+    position = None
+    while True:
+        query = supabase.table("threads").select("id", "initial_context", "created_at")
+        if thread_ids:
+            query = query.in_("id", thread_ids)
+        if since:
+            query = query.gte("created_at", since)
+        res = await execute(keyset(query, position).limit(THREAD_PAGE))
+        for row in res.data:
+            yield row
+        if len(res.data) < THREAD_PAGE:
+            return
+        position = row_position(res.data[-1])
+
+
+async def iter_logs(thread_id: str) -> AsyncIterator[dict]:
+    position = None
+    while True:
+        query = supabase.table("logs").select("id", "content", "speaker_label", "latitude", "longitude", "created_at").eq("thread_id", thread_id)
+        res = await execute(keyset(query, position).limit(LOG_PAGE))
+        for row in res.data:
+            yield row
+        if len(res.data) < LOG_PAGE:
+            return
+        position = row_position(res.data[-1])
+
+
+class Checkpoint:
+    """Run id and finished thread ids, rewritten atomically after every flush."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.done = set()
+        self.run_id: Optional[str] = None
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.done = set(state.get("done", []))
+            self.run_id = state.get("run_id")
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"run_id": self.run_id, "done": sorted(self.done), "updated_at": time.time()}, f)
+        os.replace(tmp, self.path)
+
+
+class Rescorer:
+    def __init__(self, args):
+        self.args = args
+        self.checkpoint = Checkpoint(args.checkpoint)
+        if args.run_id and self.checkpoint.run_id and args.run_id != self.checkpoint.run_id:
+            raise SystemExit(f"--run-id {args.run_id} does not match the checkpoint's run {self.checkpoint.run_id}")
+        self.run_id = args.run_id or self.checkpoint.run_id or f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{uuid.uuid4().hex[:6]}"
+        self.checkpoint.run_id = self.run_id
+        engine = get_engine()
+        self.tags = {
+            "run_id": self.run_id,
+            "engine": engine.name,
+            "model": getattr(engine, "model_id", MODEL_ID),
+            "prompt_version": PROMPT_VERSION,
+        }
+        self.jobs: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 4)
+        self.out = open(args.out, "a") if args.out else None
+        self._flush_lock = asyncio.Lock()
+
+        # thread_id -> windows not yet scored (+1 until all are queued)
+        self.pending = {}
+        self.thread_rows = {}
+        self.failed = set()
+        self.rows = []       # rows of finished threads, waiting for a bulk insert
+        self.finished = []   # those threads, marked done once their rows are written
+        self.threads = 0
+
+        self.windows = 0
+        self.scored = 0
+        self.degraded = 0
+        self.levels = Counter()
+        self.started = time.monotonic()
+
+    async def produce(self):
+        async for thread in iter_threads(self.args.thread, self.args.since):
+            if thread["id"] in self.checkpoint.done:
+                continue
+            if self.args.max_threads and self.threads >= self.args.max_threads:
+                break
+            self.threads += 1
+            await self.queue_thread(thread)
+
+    async def queue_thread(self, thread: dict):
+        thread_id = thread["id"]
+        window = TranscriptWindow(recent_turns=ASSESS_RECENT_TURNS, token_budget=ASSESS_CONTEXT_TOKENS)
+        initial_context = thread.get("initial_context") or ""
+        self.pending[thread_id] = 1
+        self.thread_rows[thread_id] = []
+        since_last = 0
+        last = None
+        async for log in iter_logs(thread_id):
+            if not log.get("content"):
+                continue
+            # Same lines the live session assessed, speaker tags included
+            window.append(format_turn(log["content"], log.get("speaker_label")))
+            last = log
+            since_last += 1
+            if since_last >= self.args.stride:
+                await self.queue_window(thread_id, window.build(initial_context), log)
+                since_last = 0
+        if since_last and last is not None:
+            await self.queue_window(thread_id, window.build(initial_context), last)
+        await self.window_done(thread_id)
+
+    async def queue_window(self, thread_id: str, text: str, log: dict):
+        self.pending[thread_id] += 1
+        self.windows += 1
+        location = None
+        if log.get("latitude") is not None and log.get("longitude") is not None:
+            location = {"lat": log["latitude"], "lon": log["longitude"]}
+        await self.jobs.put((thread_id, text, location, log))
+
+    async def window_done(self, thread_id: str):
+        self.pending[thread_id] -= 1
+        if self.pending[thread_id]:
+            return
+        del self.pending[thread_id]
+        rows = self.thread_rows.pop(thread_id)
+        if thread_id in self.failed:
+            # Left out of the checkpoint, so the next run scores it again
+            return
+        self.rows.extend(rows)
+        self.finished.append(thread_id)
+        if len(self.rows) >= self.args.batch:
+            await self.flush()
+
+    async def worker(self):
+        while True:
+            thread_id, text, location, log = await self.jobs.get()
+            try:
+                result = await assess_danger(text, location=location)
+                if result.get("degraded"):
+                    # Not a real verdict from the engine under test; retry this thread next run
+                    self.degraded += 1
+                    self.failed.add(thread_id)
+                else:
+                    self.scored += 1
+                    self.levels[result["level"]] += 1
+                    row = {
+                        "thread_id": thread_id,
+                        "log_id": log["id"],
+                        "score": int(result["score"]),
+                        "level": result["level"],
+                        "reason": result["reason"],
+                        "created_at": log["created_at"],
+                        **self.tags,
+                    }
+                    self.thread_rows[thread_id].append(row)
+                    if self.out:
+                        self.out.write(json.dumps(row) + "\n")
+                    if self.scored % 500 == 0:
+                        self.report()
+                await self.window_done(thread_id)
+            finally:
+                self.jobs.task_done()
+
+    async def flush(self):
+        async with self._flush_lock:
+            rows, self.rows = self.rows, []
+            finished, self.finished = self.finished, []
+            if rows and not self.args.dry_run:
+                for i in range(0, len(rows), self.args.batch):
+                    await execute(
+                        supabase.table(self.args.table).upsert(
+                            rows[i:i + self.args.batch], on_conflict="run_id,log_id", ignore_duplicates=True,
+                        )
+                    )
+            if not self.args.dry_run:
+                self.checkpoint.done.update(finished)
+                self.checkpoint.save()
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.scored / elapsed if elapsed else 0.0
+        print(
+            f"rescore: {self.scored}/{self.windows} windows, {len(self.checkpoint.done)} threads done, "
+            f"{self.degraded} degraded, {rate:.1f}/s, cache hit rate {risk_cache.hit_rate:.0%}"
+        )
+
+    async def run(self):
+        workers = [asyncio.create_task(self.worker()) for _ in range(self.args.concurrency)]
+        producer = asyncio.create_task(self.produce())
+        joined = None
+        try:
+            # Workers only ever finish by raising; surface that instead of waiting forever
+            done, _ = await asyncio.wait([producer, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+            joined = asyncio.create_task(self.jobs.join())
+            done, _ = await asyncio.wait([joined, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+            await self.flush()
+        finally:
+            tasks = [producer, *workers] + ([joined] if joined else [])
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.out:
+                self.out.close()
+        self.report()
+        print(f"rescore: run {self.run_id}, levels {dict(self.levels)}" + (" (dry run, nothing written)" if self.args.dry_run else ""))
+        return 1 if self.failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Re-score historical threads with the current risk engine")
+    parser.add_argument("--thread", action="append", help="thread id to re-score (repeatable); default all")
+    parser.add_argument("--since", help="only threads created at or after this ISO timestamp")
+    parser.add_argument("--max-threads", type=int, default=0, help="stop after this many threads (0 = no limit)")
+    parser.add_argument("--stride", type=int, default=2, help="score a window every N turns (live sessions use 2)")
+    parser.add_argument("--concurrency", type=int, default=8, help="assessments in flight at once")
+    parser.add_argument("--batch", type=int, default=500, help="rows per bulk insert")
+    parser.add_argument("--table", default="risk_scores_backtest", help="back-test table to write scores to (same columns as risk_scores_backtest)")
+    parser.add_argument("--run-id", help="tag for this run's rows; default a new id, or the checkpoint's when resuming")
+    parser.add_argument("--checkpoint", help="JSON file recording finished threads, for resuming")
+    parser.add_argument("--out", help="also append every score to this JSONL file")
+    parser.add_argument("--dry-run", action="store_true", help="score but write nothing to the database or checkpoint")
+    args = parser.parse_args(argv)
+
+    if supabase is None:
+        parser.error("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
+    if args.table == "risk_scores":
+        parser.error("risk_scores holds live scores; back-test scores go to a separate table such as risk_scores_backtest")
+    try:
+        return asyncio.run(Rescorer(args).run())
+    finally:
+        risk_cache.close()
+        shutdown_db()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,23 +1,29 @@
 # risk_analysis.py
 import os
-import json
+import re
+import math
+import zlib
 import asyncio
-from typing import Optional, Dict, Any
+import time
+import hashlib
+from collections import deque
+from typing import Optional, Dict, Any, List, Tuple
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from google import genai
-from google.genai import types
+from telemetry import get_logger
+
+log = get_logger("risk")
 
-# User provided project no 211841687108
-client = genai.Client(api_key=os.getenv("GEMINI_KEY_SRIJON"))
 MODEL_ID = "gemini-2.0-flash"
 
 SYSTEM_PROMPT = """You are a risk triage assistant for real-world user interactions. Your job is to estimate whether an interaction is escalating toward harm (harassment, coercion, threats, stalking, restraint, assault, extortion, self-harm risk, or other imminent safety concerns) based only on the provided conversation text.
 
 You will be given recent multi-turn conversation text. Treat it as noisy speech-to-text: typos, slang, interruptions, and missing punctuation are normal. Use context across turns and prefer the most recent turns.
 
+Lines may start with a speaker tag. [User] is the person you are protecting (matched to their enrolled voice, or typed by them); [Guardian] is one of their trusted contacts, recognised by voice; [Other] is anyone else. Untagged lines have no speaker information. Demands, threats or control coming from [Other] toward the user weigh more than the same words from [User]; distress, refusals or calls for help from [User] are strong signals.
+
 RETURN FORMAT (STRICT):
 
 Return ONLY a JSON object (no markdown, no extra text) with exactly these keys:
@@ -158,6 +164,200 @@ No markdown.
 
 No extra text."""
 
+# --- Local pre-screen -------------------------------------------------------
+#
+# A cheap in-process scorer that runs before Gemini. Phrases are taken from the
+# RISK SIGNALS taxonomy in SYSTEM_PROMPT and matched in a single pass with an
+# Aho-Corasick automaton. Weights follow the prompt's SCORING METHOD.
+
+_THREAT_OPENERS = ("i'll", "i will", "i'm going to", "im going to", "i'm gonna", "im gonna")
+
+PRESCREEN_SIGNALS = {
+    # CRITICAL: only phrases that are threatening on their own, since a
+    # critical hit sends a provisional score before the model has run.
+    # Weapon possession, first-person threats at the listener, restraint
+    "critical": (45, [
+        "i have a gun", "i've got a gun", "i have a knife", "i've got a knife",
+        *[f"{opener} {verb} you" for opener in _THREAT_OPENERS for verb in ("kill", "hurt", "stab")],
+        *[f"{opener} tie you up" for opener in _THREAT_OPENERS],
+        "not letting you leave", "locked you in", "lock you in",
+    ]),
+    # HIGH: isolation/control, implied threats, blocking exit, plus phrases
+    # that are only alarming in context (weapons, bare threats that also
+    # occur in "I'd never hurt you", pleas, doors, self-harm idioms); these
+    # send the window to the model without a provisional score
+    "high": (25, [
+        "don't call anyone", "dont call anyone", "give me your phone", "hand me your phone",
+        "nobody will know", "no one will know", "no one will hear", "nobody will hear",
+        "get in the car", "or else", "don't move", "dont move", "you can't leave", "you cant leave",
+        "you're not leaving", "you are not leaving", "youre not leaving",
+        "stay right there", "you'll regret", "you will regret", "let me go", "let go of me",
+        "lock the door", "locked the door", "tie you up",
+        "kill you", "hurt you", "shoot you", "stab you",
+        "gun", "knife", "pistol", "weapon", "blade", "rape",
+        "help me", "someone help", "somebody help", "call the police", "call 911",
+        "kill myself", "end my life", "want to die",
+    ]),
+    # MEDIUM: refusal not respected, intimidation, pressure for personal info
+    "medium": (12, [
+        "i said no", "please stop", "stop it", "stop touching", "leave me alone", "back off",
+        "get away from me", "don't touch me", "dont touch me", "where do you live",
+        "what's your address", "whats your address", "send me a picture", "shut up",
+        "bitch", "slut", "stupid",
+    ]),
+}
+
+_LEVEL_REASONS = {
+    "low": "No immediate danger detected. Stay aware and trust your instincts.",
+    "medium": "Set a firm boundary and avoid sharing personal info. Consider informing a trusted contact.",
+    "high": "Create distance immediately. Contact a trusted person and move to a safer, public location.",
+    "critical": "Seek immediate help. Call emergency services or trigger your safety alert now.",
+}
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over normalized text, matching whole words only."""
+
+    def __init__(self, phrases: Dict[str, Tuple[str, int]]):
+        # phrases: phrase -> (tier, weight)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        self._phrases = phrases
+        for phrase in phrases:
+            node = 0
+            for ch in phrase:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(phrase)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[str, str, int]]:
+        """Returns (phrase, tier, weight) for every whole-word match in text."""
+        hits = []
+        node = 0
+        n = len(text)
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for phrase in self._out[node]:
+                start = i - len(phrase) + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (i + 1 == n or not text[i + 1].isalnum()):
+                    tier, weight = self._phrases[phrase]
+                    hits.append((phrase, tier, weight))
+        return hits
+
+
+_MATCHER = PhraseMatcher({
+    phrase: (tier, weight)
+    for tier, (weight, phrases) in PRESCREEN_SIGNALS.items()
+    for phrase in phrases
+})
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_transcript(text: str) -> str:
+    text = text.lower().replace("\u2019", "'").replace("\u2018", "'")
+    return _WS_RE.sub(" ", text)
+
+
+class HashedTextModel:
+    """
+    Optional linear model over hashed unigrams/bigrams, loaded from an .npz with
+    `weights` (D,) and `bias`. Returns a probability that the text is risky.
+    """
+
+    def __init__(self, path: str):
+        import numpy as np
+        self._np = np
+        data = np.load(path)
+        self.weights = data["weights"].astype(np.float32)
+        self.bias = float(data["bias"])
+        self.dim = self.weights.shape[0]
+
+    def predict(self, text: str) -> float:
+        np = self._np
+        tokens = re.findall(r"[a-z']+", text)
+        feats = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not feats:
+            return 0.0
+        idx = np.fromiter((zlib.crc32(f.encode()) % self.dim for f in feats), dtype=np.int64, count=len(feats))
+        x = np.bincount(idx, minlength=self.dim).astype(np.float32)
+        z = float(x @ self.weights) + self.bias
+        return 1.0 / (1.0 + math.exp(-z))
+
+
+_PRESCREEN_MODEL = None
+_model_path = os.getenv("RISK_PRESCREEN_MODEL")
+if _model_path:
+    try:
+        _PRESCREEN_MODEL = HashedTextModel(_model_path)
+    except Exception as e:
+        log.exception("Prescreen model load error", extra={"path": _model_path})
+
+
+def _level_for(score: float) -> str:
+    if score >= 85: return "critical"
+    if score >= 70: return "high"
+    if score >= 40: return "medium"
+    return "low"
+
+
+def prescreen(transcript: str) -> dict:
+    """
+    Microsecond-scale local scoring of a transcript window.
+
+    Returns: {"level": str, "score": float, "reason": str, "signals": [str], "benign": bool}
+    "benign" is True only when no phrase and no model signal fired.
+    """
+    text = normalize_transcript(transcript)
+    hits = _MATCHER.find(text)
+
+    # Count each phrase once; start at 10 like the prompt's scoring method
+    seen = {}
+    for phrase, tier, weight in hits:
+        seen[phrase] = weight
+    score = 10.0 + sum(sorted(seen.values(), reverse=True)[:3])
+    if any(tier == "critical" for _, tier, _ in hits):
+        score = max(score, 85.0)
+
+    model_risky = False
+    if _PRESCREEN_MODEL is not None:
+        p = _PRESCREEN_MODEL.predict(text)
+        model_risky = p >= 0.5
+        if model_risky:
+            score = max(score, 40.0)
+
+    score = min(score, 100.0)
+    level = _level_for(score)
+    return {
+        "level": level,
+        "score": score,
+        "reason": _LEVEL_REASONS[level],
+        "signals": sorted(seen),
+        "benign": not seen and not model_risky,
+    }
+
+
 def _sanitize_result(obj: dict) -> dict:
     level = obj.get("level", "low")
     score = float(obj.get("score", 0.0))
@@ -168,48 +368,86 @@ def _sanitize_result(obj: dict) -> dict:
     if score > 100: score = 100.0
     if not isinstance(reason, str):
         reason = str(reason)
-    return {"level": level, "score": score, "reason": reason}
+    result = {"level": level, "score": score, "reason": reason}
+    if obj.get("degraded"):
+        result["degraded"] = True
+    return result
+
+_engine = None
+
+
+def get_engine():
+    """The deployment's RiskEngine (see risk_engines.build_engine), created on first use."""
+    global _engine
+    if _engine is None:
+        from risk_engines import build_engine
+        _engine = build_engine()
+    return _engine
+
+
+def set_engine(engine):
+    """Swap the engine at runtime, e.g. a stub for load tests."""
+    global _engine
+    _engine = engine
+
+
+# Last-resort timeout around engine.assess. A ResilientEngine answers within
+# its own deadline (with the local scorer if need be), so this only bounds
+# engines without one; it is raised above that deadline if needed.
+ASSESS_TIMEOUT_S = float(os.getenv("ASSESS_TIMEOUT_S", "30"))
+
+# Changes whenever the prompt does, so cached results from an older prompt miss
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+LOCATION_BUCKET_DEG = 0.01  # ~1 km
+
+
+def cache_key(engine, transcript: str, location: Optional[dict] = None) -> str:
+    """
+    Content address for an assessment: the normalized window, the location
+    rounded to a coarse bucket, and the engine/model/prompt that scored it.
+    """
+    bucket = None
+    if location and location.get("lat") is not None and location.get("lon") is not None:
+        bucket = (round(location["lat"] / LOCATION_BUCKET_DEG), round(location["lon"] / LOCATION_BUCKET_DEG))
+    model = getattr(engine, "model_id", MODEL_ID)
+    material = f"{engine.name}|{model}|{PROMPT_VERSION}|{bucket}|{normalize_transcript(transcript).strip()}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
 
 async def assess_danger(transcript: str, location: Optional[dict] = None) -> dict:
     """
-    Returns: {"level": str, "score": float, "reason": str}
+    Returns: {"level": str, "score": float, "reason": str}, plus "degraded": True
+    when the score came from a fallback rather than the configured engine.
     """
-    payload = {"transcript": transcript, "location": location}
-
-    async def _call_gemini() -> dict:
-        prompt = f"{SYSTEM_PROMPT}\n\nTask: Analyze this interaction transcript for safety risks.\nInput: {json.dumps(payload)}"
-        
-        response = await asyncio.to_thread(
-            client.models.generate_content,
-            model=MODEL_ID,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0,
-                response_mime_type="application/json",
-            )
-        )
-
-        if not response.text:
-            raise ValueError("Empty response from Gemini")
-
-        content = response.text.strip()
-        
-        # Extract JSON if needed
-        start = content.find("{")
-        end = content.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            content = content[start : end + 1]
-
-        return json.loads(content)
+    from risk_cache import risk_cache
+    from metrics import ASSESS_SECONDS, ASSESS_IN_FLIGHT, RISK_FALLBACKS
+    engine = get_engine()
+    deadline = getattr(engine, "deadline", None)
+    timeout = ASSESS_TIMEOUT_S if deadline is None else max(ASSESS_TIMEOUT_S, deadline + 5.0)
+    started = time.perf_counter()
+    outcome = "cached"  # unless compute runs here
+
+    async def compute():
+        nonlocal outcome
+        try:
+            with ASSESS_IN_FLIGHT.track_inprogress():
+                result = await asyncio.wait_for(engine.assess(transcript, location), timeout=timeout)
+            outcome = "degraded" if result.get("degraded") else "ok"
+            # Fallback scores from a degraded engine are served but not cached
+            return _sanitize_result(result), not result.get("degraded")
+
+        except Exception as e:
+            # No answer from the engine: score locally rather than report 0
+            outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            RISK_FALLBACKS.labels(engine=engine.name, reason=outcome).inc()
+            result = _sanitize_result(prescreen(transcript))
+            result["degraded"] = True
+            return result, False
 
     try:
-        # Optional timeout
-        result = await asyncio.wait_for(_call_gemini(), timeout=30)
-        return _sanitize_result(result)
-
-    except Exception as e:
-        return {
-            "level": "low",
-            "score": 0.0,
-            "reason": f"Assessment unavailable (Gemini error: {type(e).__name__}).",
-        }
\ No newline at end of file
+        return await risk_cache.get_or_compute(cache_key(engine, transcript, location), compute)
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        ASSESS_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - started)
@@ -0,0 +1,180 @@
+# risk_cache.py
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from metrics import RISK_CACHE_ENTRIES, RISK_CACHE_LOOKUPS
+from telemetry import get_logger
+
+log = get_logger("risk_cache")
+
+RISK_CACHE_SIZE = int(os.getenv("RISK_CACHE_SIZE", "4096"))
+RISK_CACHE_TTL_S = int(os.getenv("RISK_CACHE_TTL_S", "900"))
+# Optional SQLite file so cached results survive restarts
+RISK_CACHE_PATH = os.getenv("RISK_CACHE_PATH")
+
+
+class RiskCache:
+    """
+    Content-addressed cache of assessment results: an in-memory LRU with a
+    TTL, optionally backed by a SQLite file.
+
+    Keys are built by the caller (see risk_analysis.cache_key). Concurrent
+    lookups for the same key share one computation (get_or_compute), so a
+    burst of identical windows costs a single model call.
+    """
+
+    def __init__(self, max_entries: int = RISK_CACHE_SIZE, ttl: float = RISK_CACHE_TTL_S, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at wall time, result)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS risk_cache (key TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._db.execute("DELETE FROM risk_cache WHERE expires_at < ?", (time.time(),))
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning("Disk tier disabled", extra={"path": path, "error": repr(e)})
+                self._db = None
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    def _get_memory(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _put_memory(self, key: str, result: dict, expires_at: float):
+        self._entries[key] = (expires_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT result, expires_at FROM risk_cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return (row[1], json.loads(row[0])) if row else None
+
+    def _disk_put(self, key: str, result: dict, expires_at: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO risk_cache (key, result, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(result), expires_at),
+            )
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[dict]:
+        result = self._get_memory(key)
+        if result is not None:
+            self.hits += 1
+            RISK_CACHE_LOOKUPS.labels(result="hit").inc()
+            return dict(result)
+        if self._db is not None:
+            try:
+                found = await asyncio.to_thread(self._disk_get, key)
+            except sqlite3.Error as e:
+                log.warning("Disk read error", extra={"error": repr(e)})
+                found = None
+            if found is not None:
+                expires_at, result = found
+                self._put_memory(key, result, expires_at)
+                self.disk_hits += 1
+                RISK_CACHE_LOOKUPS.labels(result="disk_hit").inc()
+                return dict(result)
+        self.misses += 1
+        RISK_CACHE_LOOKUPS.labels(result="miss").inc()
+        return None
+
+    async def put(self, key: str, result: dict):
+        expires_at = time.time() + self.ttl
+        self._put_memory(key, dict(result), expires_at)
+        if self._db is not None:
+            try:
+                await asyncio.to_thread(self._disk_put, key, result, expires_at)
+            except sqlite3.Error as e:
+                log.warning("Disk write error", extra={"error": repr(e)})
+
+    async def get_or_compute(self, key: str, compute) -> dict:
+        """
+        Cached result for key, else the result of `await compute()`.
+        compute returns (result, cacheable); failures are not cached.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return dict(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The session that started it went away; compute it here instead
+                return await self.get_or_compute(key, compute)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result, cacheable = await compute()
+            if cacheable:
+                await self.put(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Followers re-raise it; mark it retrieved so it isn't reported as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+
+risk_cache = RiskCache(path=RISK_CACHE_PATH)
+RISK_CACHE_ENTRIES.set_function(lambda: len(risk_cache._entries))
@@ -0,0 +1,481 @@
+# risk_engines.py
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+from collections import deque
+from typing import Optional, Protocol
+
+from metrics import LLM_IN_FLIGHT, RISK_FALLBACKS
+from telemetry import get_logger
+from risk_analysis import SYSTEM_PROMPT, MODEL_ID, prescreen, normalize_transcript
+
+log = get_logger("risk_engines")
+
+
+class RiskEngine(Protocol):
+    """
+    Anything that can score a transcript window.
+    assess() returns a raw {"level", "score", "reason"} dict; assess_danger
+    sanitizes it and handles timeouts/errors.
+    """
+    name: str
+
+    async def assess(self, transcript: str, location: Optional[dict] = None) -> dict:
+        ...
+
+
+class GeminiEngine:
+    """
+    Sends SYSTEM_PROMPT as the system instruction and the transcript payload
+    as the only content, so every call shares the same prefix for Gemini's
+    implicit caching. SYSTEM_PROMPT (~1k tokens) is under the minimum for an
+    explicit cache. Output is constrained by a response schema, so the reply
+    parses directly. Prefix reuse is tracked from usage metadata.
+    """
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model_id: str = MODEL_ID):
+        from google import genai
+        from google.genai import types
+        # User provided project no 211841687108
+        self.client = genai.Client(api_key=api_key or os.getenv("GEMINI_KEY_SRIJON"))
+        self.model_id = model_id
+        self.response_schema = types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "level": types.Schema(type=types.Type.STRING, enum=["low", "medium", "high", "critical"]),
+                "score": types.Schema(type=types.Type.INTEGER, minimum=0, maximum=100),
+                "reason": types.Schema(type=types.Type.STRING),
+            },
+            required=["level", "score", "reason"],
+            property_ordering=["level", "score", "reason"],
+        )
+        self.config = types.GenerateContentConfig(
+            system_instruction=SYSTEM_PROMPT,
+            temperature=0,
+            response_mime_type="application/json",
+            response_schema=self.response_schema,
+        )
+
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    @property
+    def prefix_reuse(self) -> float:
+        """Share of prompt tokens served from cache so far."""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def _record_usage(self, response):
+        usage = response.usage_metadata
+        self.calls += 1
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_token_count or 0
+            self.cached_tokens += usage.cached_content_token_count or 0
+        if self.calls % 100 == 1:
+            log.info("Gemini prompt reuse", extra={
+                "prefix_reuse": round(self.prefix_reuse, 4), "prompt_tokens": self.prompt_tokens, "calls": self.calls,
+            })
+
+    async def assess(self, transcript: str, location: Optional[dict] = None) -> dict:
+        payload = {"transcript": transcript, "location": location}
+        contents = f"Task: Analyze this interaction transcript for safety risks.\nInput: {json.dumps(payload)}"
+
+        # Native async client: no executor thread is held while a call is in flight
+        response = await self.client.aio.models.generate_content(
+            model=self.model_id,
+            contents=contents,
+            config=self.config,
+        )
+
+        self._record_usage(response)
+        if isinstance(response.parsed, dict):
+            return response.parsed
+        if not response.text:
+            raise ValueError("Empty response from Gemini")
+        return json.loads(response.text)
+
+
+class HeuristicEngine:
+    """Local pre-screen only. No network, microsecond latency."""
+    name = "heuristic"
+
+    async def assess(self, transcript: str, location: Optional[dict] = None) -> dict:
+        return prescreen(transcript)
+
+
+class StubEngine:
+    """
+    Offline stand-in for load testing. Scores come from the local pre-screen,
+    so they are deterministic for a given transcript. Latency is drawn from a
+    configurable distribution, and a fraction of calls can fail.
+
+    latency spec (milliseconds):
+      "fixed:200", "uniform:100,400", "normal:300,50" (mean, stdev),
+      "lognormal:300,0.5" (median, sigma)
+    """
+    name = "stub"
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, seed: Optional[int] = None):
+        self._rng = random.Random(seed)
+        self._sample = self._parse_latency(latency)
+        self.error_rate = error_rate
+
+    def _parse_latency(self, spec: str):
+        kind, _, args = spec.partition(":")
+        values = [float(v) for v in args.split(",") if v.strip()] if args else []
+        rng = self._rng
+        if kind == "fixed":
+            ms = values[0] if values else 0.0
+            return lambda: ms
+        if kind == "uniform":
+            lo, hi = values
+            return lambda: rng.uniform(lo, hi)
+        if kind == "normal":
+            mean, stdev = values
+            return lambda: max(0.0, rng.gauss(mean, stdev))
+        if kind == "lognormal":
+            import math
+            median, sigma = values
+            mu = math.log(median)
+            return lambda: rng.lognormvariate(mu, sigma)
+        raise ValueError(f"Unknown latency distribution: {spec}")
+
+    async def assess(self, transcript: str, location: Optional[dict] = None) -> dict:
+        await asyncio.sleep(self._sample() / 1000)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise RuntimeError("Simulated stub failure")
+        return prescreen(transcript)
+
+
+class ReplayEngine:
+    """
+    Replays recorded results from a JSONL file. Each line is either
+    {"transcript": ..., "result": {...}} (matched by normalized transcript)
+    or a bare {"level", "score", "reason"} result. Unmatched transcripts get
+    the unkeyed results in order, cycling.
+    """
+    name = "replay"
+
+    def __init__(self, path: str):
+        self._by_key = {}
+        self._sequence = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "result" in record:
+                    self._by_key[self._key(record.get("transcript", ""))] = record["result"]
+                    self._sequence.append(record["result"])
+                else:
+                    self._sequence.append(record)
+        if not self._sequence:
+            raise ValueError(f"No results in replay file {path}")
+        self._next = 0
+
+    @staticmethod
+    def _key(transcript: str) -> str:
+        return hashlib.sha256(normalize_transcript(transcript).encode()).hexdigest()
+
+    async def assess(self, transcript: str, location: Optional[dict] = None) -> dict:
+        result = self._by_key.get(self._key(transcript))
+        if result is None:
+            result = self._sequence[self._next % len(self._sequence)]
+            self._next += 1
+        return dict(result)
+
+
+class TokenBucket:
+    """Async token bucket: `rate` calls per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. After `reset_after`
+    seconds it lets a single probe through (half-open); the probe's outcome
+    closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def release(self):
+        """The allowed call ended without an upstream verdict (e.g. cancelled)."""
+        self._probing = False
+
+    def record_success(self):
+        self._failures = 0
+        self._probing = False
+        if self.state != "closed":
+            log.info("Risk engine circuit closed")
+            self.state = "closed"
+
+    def record_failure(self):
+        self._failures += 1
+        self._probing = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                log.warning("Risk engine circuit open; using local scorer", extra={
+                    "failures": self._failures, "reset_after_s": self.reset_after,
+                })
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class _Saturated(Exception):
+    pass
+
+
+class ResilientEngine:
+    """
+    Shared guard around a network engine, used by every session:
+
+    - at most max_concurrency calls in flight (plus an optional token bucket
+      rate); a call that can't get a slot within queue_timeout goes to the
+      fallback instead of queueing behind a brownout;
+    - per-call timeout and retries with full-jitter exponential backoff,
+      all within one overall deadline; a call still unanswered at the
+      deadline goes to the fallback;
+    - a circuit breaker that sends calls straight to the fallback (the local
+      scorer) while the upstream is failing;
+    - hedging: once enough latencies are known, a call still running at the
+      p95 gets a second request if a slot is free, and the first reply wins.
+
+    Fallback results carry "degraded": True so they aren't cached.
+    """
+
+    def __init__(
+        self,
+        inner: RiskEngine,
+        fallback: Optional[RiskEngine] = None,
+        max_concurrency: int = 16,
+        rate: float = 0.0,
+        queue_timeout: float = 2.0,
+        call_timeout: float = 10.0,
+        max_attempts: int = 3,
+        backoff: float = 0.25,
+        deadline: float = 20.0,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = True,
+        hedge_min_samples: int = 20,
+    ):
+        self.inner = inner
+        self.name = inner.name
+        self.model_id = getattr(inner, "model_id", MODEL_ID)
+        self.fallback = fallback or HeuristicEngine()
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate) if rate > 0 else None
+        self.queue_timeout = queue_timeout
+        self.call_timeout = call_timeout
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff = backoff
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = deque(maxlen=200)
+
+        self.in_flight = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+
+    def _hedge_after(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def _call(self, transcript: str, location: Optional[dict]) -> dict:
+        if self._bucket is not None:
+            await self._bucket.acquire()
+        self.in_flight += 1
+        LLM_IN_FLIGHT.inc()
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self.inner.assess(transcript, location), self.call_timeout)
+        finally:
+            self.in_flight -= 1
+            LLM_IN_FLIGHT.dec()
+        self._latencies.append(time.monotonic() - started)
+        return result
+
+    async def _first_success(self, primary: asyncio.Task, hedge: asyncio.Task) -> dict:
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _attempt(self, transcript: str, location: Optional[dict]) -> dict:
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise _Saturated()
+        try:
+            primary = asyncio.create_task(self._call(transcript, location))
+            deadline = self._hedge_after()
+            if deadline is None or self.call_timeout <= deadline:
+                return await primary
+            try:
+                done, _ = await asyncio.wait({primary}, timeout=deadline)
+            except asyncio.CancelledError:
+                primary.cancel()
+                raise
+            if done or self._slots.locked():
+                # Finished, or no spare capacity to hedge with
+                return await primary
+
+            await self._slots.acquire()  # a slot is free, so this doesn't wait
+            try:
+                self.hedges += 1
+                hedge = asyncio.create_task(self._call(transcript, location))
+                return await self._first_success(primary, hedge)
+            finally:
+                self._slots.release()
+        finally:
+            self._slots.release()
+
+    async def _fallback(self, transcript: str, location: Optional[dict], why: str) -> dict:
+        self.fallbacks += 1
+        RISK_FALLBACKS.labels(engine=self.name, reason=why).inc()
+        if self.fallbacks % 100 == 1:
+            log.warning("Risk engine fallback", extra={"fallback": self.fallback.name, "reason": why, "fallbacks": self.fallbacks})
+        result = dict(await self.fallback.assess(transcript, location))
+        result["degraded"] = True
+        return result
+
+    async def assess(self, transcript: str, location: Optional[dict] = None) -> dict:
+        try:
+            return await asyncio.wait_for(self._assess(transcript, location), self.deadline)
+        except asyncio.TimeoutError:
+            return await self._fallback(transcript, location, "deadline")
+
+    async def _assess(self, transcript: str, location: Optional[dict]) -> dict:
+        error: Optional[Exception] = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            if not self.breaker.allow():
+                return await self._fallback(transcript, location, "circuit_open")
+            try:
+                result = await self._attempt(transcript, location)
+            except _Saturated:
+                self.breaker.release()
+                return await self._fallback(transcript, location, "saturated")
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                error = e
+                continue
+            self.breaker.record_success()
+            return result
+        return await self._fallback(transcript, location, "timeout" if isinstance(error, asyncio.TimeoutError) else "error")
+
+
+# Shared limits for network engines (gemini, stub)
+RISK_RESILIENT = os.getenv("RISK_RESILIENT", "1") == "1"
+RISK_MAX_CONCURRENCY = int(os.getenv("RISK_MAX_CONCURRENCY", "16"))
+RISK_RATE_PER_S = float(os.getenv("RISK_RATE_PER_S", "0"))  # 0 = no rate limit
+RISK_CALL_TIMEOUT_S = float(os.getenv("RISK_CALL_TIMEOUT_S", "10"))
+RISK_MAX_ATTEMPTS = int(os.getenv("RISK_MAX_ATTEMPTS", "3"))
+# Overall budget for one assessment, retries and queueing included. Keep it
+# under risk_analysis.ASSESS_TIMEOUT_S so the local fallback gets to answer.
+RISK_DEADLINE_S = float(os.getenv("RISK_DEADLINE_S", "20"))
+RISK_BREAKER_FAILURES = int(os.getenv("RISK_BREAKER_FAILURES", "5"))
+RISK_BREAKER_RESET_S = float(os.getenv("RISK_BREAKER_RESET_S", "30"))
+RISK_HEDGE = os.getenv("RISK_HEDGE", "1") == "1"
+
+
+def _resilient(engine: RiskEngine) -> RiskEngine:
+    if not RISK_RESILIENT:
+        return engine
+    return ResilientEngine(
+        engine,
+        max_concurrency=RISK_MAX_CONCURRENCY,
+        rate=RISK_RATE_PER_S,
+        call_timeout=RISK_CALL_TIMEOUT_S,
+        max_attempts=RISK_MAX_ATTEMPTS,
+        deadline=RISK_DEADLINE_S,
+        breaker=CircuitBreaker(RISK_BREAKER_FAILURES, RISK_BREAKER_RESET_S),
+        hedge=RISK_HEDGE,
+    )
+
+
+def build_engine(name: Optional[str] = None) -> RiskEngine:
+    """
+    Selects the engine for this deployment from RISK_ENGINE:
+    gemini (default), heuristic, stub or replay. Network engines are wrapped
+    in a ResilientEngine unless RISK_RESILIENT=0.
+    """
+    name = (name or os.getenv("RISK_ENGINE", "gemini")).lower()
+    if name == "gemini":
+        return _resilient(GeminiEngine())
+    if name == "heuristic":
+        return HeuristicEngine()
+    if name == "stub":
+        seed = os.getenv("RISK_STUB_SEED")
+        return _resilient(StubEngine(
+            latency=os.getenv("RISK_STUB_LATENCY", "lognormal:800,0.4"),
+            error_rate=float(os.getenv("RISK_STUB_ERROR_RATE", "0")),
+            seed=int(seed) if seed else None,
+        ))
+    if name == "replay":
+        return ReplayEngine(os.environ["RISK_REPLAY_FILE"])
+    raise ValueError(f"Unknown RISK_ENGINE: {name}")
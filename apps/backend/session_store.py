@@ -0,0 +1,203 @@
+# session_store.py
+import os
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional, Protocol
+
+# Set to a redis:// URL (Redis, Valkey, KeyDB, ...) to share session state
+# between workers. Unset keeps state in this process only.
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL")
+SESSION_STORE_MAX_TURNS = int(os.getenv("SESSION_STORE_MAX_TURNS", "50"))
+SESSION_TTL_S = int(os.getenv("SESSION_TTL_S", str(6 * 3600)))
+# Outbound events kept per thread for replay after a client reconnects
+SESSION_REPLAY_EVENTS = int(os.getenv("SESSION_REPLAY_EVENTS", "200"))
+
+
+class SessionStore(Protocol):
+    """
+    Per-thread live session state that must survive a reconnect or a move to
+    another worker: recent turns, counters, last known location, and the
+    last few events sent to the client, numbered by a per-thread seq.
+    """
+
+    async def load(self, thread_id: str) -> Optional[dict]:
+        """Returns {"turns": [...], "turn_count": int, "seq": int, "last_score": int, "lat", "lon"} or None."""
+        ...
+
+    async def append_turn(self, thread_id: str, *turns: str):
+        ...
+
+    async def update(self, thread_id: str, **fields):
+        ...
+
+    async def record_event(self, thread_id: str, event: dict) -> int:
+        """Buffers an outbound event and returns its seq."""
+        ...
+
+    async def events_since(self, thread_id: str, seq: int) -> List[dict]:
+        """Buffered events with a seq above `seq`, oldest first, each carrying its "seq"."""
+        ...
+
+
+class InMemorySessionStore:
+    def __init__(
+        self,
+        max_turns: int = SESSION_STORE_MAX_TURNS,
+        ttl: float = SESSION_TTL_S,
+        max_events: int = SESSION_REPLAY_EVENTS,
+    ):
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_events = max_events
+        self._sessions: Dict[str, dict] = {}
+
+    def _get(self, thread_id: str, create: bool = False) -> Optional[dict]:
+        state = self._sessions.get(thread_id)
+        now = time.monotonic()
+        if state is not None and now - state["touched"] > self.ttl:
+            del self._sessions[thread_id]
+            state = None
+        if state is None and create:
+            if len(self._sessions) > 10000:
+                self._expire(now)
+            state = {
+                "turns": [],
+                "events": deque(maxlen=self.max_events),
+                "fields": {"turn_count": 0, "seq": 0},
+                "touched": now,
+            }
+            self._sessions[thread_id] = state
+        if state is not None:
+            state["touched"] = now
+        return state
+
+    def _expire(self, now: float):
+        for key, state in list(self._sessions.items()):
+            if now - state["touched"] > self.ttl:
+                del self._sessions[key]
+
+    async def load(self, thread_id: str) -> Optional[dict]:
+        state = self._get(thread_id)
+        if state is None:
+            return None
+        return {"turns": list(state["turns"]), **state["fields"]}
+
+    async def append_turn(self, thread_id: str, *turns: str):
+        state = self._get(thread_id, create=True)
+        state["turns"].extend(turns)
+        del state["turns"][:-self.max_turns]
+        state["fields"]["turn_count"] = state["fields"].get("turn_count", 0) + len(turns)
+
+    async def update(self, thread_id: str, **fields):
+        state = self._get(thread_id, create=True)
+        state["fields"].update(fields)
+
+    async def record_event(self, thread_id: str, event: dict) -> int:
+        state = self._get(thread_id, create=True)
+        seq = state["fields"].get("seq", 0) + 1
+        state["fields"]["seq"] = seq
+        state["events"].append({**event, "seq": seq})
+        return seq
+
+    async def events_since(self, thread_id: str, seq: int) -> List[dict]:
+        state = self._get(thread_id)
+        if state is None:
+            return []
+        return [e for e in state["events"] if e["seq"] > seq]
+
+
+class RedisSessionStore:
+    """
+    Same state in Redis: capped lists of turns and events plus a hash of
+    fields per thread, all expiring SESSION_TTL_S after the last write.
+    """
+
+    # Numbers and buffers an event in one round trip, atomically across workers
+    _RECORD_EVENT = """
+    local seq = redis.call('HINCRBY', KEYS[2], 'seq', 1)
+    redis.call('RPUSH', KEYS[1], cjson.encode({seq = seq, event = cjson.decode(ARGV[1])}))
+    redis.call('LTRIM', KEYS[1], -tonumber(ARGV[2]), -1)
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    return seq
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_turns: int = SESSION_STORE_MAX_TURNS,
+        ttl: int = SESSION_TTL_S,
+        max_events: int = SESSION_REPLAY_EVENTS,
+    ):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url, decode_responses=True)
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_events = max_events
+        self._record_event = self._redis.register_script(self._RECORD_EVENT)
+
+    @staticmethod
+    def _keys(thread_id: str):
+        return f"session:{thread_id}:turns", f"session:{thread_id}"
+
+    async def load(self, thread_id: str) -> Optional[dict]:
+        turns_key, fields_key = self._keys(thread_id)
+        pipe = self._redis.pipeline()
+        pipe.lrange(turns_key, 0, -1)
+        pipe.hgetall(fields_key)
+        turns, fields = await pipe.execute()
+        if not turns and not fields:
+            return None
+        state = {k: json.loads(v) for k, v in fields.items()}
+        state.setdefault("turn_count", len(turns))
+        state["turns"] = turns
+        return state
+
+    async def append_turn(self, thread_id: str, *turns: str):
+        if not turns:
+            return
+        turns_key, fields_key = self._keys(thread_id)
+        pipe = self._redis.pipeline()
+        pipe.rpush(turns_key, *turns)
+        pipe.ltrim(turns_key, -self.max_turns, -1)
+        pipe.hincrby(fields_key, "turn_count", len(turns))
+        pipe.expire(turns_key, self.ttl)
+        pipe.expire(fields_key, self.ttl)
+        await pipe.execute()
+
+    async def update(self, thread_id: str, **fields):
+        _, fields_key = self._keys(thread_id)
+        pipe = self._redis.pipeline()
+        pipe.hset(fields_key, mapping={k: json.dumps(v) for k, v in fields.items()})
+        pipe.expire(fields_key, self.ttl)
+        await pipe.execute()
+
+    async def record_event(self, thread_id: str, event: dict) -> int:
+        _, fields_key = self._keys(thread_id)
+        events_key = f"session:{thread_id}:events"
+        return int(await self._record_event(
+            keys=[events_key, fields_key],
+            args=[json.dumps(event), self.max_events, self.ttl],
+        ))
+
+    async def events_since(self, thread_id: str, seq: int) -> List[dict]:
+        stored = await self._redis.lrange(f"session:{thread_id}:events", 0, -1)
+        events = []
+        for raw in stored:
+            entry = json.loads(raw)
+            if entry["seq"] > seq:
+                events.append({**entry["event"], "seq": entry["seq"]})
+        return events
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def build_store(url: Optional[str] = SESSION_STORE_URL) -> SessionStore:
+    if url:
+        return RedisSessionStore(url)
+    return InMemorySessionStore()
+
+
+session_store = build_store()
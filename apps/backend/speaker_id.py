@@ -0,0 +1,197 @@
+# speaker_id.py
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from db import supabase, execute
+from guardian_index import guardian_index
+from metrics import EXECUTOR_THREADS
+from voice import EMBEDDING_DIM, VOICE_FINGERPRINT_VERSION, VOICE_MATCH_THRESHOLD, embed_turn, parse_vector
+
+# Circles up to this many people are matched in-process against a cached
+# matrix; larger ones go to the match_circle_voices RPC (HNSW index).
+SPEAKER_MATRIX_MAX = int(os.getenv("SPEAKER_MATRIX_MAX", "64"))
+SPEAKER_CACHE_TTL_S = int(os.getenv("SPEAKER_CACHE_TTL_S", "300"))
+# Circles kept; least recently used ones are evicted first
+SPEAKER_CACHE_SIZE = int(os.getenv("SPEAKER_CACHE_SIZE", "5000"))
+
+# Turn embeddings run on their own small pool, and each turn gets at most
+# SPEAKER_ID_TIMEOUT_S to be labelled; past that it is logged unlabelled.
+# Turns beyond SPEAKER_MAX_PENDING waiting across sessions are not labelled.
+SPEAKER_POOL_SIZE = int(os.getenv("SPEAKER_POOL_SIZE", "2"))
+SPEAKER_ID_TIMEOUT_S = float(os.getenv("SPEAKER_ID_TIMEOUT_S", "1.5"))
+SPEAKER_MAX_PENDING = int(os.getenv("SPEAKER_MAX_PENDING", str(SPEAKER_POOL_SIZE * 4)))
+
+_executor = ThreadPoolExecutor(max_workers=SPEAKER_POOL_SIZE, thread_name_prefix="speaker")
+EXECUTOR_THREADS.labels(pool="speaker").set_function(lambda: len(_executor._threads))
+
+
+class Circle:
+    """Enrolled voices in one ward's circle (the ward plus active guardians)."""
+
+    def __init__(self, ward_id: str, ids: List[str], matrix: Optional[np.ndarray]):
+        self.ward_id = ward_id
+        self.ids = ids          # row order of matrix
+        self.matrix = matrix    # (m, 384) unit rows, or None for remote matching
+        self.loaded_at = time.monotonic()
+
+    @property
+    def has_voices(self) -> bool:
+        return self.matrix is None or len(self.ids) > 0
+
+
+class SpeakerDirectory:
+    """
+    Identifies who is speaking in a live turn among the ward's circle.
+
+    match() takes all segment embeddings of a turn at once: for small circles
+    that is one (n, 384) x (384, m) product against a cached matrix; for
+    large circles one RPC that runs every segment through the HNSW index.
+    Only fingerprints of VOICE_FINGERPRINT_VERSION are matched. Circles are
+    cached for ttl seconds, at most max_entries of them (LRU).
+    """
+
+    def __init__(self, ttl: float = SPEAKER_CACHE_TTL_S, matrix_max: int = SPEAKER_MATRIX_MAX,
+                 threshold: float = VOICE_MATCH_THRESHOLD, max_entries: int = SPEAKER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.matrix_max = matrix_max
+        self.threshold = threshold
+        self._circles: "OrderedDict[str, Circle]" = OrderedDict()
+        self.pending = 0
+        self.skipped = 0
+        self.timeouts = 0
+
+    async def _load(self, ward_id: str) -> Circle:
+        members = [ward_id] + [g for g in await guardian_index.active_guardians(ward_id) if g != ward_id]
+        if len(members) > self.matrix_max:
+            circle = Circle(ward_id, members, None)
+        else:
+            res = await execute(
+                supabase.table("profiles").select("id", "voice_fingerprint")
+                .in_("id", members)
+                .eq("voice_fingerprint_version", VOICE_FINGERPRINT_VERSION)
+                .not_.is_("voice_fingerprint", "null")
+            )
+            ids, rows = [], []
+            for profile in res.data:
+                vector = parse_vector(profile.get("voice_fingerprint"))
+                if vector is not None:
+                    ids.append(profile["id"])
+                    rows.append(vector)
+            matrix = np.stack(rows) if rows else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+            circle = Circle(ward_id, ids, matrix)
+        self._circles[ward_id] = circle
+        self._circles.move_to_end(ward_id)
+        while len(self._circles) > self.max_entries:
+            self._circles.popitem(last=False)
+        return circle
+
+    async def circle(self, ward_id: str) -> Circle:
+        circle = self._circles.get(ward_id)
+        if circle is not None and time.monotonic() - circle.loaded_at < self.ttl:
+            self._circles.move_to_end(ward_id)
+            return circle
+        return await self._load(ward_id)
+
+    def invalidate(self, ward_id: Optional[str] = None):
+        """Drop cached circles, e.g. after an enrollment or guardian change."""
+        if ward_id is None:
+            self._circles.clear()
+        else:
+            self._circles.pop(ward_id, None)
+
+    async def has_voices(self, ward_id: Optional[str]) -> bool:
+        if not ward_id or not supabase:
+            return False
+        return (await self.circle(ward_id)).has_voices
+
+    async def match(self, ward_id: str, embeddings: np.ndarray) -> List[Tuple[Optional[str], float]]:
+        """Best (profile_id, similarity) per embedding row; profile_id is None below threshold."""
+        if not len(embeddings):
+            return []
+        circle = await self.circle(ward_id)
+
+        if circle.matrix is not None:
+            if not len(circle.ids):
+                return [(None, 0.0)] * len(embeddings)
+            similarity = embeddings @ circle.matrix.T
+            best = similarity.argmax(axis=1)
+            scores = similarity[np.arange(len(best)), best]
+            return [
+                (circle.ids[b] if s >= self.threshold else None, float(s))
+                for b, s in zip(best, scores)
+            ]
+
+        res = await execute(supabase.rpc("match_circle_voices", {
+            "ward_id": ward_id,
+            "query_embeddings": np.round(embeddings, 6).tolist(),
+            "fingerprint_version": VOICE_FINGERPRINT_VERSION,
+            "match_threshold": self.threshold,
+        }))
+        matches: List[Tuple[Optional[str], float]] = [(None, 0.0)] * len(embeddings)
+        for row in res.data or []:
+            matches[row["segment"]] = (row["profile_id"], float(row["similarity"]))
+        return matches
+
+    async def identify_turn(self, ward_id: str, embeddings: np.ndarray, weights: np.ndarray) -> Optional[dict]:
+        """
+        Speaker of a turn from its segment embeddings (see voice.embed_turn):
+        the label covering most of the scored speech. Returns
+        {"speaker_label": "user" | "guardian" | "other", "is_primary_user",
+        "speaker_id", "similarity"}, or None if nothing could be scored.
+        """
+        if not len(embeddings):
+            return None
+        matches = await self.match(ward_id, embeddings)
+
+        share: Dict[Optional[str], float] = {}
+        for (profile_id, _), weight in zip(matches, weights):
+            share[profile_id] = share.get(profile_id, 0.0) + float(weight)
+        speaker_id = max(share, key=share.get)
+        if speaker_id is None:
+            label = "other"
+        elif speaker_id == ward_id:
+            label = "user"
+        else:
+            label = "guardian"
+        scores = [s for (p, s) in matches if p == speaker_id]
+        return {
+            "speaker_label": label,
+            "is_primary_user": label == "user",
+            "speaker_id": speaker_id,
+            "similarity": round(sum(scores) / len(scores), 3),
+        }
+
+    async def identify_audio(self, ward_id: str, audio: Optional[np.ndarray]) -> Optional[dict]:
+        """
+        identify_turn for a turn's raw audio (see voice.turn_audio), with the
+        embedding on the speaker pool. None if the turn can't be labelled
+        within SPEAKER_ID_TIMEOUT_S or too many turns are already waiting.
+        """
+        if audio is None:
+            return None
+        if self.pending >= SPEAKER_MAX_PENDING:
+            self.skipped += 1
+            return None
+        self.pending += 1
+        try:
+            return await asyncio.wait_for(self._identify(ward_id, audio), SPEAKER_ID_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
+        finally:
+            self.pending -= 1
+
+    async def _identify(self, ward_id: str, audio: np.ndarray) -> Optional[dict]:
+        loop = asyncio.get_running_loop()
+        matrix, weights = await loop.run_in_executor(_executor, embed_turn, audio)
+        return await self.identify_turn(ward_id, matrix, weights)
+
+
+speaker_directory = SpeakerDirectory()
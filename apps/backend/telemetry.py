@@ -0,0 +1,176 @@
+# telemetry.py
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+# Structured logging off the event loop: loggers under "aegis" hand records
+# to a bounded queue, and a listener thread formats and writes them to
+# stdout (or stderr). Callers never block on the write; when the queue is
+# full, records are dropped and counted.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+LOG_STREAM = os.getenv("LOG_STREAM", "stdout")  # stdout | stderr
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Per-turn traces: every turn of this fraction of sessions is written, and
+# any turn slower than TRACE_SLOW_MS is written regardless
+TRACE_SAMPLE = float(os.getenv("TRACE_SAMPLE", "0.05"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1500"))
+
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def _extras(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in record.__dict__.items() if k not in _RESERVED and not k.startswith("_")}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed via extra= become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extras(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local runs: message, then key=value extras."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = _extras(record)
+        if extras:
+            line += " " + " ".join(f"{k}={v}" for k, v in extras.items())
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+        self._plain = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only the cheap parts run on the caller's thread: merge args, and
+        # render a traceback if there is one. Formatting happens on the listener.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._plain.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+_stream = logging.StreamHandler(sys.stderr if LOG_STREAM == "stderr" else sys.stdout)
+_stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+_handler = _QueueHandler(_queue)
+_listener = logging.handlers.QueueListener(_queue, _stream)
+
+_root = logging.getLogger("aegis")
+_root.setLevel(LOG_LEVEL)
+_root.addHandler(_handler)
+_root.propagate = False
+_listener.start()
+_running = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"aegis.{name}")
+
+
+def dropped_records() -> int:
+    return _handler.dropped
+
+
+def shutdown():
+    """Writes out whatever is queued and stops the listener thread."""
+    global _running
+    if _running:
+        _running = False
+        _listener.stop()
+
+
+atexit.register(shutdown)
+
+_trace_log = get_logger("trace")
+
+
+def sample_session() -> bool:
+    return random.random() < TRACE_SAMPLE
+
+
+class TurnTrace:
+    """
+    Timeline of one turn of a session, keyed by thread_id and turn number:
+    named spans as (offset, duration) from the turn's start. Written as a
+    single "trace" record when finished, if the session is sampled or the
+    turn was slow.
+    """
+
+    __slots__ = ("thread_id", "turn", "kind", "sampled", "start", "spans")
+
+    def __init__(self, thread_id: str, turn: int, kind: str = "turn", sampled: bool = False,
+                 start: Optional[float] = None):
+        self.thread_id = thread_id
+        self.turn = turn
+        self.kind = kind
+        self.sampled = sampled
+        self.start = time.perf_counter() if start is None else start
+        self.spans = []
+
+    def add(self, name: str, start: float, end: float):
+        """Records a span measured elsewhere (perf_counter timestamps)."""
+        self.spans.append((name, start, end))
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start, time.perf_counter()))
+
+    def finish(self, **fields):
+        total_ms = (time.perf_counter() - self.start) * 1000
+        slow = total_ms >= TRACE_SLOW_MS
+        if not (self.sampled or slow):
+            return
+        _trace_log.info(self.kind, extra={
+            "thread_id": self.thread_id,
+            "turn": self.turn,
+            "total_ms": round(total_ms, 2),
+            "slow": slow,
+            "spans": [
+                {"name": name, "at_ms": round((start - self.start) * 1000, 2), "ms": round((end - start) * 1000, 2)}
+                for name, start, end in self.spans
+            ],
+            **fields,
+        })
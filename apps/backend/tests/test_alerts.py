@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import alerts
+from alerts import AlertDispatcher
+
+
+class FakeDB:
+    """Stands in for supabase.table("notifications").insert(rows) plus db.execute."""
+
+    def __init__(self):
+        self.inserts = []
+        self.fail = False
+        self.fail_scores = set()    # fail only the alerts with these scores
+
+    def table(self, name):
+        return self
+
+    def insert(self, rows):
+        return rows
+
+    async def execute(self, rows):
+        if self.fail or any(f"Risk Score: {score}." in row["message"] for row in rows for score in self.fail_scores):
+            raise ConnectionError("upstream unavailable")
+        self.inserts.append(rows)
+
+
+class FakeGuardians:
+    async def active_guardians(self, ward_id):
+        return ["guardian-1", "guardian-2"]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(alerts, "supabase", fake)
+    monkeypatch.setattr(alerts, "execute", fake.execute)
+    monkeypatch.setattr(alerts, "guardian_index", FakeGuardians())
+    return fake
+
+
+def _dispatch_all(dispatcher, alerts_in):
+    """dispatch() each (score, level) on one loop; returns which were queued."""
+    async def run():
+        queued = []
+        for score, level in alerts_in:
+            queued.append(dispatcher.dispatch("thread", "ward", score, level, "reason"))
+            await dispatcher.close()
+        return queued
+
+    return asyncio.run(run())
+
+
+def test_only_escalations_alert_within_the_cooldown(db):
+    queued = _dispatch_all(AlertDispatcher(cooldown=900), [
+        (80, "high"), (82, "high"), (95, "critical"), (96, "critical"), (80, "high"),
+    ])
+    assert queued == [True, False, True, False, False]
+    assert len(db.inserts) == 2
+
+
+def test_repeat_alerts_after_the_cooldown(db):
+    queued = _dispatch_all(AlertDispatcher(cooldown=0), [(80, "high"), (80, "high")])
+    assert queued == [True, True]
+
+
+def test_scores_below_the_threshold_never_alert(db):
+    assert _dispatch_all(AlertDispatcher(), [(alerts.ALERT_SCORE_THRESHOLD - 1, "high")]) == [False]
+    assert db.inserts == []
+
+
+def test_one_insert_covers_guardians_and_ward(db):
+    _dispatch_all(AlertDispatcher(), [(90, "critical")])
+    assert [row["user_id"] for row in db.inserts[0]] == ["guardian-1", "guardian-2", "ward"]
+
+
+def test_failed_send_is_rolled_back(db):
+    dispatcher = AlertDispatcher(cooldown=900)
+    db.fail = True
+    assert _dispatch_all(dispatcher, [(80, "high")]) == [True]
+    # Not recorded as sent, so the next assessment retries
+    db.fail = False
+    assert _dispatch_all(dispatcher, [(80, "high")]) == [True]
+    # A failed escalation falls back to the last alert that did go out
+    db.fail = True
+    assert _dispatch_all(dispatcher, [(95, "critical")]) == [True]
+    db.fail = False
+    assert _dispatch_all(dispatcher, [(82, "high"), (95, "critical")]) == [False, True]
+
+
+def test_failed_send_keeps_a_newer_alert(db):
+    dispatcher = AlertDispatcher(cooldown=900)
+    db.fail_scores = {80}
+
+    async def run():
+        # The critical alert is queued while the high one is still in flight
+        dispatcher.dispatch("thread", "ward", 80, "high", "reason")
+        dispatcher.dispatch("thread", "ward", 95, "critical", "reason")
+        await dispatcher.close()
+
+    asyncio.run(run())
+    assert len(db.inserts) == 1
+    assert _dispatch_all(dispatcher, [(96, "critical")]) == [False]
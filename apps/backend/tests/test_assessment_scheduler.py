@@ -0,0 +1,113 @@
+import asyncio
+
+from assessment_scheduler import AssessmentScheduler
+
+
+class Recorder:
+    """assess/publish callbacks that count calls; assess takes `duration`."""
+
+    def __init__(self, duration: float = 0.0, results=None):
+        self.duration = duration
+        self.results = list(results or [])
+        self.calls = 0
+        self.published = []
+
+    async def assess(self):
+        self.calls += 1
+        await asyncio.sleep(self.duration)
+        if self.results:
+            result = self.results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return {"call": self.calls}
+
+    async def publish(self, result):
+        self.published.append(result)
+
+
+def _scheduler(recorder, **kwargs) -> AssessmentScheduler:
+    options = dict(debounce=0.05, max_latency=1.0)
+    options.update(kwargs)
+    return AssessmentScheduler(recorder.assess, recorder.publish, **options)
+
+
+def test_burst_is_debounced_into_one_call():
+    recorder = Recorder()
+
+    async def run():
+        scheduler = _scheduler(recorder)
+        for _ in range(10):
+            scheduler.notify()
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.15)
+        await scheduler.close()
+
+    asyncio.run(run())
+    assert recorder.calls == 1
+    assert recorder.published == [{"call": 1}]
+
+
+def test_steady_turns_are_assessed_within_max_latency():
+    recorder = Recorder()
+
+    async def run():
+        scheduler = _scheduler(recorder, debounce=0.05, max_latency=0.15)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        # A turn every 20 ms never leaves a 50 ms gap
+        while loop.time() - start < 0.4:
+            scheduler.notify()
+            await asyncio.sleep(0.02)
+        await scheduler.close()
+
+    asyncio.run(run())
+    assert recorder.calls >= 2
+
+
+def test_turns_during_a_call_coalesce_into_the_next_one():
+    recorder = Recorder(duration=0.1)
+
+    async def run():
+        scheduler = _scheduler(recorder)
+        scheduler.notify()
+        await asyncio.sleep(0.08)      # first call is now in flight
+        for _ in range(5):
+            scheduler.notify()
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.4)
+        await scheduler.close()
+
+    asyncio.run(run())
+    assert recorder.calls == 2
+    assert recorder.published == [{"call": 1}, {"call": 2}]
+
+
+def test_errors_and_empty_results_are_not_published():
+    recorder = Recorder(results=[RuntimeError("engine down"), None, {"ok": True}])
+
+    async def run():
+        scheduler = _scheduler(recorder)
+        for _ in range(3):
+            scheduler.notify()
+            await asyncio.sleep(0.1)
+        await scheduler.close()
+
+    asyncio.run(run())
+    assert recorder.calls == 3
+    assert recorder.published == [{"ok": True}]
+
+
+def test_nothing_is_published_after_close():
+    recorder = Recorder(duration=0.1)
+
+    async def run():
+        scheduler = _scheduler(recorder)
+        scheduler.notify()
+        await asyncio.sleep(0.08)
+        await scheduler.close()
+        scheduler.notify()
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+    assert recorder.published == []
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from audio_preprocess import TARGET_RATE, AudioPreprocessor
+
+FRAME_BYTES = TARGET_RATE * 50 // 1000 * 2   # one 50 ms frame of 16 kHz s16
+
+
+def _pcm(seconds: float, amplitude: float, rate: int = TARGET_RATE, channels: int = 1) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    tone = amplitude * 32767 * np.sin(2 * np.pi * 220 * t)
+    return np.repeat(tone[:, None], channels, axis=1).astype("<i2").tobytes()
+
+
+def _silence(seconds: float) -> bytes:
+    return bytes(int(seconds * TARGET_RATE) * 2)
+
+
+def test_speech_goes_out_in_fixed_frames_whatever_the_chunking():
+    pre = AudioPreprocessor()
+    audio = _pcm(1.0, 0.3)
+    out = []
+    for i in range(0, len(audio), 999):   # odd chunk size splits samples
+        out += pre.process(audio[i:i + 999])
+    assert all(len(frame) == FRAME_BYTES for frame in out)
+    assert b"".join(out) == audio
+
+
+def test_silence_is_gated_with_keepalives():
+    pre = AudioPreprocessor(keepalive_ms=1000)
+    out = pre.process(_silence(5.0))
+    # 100 silent frames: only one keepalive per second goes out
+    assert pre.frames_in == 100 and len(out) == 5
+    assert all(frame == bytes(FRAME_BYTES) for frame in out)
+
+
+def test_speech_keeps_preroll_and_hangover():
+    pre = AudioPreprocessor(preroll_ms=200, hangover_ms=500, keepalive_ms=60000)
+    pre.process(_silence(1.0))
+    out = pre.process(_pcm(0.5, 0.3)) + pre.process(_silence(2.0))
+    # 4 preroll frames, 10 speech frames, 10 hangover frames
+    assert len(out) == 4 + 10 + 10
+
+
+def test_quiet_noise_below_the_threshold_is_gated():
+    pre = AudioPreprocessor(keepalive_ms=60000)
+    assert pre.process(_pcm(2.0, 0.001)) == []
+
+
+def test_stereo_44k1_is_downmixed_and_resampled():
+    pre = AudioPreprocessor(enabled=False)
+    pre.set_format(44100, channels=2)
+    out = pre.process(_pcm(1.0, 0.3, rate=44100, channels=2))
+    assert sum(len(frame) for frame in out) == TARGET_RATE * 2
+
+
+@pytest.mark.parametrize("sample_rate, channels", [
+    (0, 1), (-16000, 1), (7999, 1), (192001, 1), ("16000", 1), (True, 1), (None, 1),
+    (16000, 0), (16000, 9), (16000, 1.5), (16000, True),
+])
+def test_set_format_rejects_bad_formats(sample_rate, channels):
+    pre = AudioPreprocessor()
+    with pytest.raises(ValueError):
+        pre.set_format(sample_rate, channels)
+    # The current format is kept
+    assert (pre.in_rate, pre.channels) == (TARGET_RATE, 1)
@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+from postgrest.exceptions import APIError
+
+import log_sink
+from log_sink import LogSink
+
+
+class FakeDB:
+    """Stands in for supabase.table(...).insert(rows) plus db.execute."""
+
+    def __init__(self):
+        self.inserts = []         # every successful insert, as a list of rows
+        self.transient_failures = 0
+
+    def table(self, name):
+        return self
+
+    def insert(self, rows):
+        return list(rows)
+
+    async def execute(self, rows):
+        if self.transient_failures:
+            self.transient_failures -= 1
+            raise ConnectionError("upstream unavailable")
+        if any(r.get("thread_id") == "mock-thread-id" for r in rows):
+            raise APIError({"code": "22P02", "message": "invalid input syntax for type uuid"})
+        self.inserts.append(rows)
+
+    @property
+    def written(self):
+        return [r["content"] for rows in self.inserts for r in rows]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(log_sink, "supabase", fake)
+    monkeypatch.setattr(log_sink, "execute", fake.execute)
+    return fake
+
+
+def _row(i, thread_id="5b0f7c1e-3a7d-4c52-9a51-0d1f6f7e2b10"):
+    return {"thread_id": thread_id, "content": f"turn {i}"}
+
+
+def _sink(**kwargs):
+    options = dict(batch_size=10, flush_interval=60, max_attempts=3)
+    options.update(kwargs)
+    return LogSink("logs", **options)
+
+
+def test_rows_are_written_in_batches(db):
+    async def run():
+        sink = _sink(batch_size=4)
+        for i in range(10):
+            await sink.put(_row(i))
+        await sink.flush()
+        await sink.close()
+
+    asyncio.run(run())
+    assert [len(rows) for rows in db.inserts] == [4, 4, 2]
+    assert db.written == [f"turn {i}" for i in range(10)]
+
+
+def test_created_at_is_strictly_increasing_and_kept_if_set(db):
+    rows = [_row(i) for i in range(50)] + [{**_row(50), "created_at": "2020-01-01T00:00:00+00:00"}]
+
+    async def run():
+        sink = _sink()
+        for row in rows:
+            await sink.put(row)
+        await sink.close()
+
+    asyncio.run(run())
+    stamps = [r["created_at"] for r in rows[:50]]
+    assert stamps == sorted(stamps) and len(set(stamps)) == 50
+    assert rows[50]["created_at"] == "2020-01-01T00:00:00+00:00"
+
+
+def test_rows_get_the_id_they_are_stored_under(db):
+    row = _row(0)
+
+    async def run():
+        sink = _sink()
+        await sink.put(row)
+        await sink.close()
+
+    asyncio.run(run())
+    # The caller publishes the same dict to live watchers
+    assert row["id"] and db.inserts[0][0]["id"] == row["id"]
+
+
+def test_transient_errors_are_retried(db, monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    db.transient_failures = 2
+
+    async def run():
+        sink = _sink()
+        for i in range(3):
+            await sink.put(_row(i))
+        await sink.close()
+
+    asyncio.run(run())
+    assert db.written == ["turn 0", "turn 1", "turn 2"]
+
+
+def test_failed_batch_goes_back_to_the_buffer_in_order(db, monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+
+    async def run():
+        sink = _sink(max_attempts=2)
+        for i in range(3):
+            await sink.put(_row(i))
+        db.transient_failures = 2
+        await sink.flush()
+        assert db.inserts == []
+        await sink.put(_row(3))
+        await sink.close()
+
+    asyncio.run(run())
+    assert db.written == ["turn 0", "turn 1", "turn 2", "turn 3"]
+
+
+def test_trim_drops_the_oldest_rows(db):
+    async def run():
+        sink = _sink(max_buffered=5, put_timeout=0.01, batch_size=100)
+        for i in range(8):
+            await sink.put(_row(i))
+        assert sink.dropped == 3
+        await sink.close()
+
+    asyncio.run(run())
+    assert db.written == [f"turn {i}" for i in range(3, 8)]
+
+
+def test_bad_row_is_dropped_without_blocking_the_rest(db):
+    async def run():
+        sink = _sink(batch_size=8)
+        for i in range(8):
+            await sink.put(_row(i, thread_id="mock-thread-id") if i == 5 else _row(i))
+        await sink.flush()
+        # A later batch still goes through
+        for i in range(8, 12):
+            await sink.put(_row(i))
+        await sink.close()
+        return sink
+
+    sink = asyncio.run(run())
+    assert sink.rejected == 1
+    assert db.written == [f"turn {i}" for i in range(12) if i != 5]
+
+
+_real_sleep = asyncio.sleep
+
+
+async def _no_sleep(delay, *args):
+    await _real_sleep(0)
@@ -0,0 +1,94 @@
+import base64
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from auth_utils import get_current_user
+from pagination import decode_cursor, encode_cursor
+
+ROW_ID = "5b0f7c1e-3a7d-4c52-9a51-0d1f6f7e2b10"
+CREATED_AT = "2026-10-18T05:24:28.161519+00:00"
+
+
+def _raw_cursor(positions) -> str:
+    return base64.urlsafe_b64encode(json.dumps(positions).encode()).decode().rstrip("=")
+
+
+def test_round_trip():
+    positions = {"logs": [CREATED_AT, ROW_ID], "risk_scores": None}
+    assert decode_cursor(encode_cursor(positions)) == positions
+
+
+@pytest.mark.parametrize("created_at", [
+    "2026-10-18T05:24:28+00:00",
+    "2026-10-18 05:24:28.16+00",
+    "2026-10-18T05:24:28.161519Z",
+])
+def test_accepts_postgres_timestamps(created_at):
+    assert decode_cursor(_raw_cursor({"logs": [created_at, ROW_ID]}))["logs"] == [created_at, ROW_ID]
+
+
+@pytest.mark.parametrize("position", [
+    # Filter injection through either half of the position
+    [f'{CREATED_AT}",user_id.neq."x', ROW_ID],
+    [CREATED_AT, f"{ROW_ID}),or(id.gt.0"],
+    # Wrong shapes and types
+    [CREATED_AT],
+    [CREATED_AT, ROW_ID, "extra"],
+    "2026-10-18",
+    {"created_at": CREATED_AT, "id": ROW_ID},
+    [1700000000, ROW_ID],
+    [CREATED_AT, 42],
+    ["yesterday", ROW_ID],
+    [CREATED_AT, "not-a-uuid"],
+])
+def test_rejects_bad_positions(position):
+    with pytest.raises(ValueError):
+        decode_cursor(_raw_cursor({"logs": position}))
+
+
+@pytest.mark.parametrize("cursor", ["!!!", _raw_cursor([1, 2]), _raw_cursor({"threads": ["x", "y"]})])
+def test_endpoints_return_400_for_bad_cursors(monkeypatch, cursor):
+    monkeypatch.setattr(main, "supabase", object())
+    main.app.dependency_overrides[get_current_user] = lambda: None
+    try:
+        client = TestClient(main.app)
+        assert client.get("/api/history", params={"cursor": cursor}).status_code == 400
+        assert client.get(f"/api/threads/{ROW_ID}", params={"cursor": cursor}).status_code == 400
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+def _history(monkeypatch, db, **params):
+    from types import SimpleNamespace
+    monkeypatch.setattr(main, "supabase", db)
+    main.app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id="ward", email=None)
+    try:
+        return TestClient(main.app).get("/api/history", params=params)
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+def _threads_db(n):
+    from bench.fakes import FakeSupabase
+    db = FakeSupabase()
+    db.tables["threads"] = [
+        {"id": f"00000000-0000-4000-8000-{i:012d}", "user_id": "ward", "created_at": f"2026-01-01T00:00:{i:02d}+00:00"}
+        for i in range(n)
+    ]
+    return db
+
+
+def test_history_without_cursor_or_limit_is_unpaged(monkeypatch):
+    res = _history(monkeypatch, _threads_db(60))
+    assert res.status_code == 200
+    assert len(res.json()) == 60
+    assert "X-Next-Cursor" not in res.headers
+
+
+def test_history_with_limit_pages(monkeypatch):
+    res = _history(monkeypatch, _threads_db(60), limit=25)
+    assert len(res.json()) == 25
+    assert decode_cursor(res.headers["X-Next-Cursor"])["threads"]
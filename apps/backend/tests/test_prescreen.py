@@ -0,0 +1,43 @@
+import pytest
+
+from risk_analysis import prescreen
+
+
+@pytest.mark.parametrize("text", [
+    "I'll kill you if you tell anyone",
+    "I'm going to hurt you",
+    "I’m gonna stab you",
+    "i will kill you",
+    "you're not leaving, I have a knife",
+    "I'm not letting you leave this room",
+    "I locked you in, nobody is coming",
+])
+def test_targeted_threats_are_critical(text):
+    assert prescreen(text)["level"] == "critical"
+
+
+@pytest.mark.parametrize("text", [
+    "don't forget to lock the door",
+    "I locked the door on my way out",
+    "I'd never hurt you",
+    "my mom is going to kill me if I'm late",
+    "this workout is going to kill you",
+    "can someone help me carry the groceries",
+    "somebody help me find my keys",
+    "I'll shoot you a text when I land",
+    "you're not leaving without your coat",
+])
+def test_benign_near_misses_are_not_critical(text):
+    result = prescreen(text)
+    assert result["level"] in ("low", "medium")
+    assert result["score"] < 85
+
+
+def test_benign_text_has_no_signals():
+    result = prescreen("ok I'm heading to the bus stop now")
+    assert result["benign"] and result["level"] == "low"
+
+
+def test_phrases_match_whole_words_only():
+    # "skill you" contains "kill you" but isn't a threat
+    assert "kill you" not in prescreen("that's a skill you learn")["signals"]
@@ -0,0 +1,25 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from risk_cache import RiskCache
+
+
+def _lookups(result: str) -> float:
+    return REGISTRY.get_sample_value("aegis_risk_cache_lookups_total", {"result": result}) or 0.0
+
+
+def test_lookups_are_exported(tmp_path):
+    path = str(tmp_path / "risk_cache.db")
+    before = {result: _lookups(result) for result in ("hit", "disk_hit", "miss")}
+
+    async def run():
+        cache = RiskCache(path=path)
+        assert await cache.get("window") is None
+        await cache.put("window", {"level": "low", "score": 10.0, "reason": ""})
+        assert await cache.get("window") is not None
+        # A fresh instance has an empty memory tier, so this one comes from disk
+        assert await RiskCache(path=path).get("window") is not None
+
+    asyncio.run(run())
+    assert {result: _lookups(result) - before[result] for result in before} == {"hit": 1, "disk_hit": 1, "miss": 1}
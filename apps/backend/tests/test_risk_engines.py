@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import risk_analysis
+from risk_engines import CircuitBreaker, ResilientEngine
+
+KNIFE = "you're not leaving, I have a knife"
+
+
+class HangingEngine:
+    """Never answers, like an upstream in a brownout."""
+    name = "hanging"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def assess(self, transcript, location=None):
+        self.calls += 1
+        await asyncio.Event().wait()
+
+
+def _resilient(inner, **kwargs):
+    options = dict(call_timeout=0.2, max_attempts=3, backoff=0.01, hedge=False, breaker=CircuitBreaker(100, 30))
+    options.update(kwargs)
+    return ResilientEngine(inner, **options)
+
+
+def test_retries_exhausted_fall_back_to_local_scorer():
+    inner = HangingEngine()
+    result = asyncio.run(_resilient(inner).assess(KNIFE))
+    assert inner.calls == 3
+    assert result["degraded"] is True
+    assert result["level"] == "critical"
+    assert result["score"] >= 85
+
+
+def test_deadline_cuts_retries_short_and_falls_back():
+    engine = _resilient(HangingEngine(), call_timeout=10, deadline=0.3)
+    started = time.monotonic()
+    result = asyncio.run(engine.assess(KNIFE))
+    assert time.monotonic() - started < 2
+    assert result["degraded"] is True
+    assert result["score"] >= 85
+
+
+def test_assess_danger_outlasts_engine_deadline(monkeypatch):
+    # The outer timeout must not fire before the engine's own fallback
+    monkeypatch.setattr(risk_analysis, "ASSESS_TIMEOUT_S", 0.1)
+    engine = _resilient(HangingEngine(), call_timeout=10, deadline=0.3)
+    monkeypatch.setattr(risk_analysis, "_engine", engine)
+    result = asyncio.run(risk_analysis.assess_danger(KNIFE))
+    assert result["degraded"] is True
+    assert result["level"] == "critical"
+    assert engine.fallbacks == 1
+
+
+def test_assess_danger_scores_locally_when_engine_times_out(monkeypatch):
+    monkeypatch.setattr(risk_analysis, "ASSESS_TIMEOUT_S", 0.1)
+    monkeypatch.setattr(risk_analysis, "_engine", HangingEngine())
+    result = asyncio.run(risk_analysis.assess_danger(KNIFE + " right now"))
+    assert result["degraded"] is True
+    assert result["score"] >= 85
@@ -0,0 +1,54 @@
+import asyncio
+
+from session_store import InMemorySessionStore
+
+
+def _record(store, thread_id: str, n: int):
+    async def run():
+        return [await store.record_event(thread_id, {"type": "risk", "i": i}) for i in range(n)]
+
+    return asyncio.run(run())
+
+
+def test_events_are_numbered_and_replayed_after_last_seq():
+    store = InMemorySessionStore()
+    assert _record(store, "thread", 5) == [1, 2, 3, 4, 5]
+
+    replay = asyncio.run(store.events_since("thread", 3))
+    assert [(e["seq"], e["i"]) for e in replay] == [(4, 3), (5, 4)]
+    assert asyncio.run(store.events_since("thread", 5)) == []
+    assert asyncio.run(store.load("thread"))["seq"] == 5
+
+
+def test_replay_keeps_only_the_newest_events():
+    store = InMemorySessionStore(max_events=3)
+    _record(store, "thread", 10)
+    assert [e["seq"] for e in asyncio.run(store.events_since("thread", 0))] == [8, 9, 10]
+
+
+def test_threads_have_separate_sequences():
+    store = InMemorySessionStore()
+    _record(store, "a", 3)
+    assert _record(store, "b", 1) == [1]
+    assert asyncio.run(store.events_since("unknown", 0)) == []
+
+
+def test_turns_are_capped_but_counted():
+    store = InMemorySessionStore(max_turns=3)
+
+    async def run():
+        await store.append_turn("thread", "t1", "t2")
+        await store.append_turn("thread", "t3", "t4", "t5")
+        await store.update("thread", lat=1.5, lon=2.5)
+        return await store.load("thread")
+
+    state = asyncio.run(run())
+    assert state["turns"] == ["t3", "t4", "t5"] and state["turn_count"] == 5
+    assert (state["lat"], state["lon"]) == (1.5, 2.5)
+
+
+def test_expired_sessions_are_gone():
+    store = InMemorySessionStore(ttl=-1)
+    _record(store, "thread", 2)
+    assert asyncio.run(store.load("thread")) is None
+    assert asyncio.run(store.events_since("thread", 0)) == []
@@ -0,0 +1,63 @@
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import auth_utils
+import guardian_index
+import main
+from auth_utils import AuthUser
+from bench.fakes import FakeSupabase
+
+SECRET = "test-jwt-secret-at-least-32-bytes-long"
+THREAD_ID = "3f1f8c0e-9d4e-4c43-8d6f-7b0a9a7a0e11"
+
+
+def _token(user_id: str) -> str:
+    claims = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 600}
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = FakeSupabase()
+    db.tables["threads"] = [{"id": THREAD_ID, "user_id": "ward", "initial_context": ""}]
+    db.tables["guardians"] = [
+        {"id": "relationship", "user_id": "ward", "guardian_id": "guardian", "status": "active"},
+        {"user_id": "ward", "guardian_id": "invited", "status": "pending"},
+    ]
+    monkeypatch.setattr(auth_utils, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(main, "supabase", db)
+    monkeypatch.setattr(guardian_index, "supabase", db)
+    monkeypatch.setattr(guardian_index, "guardian_index", guardian_index.GuardianIndex())
+    monkeypatch.setattr(main, "guardian_index", guardian_index.guardian_index)
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("path", [f"/ws/{THREAD_ID}?last_seq=0", f"/ws/watch/{THREAD_ID}"])
+@pytest.mark.parametrize("token", [None, "not-a-jwt", "stranger", "invited"])
+def test_unauthorised_sockets_are_closed_before_anything_is_sent(client, path, token):
+    if token in ("stranger", "invited"):
+        token = _token(token)
+    url = path + (("&" if "?" in path else "?") + f"token={token}" if token else "")
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(url) as ws:
+            ws.receive_json()
+    assert closed.value.code == 1008
+
+
+@pytest.mark.parametrize("user_id", ["ward", "guardian"])
+def test_owner_and_guardian_may_watch(client, user_id):
+    with client.websocket_connect(f"/ws/watch/{THREAD_ID}?token={_token(user_id)}"):
+        pass
+
+
+def test_revoked_guardian_is_disconnected(client):
+    with client.websocket_connect(f"/ws/watch/{THREAD_ID}?token={_token('guardian')}") as ws:
+        # On the socket's event loop; TestClient runs each HTTP request on its own
+        ws.portal.call(main.delete_guardian, "relationship", AuthUser("ward", "ward@example.com"))
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1008
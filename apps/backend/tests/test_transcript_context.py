@@ -0,0 +1,57 @@
+from transcript_context import TranscriptWindow, estimate_tokens, format_turn
+
+
+def _window(n: int, **kwargs) -> TranscriptWindow:
+    window = TranscriptWindow(**kwargs)
+    for i in range(n):
+        window.append(f"turn {i}")
+    return window
+
+
+def test_recent_turns_are_kept_verbatim():
+    window = _window(3, recent_turns=5)
+    assert window.build("walking home") == "Initial Context: walking home\n\nTranscript:\nturn 0\nturn 1\nturn 2"
+
+
+def test_older_turns_are_condensed_into_a_summary():
+    window = _window(10, recent_turns=4, summary_lines=3)
+    text = window.build()
+    assert len(window) == 10 and list(window) == ["turn 6", "turn 7", "turn 8", "turn 9"]
+    assert "Earlier in session (6 turns condensed):\n- turn 3\n- turn 4\n- turn 5\n" in text
+    assert "- turn 2" not in text
+
+
+def test_long_sessions_stay_within_the_token_budget():
+    window = TranscriptWindow(recent_turns=12, token_budget=300)
+    for i in range(2000):
+        window.append(f"turn {i}: " + "words " * 30)
+    text = window.build("context")
+    assert estimate_tokens(text) <= 300 + 10
+    assert text.endswith("turn 1999: " + ("words " * 30))
+
+
+def test_an_oversized_latest_turn_is_truncated_not_dropped():
+    window = TranscriptWindow(token_budget=50)
+    window.append("x" * 10000 + " the end")
+    text = window.build()
+    assert text.endswith(" the end") and estimate_tokens(text) <= 60
+
+
+def test_summary_snippets_are_capped():
+    window = _window(0, recent_turns=1, summary_line_chars=20)
+    window.append("a" * 100)
+    window.append("next")
+    assert "- " + "a" * 17 + "...\n" in window.build()
+
+
+def test_restore_counts_turns_that_were_not_stored():
+    window = TranscriptWindow(recent_turns=5)
+    window.restore(["turn 8", "turn 9"], total=10)
+    assert len(window) == 10
+    assert window.tail(1) == ["turn 9"]
+    assert "Earlier in session (8 turns condensed)" in window.build()
+
+
+def test_format_turn_tags_labelled_speakers():
+    assert format_turn("hi", "guardian") == "[Guardian] hi"
+    assert format_turn("hi", None) == "hi"
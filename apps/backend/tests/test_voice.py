@@ -0,0 +1,90 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import speaker_id
+from bench.fakes import FakeSupabase
+from speaker_id import SpeakerDirectory
+from voice import SAMPLE_RATE, VOICE_FINGERPRINT_VERSION, VOICE_MATCH_THRESHOLD, embed
+
+# (f0 Hz, [(formant Hz, bandwidth Hz), ...]): a low and a high voice
+LOW_VOICE = (115, [(700, 90), (1220, 110), (2600, 160)])
+HIGH_VOICE = (215, [(400, 70), (2300, 140), (3000, 200)])
+
+
+def _clip(f0, formants, seed, seconds=3.0) -> np.ndarray:
+    """Synthetic speech: a harmonic source with a wandering pitch, shaped by
+    formant resonances and gated into syllables. seed varies the intonation,
+    rhythm and noise, not the voice."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    pitch = f0 * (1 + 0.08 * np.sin(2 * np.pi * rng.uniform(0.5, 2.0) * t + rng.uniform(0, 6)))
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    source = sum(np.sin(h * phase) / h for h in range(1, 40))
+    freqs = np.fft.rfftfreq(n, 1 / SAMPLE_RATE)
+    envelope = sum(1.0 / (1 + ((freqs - fc) / bw) ** 2) for fc, bw in formants)
+    voiced = np.fft.irfft(np.fft.rfft(source) * envelope, n)
+    syllables = np.sin(2 * np.pi * rng.uniform(3, 5) * t + rng.uniform(0, 6)) > -0.3
+    clip = voiced * syllables + rng.normal(0, 0.002, n)
+    return (0.3 * clip / np.abs(clip).max()).astype(np.float32)
+
+
+def _similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+@pytest.mark.parametrize("voice", [LOW_VOICE, HIGH_VOICE])
+def test_same_speaker_clears_threshold(voice):
+    enrolled = embed(_clip(*voice, seed=0))
+    for seed in (1, 2, 3):
+        assert _similarity(enrolled, embed(_clip(*voice, seed=seed))) >= VOICE_MATCH_THRESHOLD
+
+
+def test_different_speaker_stays_below_threshold():
+    for seed in (0, 1, 2):
+        low = embed(_clip(*LOW_VOICE, seed=seed))
+        high = embed(_clip(*HIGH_VOICE, seed=seed + 10))
+        assert _similarity(low, high) < VOICE_MATCH_THRESHOLD
+
+
+def _directory(monkeypatch, profiles, **kwargs) -> SpeakerDirectory:
+    db = FakeSupabase()
+    db.tables["profiles"] = profiles
+    db.tables["guardians"] = [{"user_id": "ward", "guardian_id": "guardian", "status": "active"}]
+    monkeypatch.setattr(speaker_id, "supabase", db)
+
+    async def active_guardians(ward_id):
+        return ["guardian"] if ward_id == "ward" else []
+
+    monkeypatch.setattr(speaker_id.guardian_index, "active_guardians", active_guardians)
+    return SpeakerDirectory(**kwargs)
+
+
+def test_matches_current_version_only(monkeypatch):
+    ward = embed(_clip(*LOW_VOICE, seed=0))
+    guardian = embed(_clip(*HIGH_VOICE, seed=0))
+    directory = _directory(monkeypatch, [
+        {"id": "ward", "voice_fingerprint": ward.tolist(), "voice_fingerprint_version": VOICE_FINGERPRINT_VERSION},
+        # Legacy fingerprint from before versioning: never matched
+        {"id": "guardian", "voice_fingerprint": guardian.tolist(), "voice_fingerprint_version": None},
+    ])
+    turns = np.stack([embed(_clip(*LOW_VOICE, seed=5)), embed(_clip(*HIGH_VOICE, seed=5))])
+
+    matches = asyncio.run(directory.match("ward", turns))
+
+    assert [profile_id for profile_id, _ in matches] == ["ward", None]
+
+
+def test_circle_cache_is_bounded(monkeypatch):
+    directory = _directory(monkeypatch, [], max_entries=2)
+
+    async def load():
+        for ward_id in ("a", "b", "a", "c"):
+            await directory.circle(ward_id)
+
+    asyncio.run(load())
+
+    # "a" was used after "b", so "b" is the one evicted
+    assert list(directory._circles) == ["a", "c"]
@@ -0,0 +1,119 @@
+# transcript_context.py
+import os
+from collections import deque
+from typing import Iterator, Optional
+
+# Rough chars-per-token ratio for English speech transcripts. Good enough for
+# budgeting; we never need an exact count.
+CHARS_PER_TOKEN = 4
+
+# Bounded assessment context: last N turns verbatim plus a rolling summary,
+# capped at a token budget so prompt size stays flat over long sessions.
+ASSESS_RECENT_TURNS = int(os.getenv("ASSESS_RECENT_TURNS", "12"))
+ASSESS_CONTEXT_TOKENS = int(os.getenv("ASSESS_CONTEXT_TOKENS", "1500"))
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_turn(content: str, speaker_label: Optional[str] = None) -> str:
+    """A transcript line as the risk engine sees it, e.g. "[Guardian] hi" (untagged if unlabelled)."""
+    return f"[{speaker_label.title()}] {content}" if speaker_label else content
+
+
+class TranscriptWindow:
+    """
+    Bounded conversation context for risk assessment.
+
+    Recent turns are kept verbatim in a ring buffer. Turns that fall out of
+    the buffer are condensed into a rolling summary (short snippets of the
+    older turns, themselves capped), so the prompt stays within a fixed token
+    budget no matter how long the session runs.
+    """
+
+    def __init__(
+        self,
+        recent_turns: int = 12,
+        token_budget: int = 1500,
+        summary_lines: int = 8,
+        summary_line_chars: int = 120,
+    ):
+        self.token_budget = token_budget
+        self.summary_line_chars = summary_line_chars
+        self._recent = deque(maxlen=recent_turns)
+        self._summary = deque(maxlen=summary_lines)
+        self._total = 0
+        self._summarized = 0
+
+    def __len__(self) -> int:
+        """Total number of turns seen in this session."""
+        return self._total
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._recent)
+
+    def tail(self, n: int) -> list:
+        """The last n turns still held verbatim (fewer if they were condensed)."""
+        if n <= 0:
+            return []
+        return list(self._recent)[-n:]
+
+    def append(self, turn: str):
+        if len(self._recent) == self._recent.maxlen:
+            self._summarize(self._recent[0])
+        self._recent.append(turn)
+        self._total += 1
+
+    def restore(self, turns: list, total: int):
+        """Rebuild from stored turns (oldest first) when a session resumes."""
+        for turn in turns:
+            self.append(turn)
+        hidden = max(total - len(turns), 0)
+        self._total = max(total, len(turns))
+        self._summarized += hidden
+
+    def _summarize(self, turn: str):
+        self._summarized += 1
+        snippet = turn if len(turn) <= self.summary_line_chars else turn[: self.summary_line_chars - 3] + "..."
+        self._summary.append(snippet)
+
+    def build(self, initial_context: str = "") -> str:
+        """Render the context string passed to assess_danger, within token_budget."""
+        header = f"Initial Context: {initial_context}\n\n"
+        budget = self.token_budget - estimate_tokens(header)
+
+        # Most recent turns first: they matter most for escalation
+        recent = []
+        for turn in reversed(self._recent):
+            cost = estimate_tokens(turn)
+            if cost > budget:
+                if not recent:
+                    # Always keep the latest turn, truncated to fit
+                    recent.append(turn[-max(budget, 1) * CHARS_PER_TOKEN:])
+                    budget = 0
+                break
+            recent.append(turn)
+            budget -= cost
+        recent.reverse()
+
+        dropped_recent = len(self._recent) - len(recent)
+        summary = []
+        if budget > 0 and dropped_recent == 0:
+            for line in reversed(self._summary):
+                cost = estimate_tokens(line) + 1
+                if cost > budget:
+                    break
+                summary.append(line)
+                budget -= cost
+            summary.reverse()
+
+        earlier = self._summarized + dropped_recent
+        parts = [header]
+        if earlier:
+            parts.append(f"Earlier in session ({earlier} turns condensed):\n")
+            parts.extend(f"- {line}\n" for line in summary)
+            parts.append("\n")
+        parts.append("Transcript:\n")
+        parts.append("\n".join(recent))
+        return "".join(parts)
@@ -0,0 +1,244 @@
+# voice.py
+import io
+import os
+import json
+import wave
+from typing import List, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+EMBEDDING_DIM = 384  # profiles.voice_fingerprint VECTOR(384)
+# Stored in profiles.voice_fingerprint_version at enrollment; bump it whenever
+# embed() changes so old fingerprints stop matching (see migrations/004)
+VOICE_FINGERPRINT_VERSION = 2
+
+# Cosine similarity above which a segment counts as an enrolled voice
+VOICE_MATCH_THRESHOLD = float(os.getenv("VOICE_MATCH_THRESHOLD", "0.6"))
+# Live turns are scored in sub-segments so a turn with two voices isn't averaged
+VOICE_SEGMENT_MS = int(os.getenv("VOICE_SEGMENT_MS", "1500"))
+VOICE_RING_S = int(os.getenv("VOICE_RING_S", "30"))
+
+FRAME = 400      # 25 ms
+HOP = 160        # 10 ms
+N_FFT = 512
+N_MELS = 64
+N_MFCC = 40      # c1..c40; c0 (loudness) is left out
+MIN_VOICED_FRAMES = 30
+
+
+def _mel_filterbank(n_mels: int, n_fft: int, rate: int, fmin: float = 20.0, fmax: float = 7600.0) -> np.ndarray:
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mels = np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mels) / rate).astype(int)
+    bank = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, centre, right = bins[m - 1], bins[m], bins[m + 1]
+        if centre > left:
+            bank[m - 1, left:centre] = (np.arange(left, centre) - left) / (centre - left)
+        if right > centre:
+            bank[m - 1, centre:right] = (right - np.arange(centre, right)) / (right - centre)
+    return bank
+
+
+def _dct_matrix(n_in: int, n_out: int) -> np.ndarray:
+    n = np.arange(n_in)
+    k = np.arange(n_out)[:, None]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_in)) * np.sqrt(2.0 / n_in)
+    basis[0] /= np.sqrt(2.0)
+    return basis.astype(np.float32)
+
+
+_WINDOW = np.hamming(FRAME).astype(np.float32)
+_MEL_BANK = _mel_filterbank(N_MELS, N_FFT, SAMPLE_RATE)
+_DCT = _dct_matrix(N_MELS, N_MFCC + 1)[1:]
+_LIFTER = (1 + 11 * np.sin(np.pi * np.arange(1, N_MFCC + 1) / 22)).astype(np.float32)
+_STATS_DIM = 4 * N_MFCC + N_MELS
+# Fixed orthonormal map from the pooled statistics into the 384-d column;
+# it preserves dot products, so cosine scores are those of the statistics.
+_PROJECTION = np.linalg.qr(np.random.default_rng(384).standard_normal((EMBEDDING_DIM, _STATS_DIM)))[0].astype(np.float32)
+
+
+def decode_wav(data: bytes) -> np.ndarray:
+    """PCM WAV bytes -> float32 mono samples at 16 kHz. Raises ValueError."""
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Not a PCM WAV file: {e}")
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width: {width * 8} bits")
+
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(samples):
+        n_out = int(round(len(samples) * SAMPLE_RATE / rate))
+        samples = np.interp(np.linspace(0, len(samples) - 1, n_out), np.arange(len(samples)), samples)
+    return samples.astype(np.float32, copy=False)
+
+
+def frame_features(samples: np.ndarray):
+    """
+    Per-frame features for a float32 16 kHz signal, computed in one
+    vectorized pass: (log-mel (T, 64), liftered MFCC (T, 40), voiced mask (T,)).
+    """
+    if len(samples) < FRAME:
+        empty = np.zeros((0, N_MELS), dtype=np.float32)
+        return empty, np.zeros((0, N_MFCC), dtype=np.float32), np.zeros(0, dtype=bool)
+
+    emphasized = np.append(samples[0], samples[1:] - 0.97 * samples[:-1]).astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(emphasized, FRAME)[::HOP] * _WINDOW
+    power = np.abs(np.fft.rfft(frames, n=N_FFT)) ** 2 / N_FFT
+    log_mel = np.log(power @ _MEL_BANK.T + 1e-10).astype(np.float32)
+    mfcc = (log_mel @ _DCT.T) * _LIFTER
+
+    # Speech frames: within 35 dB of the loudest frame and above a fixed floor
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+    voiced = (energy_db > energy_db.max() - 35.0) & (energy_db > -60.0)
+    return log_mel, mfcc, voiced
+
+
+def _deltas(features: np.ndarray) -> np.ndarray:
+    padded = np.pad(features, ((2, 2), (0, 0)), mode="edge")
+    return (padded[3:-1] - padded[1:-3] + 2 * (padded[4:] - padded[:-4])) / 10.0
+
+
+def _pool(log_mel, mfcc, d1, d2) -> np.ndarray:
+    """Statistics pooling -> unit 384-d embedding. Each block is centred and
+    scaled to unit norm so no single statistic dominates the cosine."""
+    blocks = [
+        mfcc.mean(axis=0),
+        mfcc.std(axis=0),
+        d1.std(axis=0),
+        d2.std(axis=0),
+        log_mel.mean(axis=0),
+    ]
+    parts = []
+    for block in blocks:
+        block = block - block.mean()
+        parts.append(block / (np.linalg.norm(block) + 1e-8))
+    stats = np.concatenate(parts) / np.sqrt(len(parts))
+    return _PROJECTION @ stats
+
+
+def embed(samples: np.ndarray) -> np.ndarray:
+    """One embedding for a whole recording (enrollment). Raises ValueError."""
+    log_mel, mfcc, voiced = frame_features(samples)
+    if voiced.sum() < MIN_VOICED_FRAMES:
+        raise ValueError("Not enough speech in the recording")
+    d1 = _deltas(mfcc)
+    d2 = _deltas(d1)
+    return _pool(log_mel[voiced], mfcc[voiced], d1[voiced], d2[voiced])
+
+
+def embed_segments(samples: np.ndarray, segment_ms: int = VOICE_SEGMENT_MS):
+    """
+    Embeddings for consecutive half-overlapping segments of one signal.
+    Features are computed once for the whole signal; each segment only pools
+    its frame range. Returns (matrix (n, 384), [(start_ms, end_ms)]); segments
+    with too little speech are left out.
+    """
+    log_mel, mfcc, voiced = frame_features(samples)
+    if not len(voiced):
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32), []
+    d1 = _deltas(mfcc)
+    d2 = _deltas(d1)
+
+    seg = max(segment_ms * SAMPLE_RATE // 1000 // HOP, MIN_VOICED_FRAMES)
+    step = max(seg // 2, 1)
+    starts = list(range(0, max(len(voiced) - seg, 0) + 1, step))
+    if starts[-1] + seg < len(voiced):
+        starts.append(max(len(voiced) - seg, 0))
+
+    rows, spans = [], []
+    for start in starts:
+        mask = np.zeros(len(voiced), dtype=bool)
+        mask[start:start + seg] = True
+        mask &= voiced
+        if mask.sum() < MIN_VOICED_FRAMES:
+            continue
+        rows.append(_pool(log_mel[mask], mfcc[mask], d1[mask], d2[mask]))
+        spans.append((start * HOP * 1000 // SAMPLE_RATE, min(start + seg, len(voiced)) * HOP * 1000 // SAMPLE_RATE))
+    if not rows:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32), []
+    return np.stack(rows).astype(np.float32), spans
+
+
+def parse_vector(value) -> Optional[np.ndarray]:
+    """A stored fingerprint (pgvector text "[...]" or a list) -> unit vector."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    vector = np.asarray(value, dtype=np.float32)
+    if vector.shape != (EMBEDDING_DIM,):
+        return None
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else None
+
+
+class AudioRing:
+    """
+    The last VOICE_RING_S seconds of audio as sent to the STT upstream
+    (16 kHz s16 mono), addressable by stream time. Word timestamps from the
+    STT refer to this stream, so turns can be cut out of it directly.
+    """
+
+    def __init__(self, seconds: int = VOICE_RING_S):
+        self._buf = np.zeros(seconds * SAMPLE_RATE, dtype=np.int16)
+        self._written = 0  # samples since the stream started
+
+    def write(self, chunk: bytes):
+        samples = np.frombuffer(chunk[: len(chunk) - len(chunk) % 2], dtype="<i2")
+        size = len(self._buf)
+        if len(samples) > size:
+            self._written += len(samples) - size
+            samples = samples[-size:]
+        n = len(samples)
+        pos = self._written % size
+        first = min(n, size - pos)
+        self._buf[pos:pos + first] = samples[:first]
+        self._buf[: n - first] = samples[first:]
+        self._written += n
+
+    def segment(self, start_ms: int, end_ms: int) -> Optional[np.ndarray]:
+        """float32 samples for [start_ms, end_ms), or None once overwritten."""
+        start = max(int(start_ms) * SAMPLE_RATE // 1000, 0)
+        end = min(int(end_ms) * SAMPLE_RATE // 1000, self._written)
+        if end <= start or start < self._written - len(self._buf):
+            return None
+        idx = np.arange(start, end) % len(self._buf)
+        return self._buf[idx].astype(np.float32) / 32768.0
+
+
+def turn_audio(ring: AudioRing, words: List) -> Optional[np.ndarray]:
+    """Copies a turn's audio out of the ring using its STT word timestamps (ms)."""
+    if not words:
+        return None
+    return ring.segment(words[0].start - 100, words[-1].end + 100)
+
+
+def embed_turn(audio: Optional[np.ndarray]):
+    """
+    Segment embeddings for one turn plus each segment's duration as a weight,
+    ready for speaker_id.SpeakerDirectory.identify_turn. CPU-bound; run it
+    off the event loop.
+    """
+    if audio is None:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    matrix, spans = embed_segments(audio)
+    weights = np.array([end - start for start, end in spans], dtype=np.float32)
+    return matrix, weights
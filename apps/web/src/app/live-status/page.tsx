@@ -23,7 +23,7 @@ function LiveStatusContent() {
   const [lastLocation, setLastLocation] = useState<{ lat: number; lon: number } | null>(null);
 
   // Simulation graph data state
-  const [riskData, setRiskData] = useState([
+  const [riskData, setRiskData] = useState<{ id?: string; time: string; risk: number }[]>([
     { time: "10:00", risk: 20 },
     { time: "10:05", risk: 35 },
     { time: "10:10", risk: 30 },
@@ -43,12 +43,25 @@ function LiveStatusContent() {
         if (!session) return;
 
         const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
-        const res = await fetch(`${API_URL}/api/threads/${threadId}`, {
+        let res = await fetch(`${API_URL}/api/threads/${threadId}`, {
           headers: { "Authorization": `Bearer ${session?.access_token}` }
         });
 
         if (res.ok) {
           const data = await res.json();
+
+          // Long threads come back in pages; follow the cursor to the end
+          let page = data;
+          while (page?.has_more && page.next_cursor) {
+            res = await fetch(`${API_URL}/api/threads/${threadId}?cursor=${page.next_cursor}`, {
+              headers: { "Authorization": `Bearer ${session?.access_token}` }
+            });
+            if (!res.ok) break;
+            page = await res.json();
+            data.logs = [...(data.logs || []), ...(page.logs || [])];
+            data.risk_scores = [...(data.risk_scores || []), ...(page.risk_scores || [])];
+          }
+
           const realRiskScores = data.risk_scores || [];
 
           if (realRiskScores.length > 0) {
@@ -56,6 +69,7 @@ function LiveStatusContent() {
             setRisk(lastScore);
 
             const mappedGraphData = realRiskScores.map((s: any) => ({
+              id: s.id,
               time: new Date(s.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
               risk: s.score
             }));
@@ -82,9 +96,82 @@ function LiveStatusContent() {
       }
     };
 
-    fetchData();
-    const interval = setInterval(fetchData, 4000); // Poll every 4 seconds
-    return () => clearInterval(interval);
+    // Live deltas are pushed over a WebSocket instead of polling the thread.
+    // The socket opens before the fetch; events that arrive while fetching
+    // are held in `pending` and applied after it, skipping any log or risk
+    // score the fetch already returned (same id).
+    let socket: WebSocket | null = null;
+    let reconnectTimer: NodeJS.Timeout | null = null;
+    let closed = false;
+    let pending: any[] | null = null;
+
+    const applyEvent = (msg: any) => {
+      if (msg.type === "log" && msg.log) {
+        setLogs(prev => prev.some(l => l.id === msg.log.id) ? prev : [...prev, msg.log]);
+        if (msg.log.latitude && msg.log.longitude) {
+          setLastLocation({ lat: msg.log.latitude, lon: msg.log.longitude });
+        }
+      } else if (msg.type === "risk" && msg.risk_score) {
+        const s = msg.risk_score;
+        setRisk(s.score);
+        setRiskData(prev => prev.some(p => p.id === s.id) ? prev : [...prev, {
+          id: s.id,
+          time: new Date(s.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
+          risk: s.score
+        }]);
+      } else if (msg.type === "location" && msg.lat && msg.lon) {
+        setLastLocation({ lat: msg.lat, lon: msg.lon });
+      }
+    };
+
+    // Resolves once the socket is open (or has failed to open)
+    const connect = async () => {
+      const { data: { session } } = await supabase.auth.getSession();
+      if (!session || closed) return;
+
+      const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
+      const wsProtocol = API_URL.startsWith("https") ? "wss" : "ws";
+      const host = API_URL.replace(/^https?:\/\//, "");
+      const ws = new WebSocket(`${wsProtocol}://${host}/ws/watch/${threadId}?token=${encodeURIComponent(session.access_token)}`);
+      socket = ws;
+
+      ws.onmessage = (event) => {
+        try {
+          const msg = JSON.parse(event.data);
+          if (pending) pending.push(msg);
+          else applyEvent(msg);
+        } catch (e) {
+          console.error("Failed to parse live event:", event.data, e);
+        }
+      };
+
+      await new Promise<void>((resolve) => {
+        ws.onopen = () => resolve();
+        ws.onclose = () => {
+          resolve();
+          if (closed || socket !== ws) return;
+          // Resubscribe and resync whatever was missed while disconnected
+          reconnectTimer = setTimeout(sync, 3000);
+        };
+      });
+    };
+
+    // Subscribe first, then load the thread, then apply what arrived meanwhile
+    const sync = async () => {
+      pending = [];
+      await connect();
+      await fetchData();
+      const missed = pending;
+      pending = null;
+      missed.forEach(applyEvent);
+    };
+
+    sync();
+    return () => {
+      closed = true;
+      if (reconnectTimer) clearTimeout(reconnectTimer);
+      socket?.close();
+    };
   }, [threadId, supabase]);
 
   // Scroll to bottom of transcript only if user is at the bottom
@@ -52,6 +52,10 @@ export default function Home() {
   const audioStream = useRef<MediaStream | null>(null);
   const locationInterval = useRef<NodeJS.Timeout | null>(null);
   const chatEndRef = useRef<HTMLDivElement>(null);
+  const lastSeq = useRef<number | null>(null);
+  const userStopped = useRef(false);
+  const reconnectAttempts = useRef(0);
+  const reconnectTimer = useRef<NodeJS.Timeout | null>(null);
 
   const fetchBaseData = async () => {
     try {
@@ -285,74 +289,108 @@ export default function Home() {
 
       setThreadId(data.id);
 
-      const wsProtocol = API_URL.startsWith("https") ? "wss" : "ws";
-      const host = API_URL.replace(/^https?:\/\//, "");
-      const wsUrl = `${wsProtocol}://${host}/ws/${data.id}`;
-      console.log("Attempting WebSocket connection to:", wsUrl);
+      lastSeq.current = null;
+      userStopped.current = false;
+      reconnectAttempts.current = 0;
+      connectSession(data.id, false);
 
-      ws.current = new WebSocket(wsUrl);
+    } catch (err) {
+      console.error("Detailed monitoring initiation error:", err);
+      setStatus("error");
+    }
+  };
 
-      ws.current.onopen = () => {
-        console.log("WebSocket connected successfully!");
-        setStatus("active");
-        setIsMonitoring(true);
-        if (monitoringMode === "audio" || monitoringMode === "both") {
-          console.log("Starting audio recording...");
-          startRecording();
-        }
-      };
+  const connectSession = async (id: string, resume: boolean) => {
+    const wsProtocol = API_URL.startsWith("https") ? "wss" : "ws";
+    const host = API_URL.replace(/^https?:\/\//, "");
+    // Browsers can't set headers on WebSockets, so the access token goes in the query
+    const { data: { session } } = await supabase.auth.getSession();
+    const params = new URLSearchParams({ token: session?.access_token ?? "" });
+    // On reconnect, tell the server the last event we saw so it replays only what we missed
+    if (resume && lastSeq.current !== null) params.set("last_seq", String(lastSeq.current));
+    const wsUrl = `${wsProtocol}://${host}/ws/${id}?${params}`;
+    console.log("Attempting WebSocket connection to:", `${wsProtocol}://${host}/ws/${id}`);
+
+    ws.current = new WebSocket(wsUrl);
+
+    ws.current.onopen = () => {
+      console.log("WebSocket connected successfully!");
+      reconnectAttempts.current = 0;
+      setStatus("active");
+      setIsMonitoring(true);
+      // The recorder reads ws.current, so it keeps streaming into a resumed socket
+      if (!resume && (monitoringMode === "audio" || monitoringMode === "both")) {
+        console.log("Starting audio recording...");
+        startRecording();
+      }
+    };
 
-      ws.current.onmessage = (event) => {
-        try {
-          const msg = JSON.parse(event.data);
+    ws.current.onmessage = (event) => {
+      try {
+        const msg = JSON.parse(event.data);
 
-          if (msg.risk !== undefined) {
-            setRisk(msg.risk);
+        if (msg.session) {
+          // Server state was reset; follow its numbering from here
+          if (lastSeq.current !== null && msg.session.seq < lastSeq.current) {
+            lastSeq.current = msg.session.seq;
           }
+          return;
+        }
+        if (msg.seq !== undefined) {
+          lastSeq.current = msg.seq;
+        }
 
-          if (msg.action !== undefined) {
-            setAction(msg.action);
-
-            // Only push AI notifications when the server explicitly sends a new action field
-            if (msg.action !== "Shadow is monitoring..." && msg.action !== "Shadow is idle.") {
-              setAiNotifications(prev => {
-                // Deduplicate: Don't add if the same message was the last one added
-                if (prev.length > 0 && prev[0].text === msg.action) {
-                  return prev;
-                }
-                const now = new Date();
-                const timeStr = now.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit', second: '2-digit' });
-                return [{ text: msg.action, risk: msg.risk || risk, time: timeStr }, ...prev].slice(0, 50);
-              });
-            }
+        if (msg.risk !== undefined) {
+          setRisk(msg.risk);
+        }
+
+        if (msg.action !== undefined) {
+          setAction(msg.action);
+
+          // Only push AI notifications when the server explicitly sends a new action field
+          if (msg.action !== "Shadow is monitoring..." && msg.action !== "Shadow is idle.") {
+            setAiNotifications(prev => {
+              // Deduplicate: Don't add if the same message was the last one added
+              if (prev.length > 0 && prev[0].text === msg.action) {
+                return prev;
+              }
+              const now = new Date();
+              const timeStr = now.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit', second: '2-digit' });
+              return [{ text: msg.action, risk: msg.risk || risk, time: timeStr }, ...prev].slice(0, 50);
+            });
           }
-          if (msg.transcript) {
-            if (msg.is_final) {
-              setTranscripts((prev) => [...prev, msg.transcript].slice(-20));
-              setCurrentTranscript("");
-            } else {
-              setCurrentTranscript(msg.transcript);
-            }
+        }
+        if (msg.transcript) {
+          if (msg.is_final) {
+            setTranscripts((prev) => [...prev, msg.transcript].slice(-20));
+            setCurrentTranscript("");
+          } else {
+            setCurrentTranscript(msg.transcript);
           }
-        } catch (e) {
-          console.error("Failed to parse WebSocket message:", event.data, e);
         }
-      };
-
-      ws.current.onclose = (event) => {
-        console.log("WebSocket closed:", event.code, event.reason);
-        stopMonitoring();
-      };
+      } catch (e) {
+        console.error("Failed to parse WebSocket message:", event.data, e);
+      }
+    };
 
-      ws.current.onerror = (err) => {
-        console.error("WebSocket error observed:", err);
+    ws.current.onclose = (event) => {
+      console.log("WebSocket closed:", event.code, event.reason);
+      if (userStopped.current) return;
+      if (event.code === 1008) {
+        // Not authorised for this thread; retrying won't help
         setStatus("error");
-      };
+        return;
+      }
+      // Dropped connection: keep the session and resume it with backoff
+      const delay = Math.min(1000 * 2 ** reconnectAttempts.current, 10000);
+      reconnectAttempts.current += 1;
+      setStatus("connecting");
+      reconnectTimer.current = setTimeout(() => connectSession(id, true), delay);
+    };
 
-    } catch (err) {
-      console.error("Detailed monitoring initiation error:", err);
-      setStatus("error");
-    }
+    ws.current.onerror = (err) => {
+      console.error("WebSocket error observed:", err);
+    };
   };
 
   const startRecording = async () => {
@@ -381,6 +419,8 @@ export default function Home() {
 
   const stopMonitoring = () => {
     console.log("Stopping monitoring session...");
+    userStopped.current = true;
+    if (reconnectTimer.current) clearTimeout(reconnectTimer.current);
     setIsMonitoring(false);
     setStatus("idle");
     setCurrentTranscript("");
@@ -390,26 +430,81 @@ export default function Home() {
     ws.current?.close();
   };
 
+  // 16-bit mono PCM WAV, which the backend decodes in memory for the fingerprint
+  const encodeWav = (samples: Float32Array, sampleRate: number) => {
+    const buffer = new ArrayBuffer(44 + samples.length * 2);
+    const view = new DataView(buffer);
+    const writeString = (offset: number, str: string) => {
+      for (let i = 0; i < str.length; i++) view.setUint8(offset + i, str.charCodeAt(i));
+    };
+    writeString(0, "RIFF");
+    view.setUint32(4, 36 + samples.length * 2, true);
+    writeString(8, "WAVE");
+    writeString(12, "fmt ");
+    view.setUint32(16, 16, true);
+    view.setUint16(20, 1, true);
+    view.setUint16(22, 1, true);
+    view.setUint32(24, sampleRate, true);
+    view.setUint32(28, sampleRate * 2, true);
+    view.setUint16(32, 2, true);
+    view.setUint16(34, 16, true);
+    writeString(36, "data");
+    view.setUint32(40, samples.length * 2, true);
+    for (let i = 0; i < samples.length; i++) {
+      const s = Math.max(-1, Math.min(1, samples[i]));
+      view.setInt16(44 + i * 2, s < 0 ? s * 0x8000 : s * 0x7FFF, true);
+    }
+    return new Blob([buffer], { type: "audio/wav" });
+  };
+
   const handleEnrollVoice = async () => {
     setIsRecording(true);
-    setTimeout(async () => {
-      try {
-        const { data: { session } } = await supabase.auth.getSession();
-        if (!session) return;
-        const formData = new FormData();
-        formData.append("file", new Blob(["dummy"], { type: "audio/wav" }), "voice.wav");
-        await fetch(`${API_URL}/api/enroll-voice`, {
-          method: "POST",
-          headers: { "Authorization": `Bearer ${session?.access_token}` },
-          body: formData
-        });
-        setIsRecording(false);
-        setOnboardingStep(2);
-      } catch (err) {
-        console.error("Voice enrollment failed:", err);
-        setIsRecording(false);
+    let stream: MediaStream | null = null;
+    let context: AudioContext | null = null;
+    try {
+      // Record ~5 seconds of the user's voice
+      stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+      context = new AudioContext({ sampleRate: 16000 });
+      const source = context.createMediaStreamSource(stream);
+      const processor = context.createScriptProcessor(4096, 1, 1);
+      const chunks: Float32Array[] = [];
+      processor.onaudioprocess = (event) => {
+        chunks.push(new Float32Array(event.inputBuffer.getChannelData(0)));
+      };
+      source.connect(processor);
+      processor.connect(context.destination);
+      await new Promise(resolve => setTimeout(resolve, 5000));
+      processor.disconnect();
+      source.disconnect();
+
+      const samples = new Float32Array(chunks.reduce((n, c) => n + c.length, 0));
+      let offset = 0;
+      for (const chunk of chunks) {
+        samples.set(chunk, offset);
+        offset += chunk.length;
+      }
+
+      const { data: { session } } = await supabase.auth.getSession();
+      if (!session) return;
+      const formData = new FormData();
+      formData.append("file", encodeWav(samples, context.sampleRate), "voice.wav");
+      const res = await fetch(`${API_URL}/api/enroll-voice`, {
+        method: "POST",
+        headers: { "Authorization": `Bearer ${session?.access_token}` },
+        body: formData
+      });
+      if (!res.ok) {
+        console.error("Voice enrollment rejected:", await res.text());
+        return;
       }
-    }, 2000);
+      setOnboardingStep(2);
+    } catch (err) {
+      console.error("Voice enrollment failed:", err);
+    } finally {
+      stream?.getTracks().forEach(track => track.stop());
+      context?.close();
+      setIsRecording(false);
+    }
   };
 
   const handleAddGuardian = async (e: React.FormEvent) => {